@@ -0,0 +1,230 @@
+"""
+Diff-Focused Prompt Context for Terraform Reviews
+Extracts changed hunks with their enclosing HCL blocks and packs them into token budgets
+
+Instead of sending a whole file to the model, the reviewer sends only the
+top-level HCL blocks (resource, module, variable, ...) that a `git diff`
+hunk touches, with their line numbers. Lines changed outside any block get
+a few lines of context. The resulting segments are packed into chunks that
+fit the prompt token budget; a block larger than the budget is split by
+lines, so every changed line is reviewed however large the file is.
+
+Token counts are estimated at ~4 characters per token, which is close
+enough for llama-family tokenizers on HCL.
+"""
+
+import re
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+
+# Lines of context around changes that fall outside any block
+CONTEXT_LINES = 3
+
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+HEREDOC_START = re.compile(r'<<-?\s*([A-Za-z_][A-Za-z0-9_]*)\s*$')
+
+# (first line, last line), 1-based and inclusive
+LineRange = Tuple[int, int]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def changed_line_ranges(filepath: str, base: str, head: str, cwd: Optional[str] = None) -> Optional[List[LineRange]]:
+    """Line ranges of the file at head that differ from base, or None if git can't tell
+
+    Pure deletions are reported as the line they happened before, so the
+    block they were removed from still gets reviewed.
+    """
+
+    result = subprocess.run(
+        ['git', 'diff', '--unified=0', '--no-color', base, head, '--', filepath],
+        capture_output=True,
+        text=True,
+        cwd=cwd
+    )
+    if result.returncode != 0:
+        return None
+
+    ranges = []
+    for line in result.stdout.splitlines():
+        match = HUNK_HEADER.match(line)
+        if not match:
+            continue
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        ranges.append((start, start + count - 1) if count else (max(start, 1), max(start, 1)))
+    return ranges
+
+
+def top_level_blocks(lines: List[str]) -> List[LineRange]:
+    """Line ranges of the top-level blocks in HCL source
+
+    Braces inside strings, comments and heredocs are ignored.
+    """
+
+    blocks = []
+    depth = 0
+    start = None
+    heredoc = None
+    in_comment = False
+
+    for number, line in enumerate(lines, 1):
+        if heredoc:
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+
+        i = 0
+        in_string = False
+        while i < len(line):
+            char = line[i]
+            if in_comment:
+                if line.startswith('*/', i):
+                    in_comment = False
+                    i += 1
+            elif in_string:
+                if char == '\\':
+                    i += 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '#' or line.startswith('//', i):
+                break
+            elif line.startswith('/*', i):
+                in_comment = True
+                i += 1
+            elif char == '{':
+                if depth == 0:
+                    start = number
+                depth += 1
+            elif char == '}' and depth:
+                depth -= 1
+                if depth == 0 and start is not None:
+                    blocks.append((start, number))
+                    start = None
+            i += 1
+
+        if not in_comment:
+            match = HEREDOC_START.search(line.split('#')[0])
+            if match:
+                heredoc = match.group(1)
+
+    if start is not None:
+        blocks.append((start, len(lines)))
+    return blocks
+
+
+def merge_ranges(ranges: List[LineRange]) -> List[LineRange]:
+    merged: List[LineRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def focus_ranges(lines: List[str], changed: List[LineRange]) -> List[LineRange]:
+    """Changed ranges widened to their enclosing top-level blocks"""
+
+    blocks = top_level_blocks(lines)
+    focused = []
+    for start, end in changed:
+        enclosing = [block for block in blocks if block[0] <= end and block[1] >= start]
+        if enclosing:
+            focused.append((min(start, enclosing[0][0]), max(end, enclosing[-1][1])))
+        else:
+            focused.append((max(start - CONTEXT_LINES, 1), min(end + CONTEXT_LINES, len(lines))))
+    return merge_ranges(focused)
+
+
+def subtract_ranges(ranges: List[LineRange], excluded: List[LineRange]) -> List[LineRange]:
+    """Parts of ranges not covered by any excluded range"""
+
+    remaining = list(ranges)
+    for ex_start, ex_end in excluded:
+        kept = []
+        for start, end in remaining:
+            if ex_end < start or ex_start > end:
+                kept.append((start, end))
+                continue
+            if start < ex_start:
+                kept.append((start, ex_start - 1))
+            if end > ex_end:
+                kept.append((ex_end + 1, end))
+        remaining = kept
+    return remaining
+
+
+def has_code(lines: List[str], line_range: LineRange) -> bool:
+    """Whether a range holds anything besides blank lines and comments"""
+
+    start, end = line_range
+    return any(line.strip() and not line.strip().startswith(('#', '//')) for line in lines[start - 1:end])
+
+
+def render(lines: List[str], line_range: LineRange) -> str:
+    start, end = line_range
+    return f"# lines {start}-{end}\n" + '\n'.join(lines[start - 1:end])
+
+
+def split_range(lines: List[str], line_range: LineRange, budget_tokens: int) -> List[LineRange]:
+    """Split a range by lines into pieces that each fit the budget"""
+
+    pieces = []
+    start, end = line_range
+    piece_start = start
+    size = 0
+    for number in range(start, end + 1):
+        line_tokens = estimate_tokens(lines[number - 1])
+        if size and size + line_tokens > budget_tokens:
+            pieces.append((piece_start, number - 1))
+            piece_start, size = number, 0
+        size += line_tokens
+    pieces.append((piece_start, end))
+    return pieces
+
+
+def build_chunks(code: str, changed: Optional[List[LineRange]], budget_tokens: int,
+                 exclude: Optional[List[LineRange]] = None) -> List[Dict]:
+    """Prompt-ready chunks covering the changed blocks of code
+
+    With changed=None (no diff available) the whole file is covered.
+    Ranges in exclude (blocks already reviewed another way) are left out.
+    Each chunk is {'text', 'ranges', 'tokens'}; an empty list means nothing
+    is left for the model to review.
+    """
+
+    lines = code.splitlines()
+    if not lines:
+        return []
+    ranges = focus_ranges(lines, changed) if changed is not None else [(1, len(lines))]
+    if changed is None and estimate_tokens(code) > budget_tokens:
+        # Whole file over budget: split along block boundaries
+        ranges = merge_ranges(top_level_blocks(lines)) or ranges
+    if exclude:
+        ranges = [r for r in subtract_ranges(ranges, exclude) if has_code(lines, r)]
+
+    pieces = []
+    for line_range in ranges:
+        if estimate_tokens(render(lines, line_range)) > budget_tokens:
+            pieces.extend(split_range(lines, line_range, budget_tokens))
+        else:
+            pieces.append(line_range)
+
+    chunks: List[Dict] = []
+    for piece in pieces:
+        text = render(lines, piece)
+        tokens = estimate_tokens(text)
+        if chunks and chunks[-1]['tokens'] + tokens <= budget_tokens:
+            chunks[-1]['text'] += '\n\n' + text
+            chunks[-1]['ranges'].append(piece)
+            chunks[-1]['tokens'] += tokens
+        else:
+            chunks.append({'text': text, 'ranges': [piece], 'tokens': tokens})
+    return chunks
@@ -0,0 +1,637 @@
+"""
+Deterministic HCL Pre-Scan for the PR Reviewer
+Checks the patterns in policies/templates/*.rego before anything reaches the LLM
+
+Each top-level block of a Terraform file is parsed into its attributes and
+nested blocks. Literal values (strings, numbers, bools, lists, maps) are
+kept; anything else (references, function calls, interpolation) stays an
+unresolved expression. Resource types covered by the rego templates
+(security groups, S3 buckets and their public access block / versioning /
+encryption / ACL, EC2 instances) are checked against the same rules, with
+port ranges and IPv6 sources taken into account. Only 0.0.0.0/0 and ::/0
+count as open; any other public CIDR (a split default such as
+0.0.0.0/1 + 128.0.0.0/1, or a wide range) can't be judged here:
+
+  - decided    every rule could be evaluated and the block sets nothing
+               beyond what the rules look at (KNOWN_SHAPES); findings are
+               reported directly and the block is not sent to the model
+  - escalated  a rule depends on an unresolved expression, the block sets
+               something the rules don't judge, or it is a type the
+               templates don't cover; it goes to the model
+
+variable and output blocks are declarations and are never sent to the model;
+variables are only checked for hard-coded secret defaults. S3 encryption is
+looked up across the module's .tf files, like the template looks across the
+plan. When Ollama is down the decided findings are the whole review.
+"""
+
+import ipaddress
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+SSH_PORT = 22
+RDP_PORT = 3389
+DATABASE_PORTS = (3306, 5432, 1433, 27017, 6379)
+OPEN_CIDR = "0.0.0.0/0"
+OPEN_IPV6_CIDR = "::/0"
+# Sources that never expose a rule; mirrors INTERNAL_NETWORKS in lambda/auto-remediation/sg_rules.py
+INTERNAL_NETWORKS = tuple(ipaddress.ip_network(cidr) for cidr in (
+    "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "100.64.0.0/10", "fc00::/7"
+))
+ALL_PROTOCOLS = ("-1", "all")
+ICMP_PROTOCOLS = ("icmp", "1", "icmpv6", "58")
+PUBLIC_BUCKET_ACLS = ("public-read", "public-read-write", "authenticated-read")
+
+PUBLIC_ACCESS_BLOCK_SETTINGS = {
+    "block_public_acls": "does not block public ACLs",
+    "block_public_policy": "does not block public policies",
+    "ignore_public_acls": "does not ignore public ACLs",
+    "restrict_public_buckets": "does not restrict public buckets"
+}
+
+REQUIRED_INSTANCE_TAGS = ("Environment", "Owner", "CostCenter")
+DEPRECATED_INSTANCE_TYPES = ("t1.micro", "m1.small", "m1.medium", "m1.large")
+
+DECLARATION_BLOCKS = ("variable", "output")
+SECRET_NAME = re.compile(r'password|secret|token|api_key|access_key|private_key', re.IGNORECASE)
+BUCKET_REFERENCE = re.compile(r'\baws_s3_bucket\.([A-Za-z0-9_-]+)\b')
+
+TOKEN = re.compile(r'''
+    (?P<newline>\n)
+  | (?P<space>[ \t\r]+)
+  | (?P<comment>\#[^\n]*|//[^\n]*|/\*.*?\*/)
+  | (?P<heredoc><<-?\s*(?P<marker>[A-Za-z_][A-Za-z0-9_]*)[ \t]*\n)
+  | (?P<number>\d+(?:\.\d+)?(?![A-Za-z_]))
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_\-]*(?:\.(?:[A-Za-z_][A-Za-z0-9_\-]*|\*|\d+))*)
+  | (?P<operator>==|!=|<=|>=|=>|&&|\|\||\.\.\.)
+  | (?P<string>")
+  | (?P<punct>.)
+''', re.VERBOSE | re.DOTALL)
+
+
+class Expr:
+    """A value that can't be resolved without a plan, kept as source text"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"Expr({self.text!r})"
+
+
+class Block:
+    def __init__(self, kind: str, labels: List[str], start: int):
+        self.kind = kind
+        self.labels = labels
+        self.start = start
+        self.end = start
+        self.attrs: Dict[str, object] = {}
+        self.blocks: List['Block'] = []
+
+    @property
+    def address(self) -> str:
+        return '.'.join(self.labels) if self.kind == 'resource' else '.'.join([self.kind] + self.labels)
+
+    def nested(self, kind: str) -> List['Block']:
+        return [block for block in self.blocks if block.kind == kind]
+
+
+def tokenize(code: str) -> List[Tuple[str, object, int]]:
+    """(kind, value, line) tokens; strings are (text, interpolated)"""
+
+    tokens = []
+    line = 1
+    pos = 0
+    while pos < len(code):
+        match = TOKEN.match(code, pos)
+        kind = match.lastgroup if match.lastgroup != 'marker' else 'heredoc'
+        text = match.group(0)
+
+        if kind == 'string':
+            end, depth = pos + 1, 0
+            while end < len(code) and not (code[end] == '"' and depth == 0):
+                if code[end] == '\\':
+                    end += 1
+                elif code.startswith(('${', '%{'), end):
+                    depth += 1
+                    end += 1
+                elif code[end] == '}' and depth:
+                    depth -= 1
+                end += 1
+            text = code[pos:end + 1]
+            body = text[1:-1]
+            tokens.append(('string', (body, '${' in body or '%{' in body), line))
+            pos = end + 1
+            line += text.count('\n')
+            continue
+
+        if kind == 'heredoc':
+            marker = match.group('marker')
+            closing = re.compile(rf'^[ \t]*{marker}[ \t]*$', re.MULTILINE).search(code, match.end())
+            end = closing.end() if closing else len(code)
+            body = code[match.end():closing.start() if closing else end]
+            tokens.append(('string', (body, True), line))
+            line += code[pos:end].count('\n')
+            pos = end
+            continue
+
+        if kind == 'newline':
+            tokens.append(('newline', text, line))
+        elif kind == 'number':
+            tokens.append(('number', float(text) if '.' in text else int(text), line))
+        elif kind in ('ident', 'operator', 'punct'):
+            tokens.append((kind, text, line))
+        line += text.count('\n')
+        pos = match.end()
+
+    tokens.append(('eof', None, line))
+    return tokens
+
+
+def token_text(token: Tuple[str, object, int]) -> str:
+    kind, value, _ = token
+    if kind == 'string':
+        return f'"{value[0]}"'
+    return '' if kind in ('newline', 'eof') else str(value)
+
+
+def literal(tokens: List[Tuple[str, object, int]]) -> object:
+    """Python value of an expression's tokens; containers may hold Expr items"""
+
+    # Newlines separate container items, so keep them for the split below
+    lines = list(tokens)
+    while lines and lines[0][0] == 'newline':
+        lines.pop(0)
+    while lines and lines[-1][0] == 'newline':
+        lines.pop()
+    tokens = [token for token in lines if token[0] != 'newline']
+    text = ' '.join(token_text(token) for token in tokens)
+    if not tokens:
+        return Expr(text)
+
+    if len(tokens) == 1:
+        kind, value, _ = tokens[0]
+        if kind == 'string' and not value[1]:
+            return value[0]
+        if kind == 'number':
+            return value
+        if kind == 'ident' and value in ('true', 'false'):
+            return value == 'true'
+        if kind == 'ident' and value == 'null':
+            return None
+        return Expr(text)
+
+    if len(tokens) == 2 and tokens[0][1] == '-' and tokens[1][0] == 'number':
+        return -tokens[1][1]
+
+    opening, closing = tokens[0][1], tokens[-1][1]
+    if (opening, closing) not in (('[', ']'), ('{', '}')) or not balanced_span(tokens):
+        return Expr(text)
+
+    items = split_top_level(lines[1:-1])
+    if opening == '[':
+        return [literal(item) for item in items]
+
+    mapping = {}
+    for item in items:
+        if len(item) < 3 or item[1][1] not in ('=', ':'):
+            return Expr(text)
+        kind, key, _ = item[0]
+        if kind == 'string' and not key[1]:
+            key = key[0]
+        elif kind != 'ident':
+            return Expr(text)
+        mapping[key] = literal(item[2:])
+    return mapping
+
+
+def balanced_span(tokens: List[Tuple[str, object, int]]) -> bool:
+    """Whether the first bracket closes at the last token"""
+
+    depth = 0
+    for index, (kind, value, _) in enumerate(tokens):
+        if kind == 'punct' and value in '([{':
+            depth += 1
+        elif kind == 'punct' and value in ')]}':
+            depth -= 1
+            if depth == 0 and index != len(tokens) - 1:
+                return False
+    return depth == 0
+
+
+def split_top_level(tokens: List[Tuple[str, object, int]]) -> List[List[Tuple[str, object, int]]]:
+    """Container items, split on commas and newlines outside nested brackets"""
+
+    items, current, depth = [], [], 0
+    for token in tokens + [('newline', '\n', 0)]:
+        kind, value = token[0], token[1]
+        if kind == 'punct' and value in '([{':
+            depth += 1
+        elif kind == 'punct' and value in ')]}':
+            depth -= 1
+        if depth == 0 and (kind == 'newline' or (kind == 'punct' and value == ',')):
+            if current:
+                items.append(current)
+            current = []
+        else:
+            current.append(token)
+    return items
+
+
+class Parser:
+    def __init__(self, code: str):
+        self.tokens = tokenize(code)
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, object, int]:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def parse(self) -> List[Block]:
+        blocks, _ = self.body(top_level=True)
+        return blocks
+
+    def body(self, top_level: bool = False) -> Tuple[List[Block], Dict[str, object]]:
+        blocks: List[Block] = []
+        attrs: Dict[str, object] = {}
+
+        while True:
+            kind, value, line = self.peek()
+            if kind == 'eof' or (kind == 'punct' and value == '}' and not top_level):
+                return blocks, attrs
+            if kind != 'ident':
+                self.pos += 1
+                continue
+
+            name = value
+            self.pos += 1
+            if self.peek()[1] == '=':
+                self.pos += 1
+                attrs[name] = literal(self.expression())
+                continue
+
+            labels = []
+            while self.peek()[0] in ('string', 'ident') and self.peek()[1] != '{':
+                label = self.peek()[1]
+                labels.append(label[0] if isinstance(label, tuple) else label)
+                self.pos += 1
+            if self.peek()[1] != '{':
+                continue
+
+            self.pos += 1
+            block = Block(name, labels, line)
+            block.blocks, block.attrs = self.body()
+            block.end = self.peek()[2]
+            self.pos += 1
+            blocks.append(block)
+
+    def expression(self) -> List[Tuple[str, object, int]]:
+        """Tokens of an attribute value, up to the end of its line or enclosing block"""
+
+        tokens, depth = [], 0
+        while True:
+            token = self.peek()
+            kind, value = token[0], token[1]
+            if kind == 'eof' or (depth == 0 and (kind == 'newline' or (kind == 'punct' and value == '}'))):
+                return tokens
+            if kind == 'punct' and value in '([{':
+                depth += 1
+            elif kind == 'punct' and value in ')]}':
+                depth -= 1
+            tokens.append(token)
+            self.pos += 1
+
+
+def parse_blocks(code: str) -> List[Block]:
+    return Parser(code).parse()
+
+
+def unresolved(value: object) -> bool:
+    return isinstance(value, Expr)
+
+
+class BlockResult:
+    def __init__(self, block: Block):
+        self.block = block
+        self.findings: List[Tuple[str, str]] = []
+        self.ambiguous: List[str] = []
+
+    def finding(self, section: str, message: str):
+        self.findings.append((section, f"{message} (line {self.block.start})"))
+
+    def depends_on(self, attribute: str):
+        self.ambiguous.append(attribute)
+
+
+def is_internal_cidr(cidr: object) -> bool:
+    """True for a CIDR inside INTERNAL_NETWORKS; unparseable values are not"""
+
+    try:
+        network = ipaddress.ip_network(str(cidr), strict=False)
+    except ValueError:
+        return False
+    return any(network.version == internal.version and network.subnet_of(internal)
+               for internal in INTERNAL_NETWORKS)
+
+
+def check_security_group(result: BlockResult, module: 'ModuleContext'):
+    block = result.block
+    for rule in block.nested('ingress'):
+        from_port, to_port = rule.attrs.get('from_port'), rule.attrs.get('to_port')
+        protocol = rule.attrs.get('protocol')
+        cidrs = rule.attrs.get('cidr_blocks', [])
+        ipv6_cidrs = rule.attrs.get('ipv6_cidr_blocks', [])
+
+        if any(unresolved(value) for value in (from_port, to_port, protocol)):
+            result.depends_on('ingress ports')
+            continue
+        if any(not isinstance(value, list) or any(unresolved(cidr) for cidr in value) for value in (cidrs, ipv6_cidrs)):
+            result.depends_on('ingress cidr blocks')
+            continue
+
+        protocol = str(protocol).lower()
+        if protocol in ICMP_PROTOCOLS:
+            continue
+        if protocol not in ALL_PROTOCOLS and not (isinstance(from_port, int) and isinstance(to_port, int)):
+            result.depends_on('ingress ports')
+            continue
+        # Protocol -1 means every protocol and port, whatever the port fields say
+        low, high = (0, 65535) if protocol in ALL_PROTOCOLS else (from_port, to_port)
+        sources = [cidr for cidr in (OPEN_CIDR, OPEN_IPV6_CIDR) if cidr in cidrs or cidr in ipv6_cidrs]
+        # Anything else public (split defaults, wide ranges) is left to the model
+        if any(not is_internal_cidr(cidr) for cidr in cidrs + ipv6_cidrs if cidr not in (OPEN_CIDR, OPEN_IPV6_CIDR)):
+            result.depends_on('ingress cidr blocks')
+
+        if low == 0 and high == 65535:
+            if sources:
+                result.finding('security', f"Security group '{block.address}' allows all ports from "
+                                           f"{' and '.join(sources)} - CRITICAL SECURITY RISK")
+                continue
+            result.finding('best_practices', f"Security group '{block.address}' allows all ports - consider restricting")
+        if not sources:
+            continue
+
+        opened = f"from {' and '.join(sources)}"
+        if low <= SSH_PORT <= high:
+            result.finding('security', f"Security group '{block.address}' allows SSH (port 22) {opened} "
+                                       "- CRITICAL SECURITY RISK")
+        if low <= RDP_PORT <= high:
+            result.finding('security', f"Security group '{block.address}' allows RDP (port 3389) {opened} "
+                                       "- CRITICAL SECURITY RISK")
+        for port in DATABASE_PORTS:
+            if low <= port <= high:
+                result.finding('security', f"Security group '{block.address}' allows database port {port} {opened}")
+
+
+def check_public_access_block(result: BlockResult, module: 'ModuleContext'):
+    for setting, problem in PUBLIC_ACCESS_BLOCK_SETTINGS.items():
+        value = result.block.attrs.get(setting, False)
+        if unresolved(value):
+            result.depends_on(setting)
+        elif value is not True:
+            result.finding('security', f"S3 bucket '{result.block.address}' {problem}")
+
+
+def check_bucket_versioning(result: BlockResult, module: 'ModuleContext'):
+    for versioning in result.block.nested('versioning_configuration')[:1]:
+        status = versioning.attrs.get('status')
+        if unresolved(status):
+            result.depends_on('versioning status')
+        elif status != 'Enabled':
+            result.finding('best_practices', f"S3 bucket '{result.block.address}' should enable versioning "
+                                             "for data protection")
+
+
+def check_bucket_acl(result: BlockResult, module: 'ModuleContext'):
+    acl = result.block.attrs.get('acl', 'private')
+    if unresolved(acl):
+        result.depends_on('acl')
+    elif acl in PUBLIC_BUCKET_ACLS:
+        result.finding('security', f"S3 bucket '{result.block.address}' uses the public '{acl}' ACL")
+    elif acl not in ('private', 'log-delivery-write', 'bucket-owner-full-control'):
+        result.depends_on('acl')
+
+
+def check_bucket_encryption(result: BlockResult, module: 'ModuleContext'):
+    block = result.block
+    if block.nested('server_side_encryption_configuration'):
+        return
+
+    encrypted = module.encrypted_buckets()
+    name = block.attrs.get('bucket')
+    if block.labels[-1] in encrypted['addresses'] or (isinstance(name, str) and name in encrypted['names']):
+        return
+    if encrypted['unresolved']:
+        result.depends_on('encryption configuration bucket')
+        return
+    result.finding('compliance', f"S3 bucket '{block.address}' should have encryption configured")
+
+
+def check_instance(result: BlockResult, module: 'ModuleContext'):
+    block = result.block
+    attrs = block.attrs
+
+    tags = attrs.get('tags', {})
+    if unresolved(tags):
+        result.depends_on('tags')
+        tags = {}
+    else:
+        missing = [tag for tag in REQUIRED_INSTANCE_TAGS if tag not in tags]
+        if missing:
+            result.finding('compliance', f"EC2 instance '{block.address}' missing required tags: {', '.join(missing)}")
+
+    root_devices = block.nested('root_block_device')
+    encrypted = root_devices[0].attrs.get('encrypted', False) if root_devices else False
+    if unresolved(encrypted):
+        result.depends_on('root_block_device encrypted')
+    elif encrypted is not True:
+        result.finding('security', f"EC2 instance '{block.address}' has unencrypted root volume - encryption required")
+
+    metadata = block.nested('metadata_options')
+    http_tokens = metadata[0].attrs.get('http_tokens') if metadata else None
+    if unresolved(http_tokens):
+        result.depends_on('metadata_options http_tokens')
+    elif http_tokens != 'required':
+        result.finding('security', f"EC2 instance '{block.address}' does not enforce IMDSv2 - security requirement")
+
+    public_ip = attrs.get('associate_public_ip_address', False)
+    environment = tags.get('Environment')
+    if unresolved(public_ip) or (public_ip is True and unresolved(environment)):
+        result.depends_on('associate_public_ip_address')
+    elif public_ip is True and environment == 'prod':
+        result.finding('security', f"EC2 instance '{block.address}' in production should not have public IP")
+
+    monitoring = attrs.get('monitoring', False)
+    if unresolved(monitoring):
+        result.depends_on('monitoring')
+    elif monitoring is not True:
+        result.finding('best_practices', f"EC2 instance '{block.address}' should enable detailed monitoring "
+                                         "for better observability")
+
+    instance_type = attrs.get('instance_type')
+    if isinstance(instance_type, str) and instance_type in DEPRECATED_INSTANCE_TYPES:
+        result.finding('best_practices', f"EC2 instance '{block.address}' uses deprecated instance type "
+                                         f"'{instance_type}'")
+
+
+def check_variable(result: BlockResult, module: 'ModuleContext'):
+    default = result.block.attrs.get('default')
+    if SECRET_NAME.search(result.block.labels[0] if result.block.labels else '') and isinstance(default, str) and default:
+        result.finding('security', f"Variable '{result.block.labels[0]}' has a hard-coded default for a secret "
+                                   "- pass it in at apply time instead")
+
+
+RESOURCE_CHECKS = {
+    'aws_security_group': [check_security_group],
+    'aws_s3_bucket_public_access_block': [check_public_access_block],
+    'aws_s3_bucket_versioning': [check_bucket_versioning],
+    'aws_s3_bucket': [check_bucket_acl, check_bucket_encryption],
+    'aws_instance': [check_instance]
+}
+
+# Everything a covered resource may set for the checks above to be the whole
+# story: {'attrs': attribute names, 'blocks': {nested block: its attribute names}}.
+# Anything else (user_data, bucket policies, dynamic blocks, ...) is left to the model.
+NAMING_ATTRIBUTES = {'tags', 'tags_all', 'description'}
+KNOWN_SHAPES = {
+    'aws_security_group': {
+        'attrs': NAMING_ATTRIBUTES | {'name', 'name_prefix', 'vpc_id', 'revoke_rules_on_delete'},
+        'blocks': {
+            'ingress': {'from_port', 'to_port', 'protocol', 'cidr_blocks', 'ipv6_cidr_blocks', 'description',
+                        'security_groups', 'prefix_list_ids', 'self'},
+            'egress': {'from_port', 'to_port', 'protocol', 'cidr_blocks', 'ipv6_cidr_blocks', 'description',
+                       'security_groups', 'prefix_list_ids', 'self'},
+            'timeouts': {'create', 'delete'}
+        }
+    },
+    'aws_s3_bucket_public_access_block': {
+        'attrs': {'bucket'} | set(PUBLIC_ACCESS_BLOCK_SETTINGS),
+        'blocks': {}
+    },
+    'aws_s3_bucket_versioning': {
+        'attrs': {'bucket', 'expected_bucket_owner'},
+        'blocks': {'versioning_configuration': {'status'}}
+    },
+    'aws_s3_bucket': {
+        'attrs': NAMING_ATTRIBUTES | {'bucket', 'bucket_prefix', 'force_destroy', 'acl'},
+        'blocks': {'server_side_encryption_configuration': None}
+    },
+    'aws_instance': {
+        'attrs': NAMING_ATTRIBUTES | {'ami', 'instance_type', 'subnet_id', 'vpc_security_group_ids', 'key_name',
+                                      'associate_public_ip_address', 'monitoring', 'iam_instance_profile',
+                                      'availability_zone', 'ebs_optimized', 'volume_tags'},
+        'blocks': {
+            'root_block_device': {'encrypted', 'kms_key_id', 'volume_size', 'volume_type', 'iops', 'throughput',
+                                  'delete_on_termination', 'tags'},
+            'metadata_options': {'http_tokens', 'http_endpoint', 'http_put_response_hop_limit',
+                                 'instance_metadata_tags'}
+        }
+    }
+}
+
+# Meta-arguments that don't change what the checks see
+META_ARGUMENTS = {'provider', 'depends_on'}
+META_BLOCKS = {'lifecycle'}
+
+
+def check_known_shape(result: BlockResult, shape: Dict):
+    """Mark every attribute or nested block the checks don't cover as needing the model"""
+
+    block = result.block
+    for name in block.attrs:
+        if name not in shape['attrs'] and name not in META_ARGUMENTS:
+            result.depends_on(name)
+    for nested in block.blocks:
+        if nested.kind in META_BLOCKS:
+            continue
+        if nested.kind not in shape['blocks']:
+            result.depends_on(nested.kind if nested.kind != 'dynamic' else f"dynamic {' '.join(nested.labels)}")
+            continue
+        allowed = shape['blocks'][nested.kind]
+        if allowed is not None and nested.blocks:
+            result.depends_on(f"{nested.kind} {nested.blocks[0].kind}")
+        for name in nested.attrs:
+            if allowed is not None and name not in allowed:
+                result.depends_on(f"{nested.kind} {name}")
+
+
+class ModuleContext:
+    """Resources from every .tf file of the module, for checks that look across files"""
+
+    def __init__(self, blocks: List[Block], directory: Optional[str] = None, current: Optional[str] = None):
+        self.blocks = list(blocks)
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if name.endswith('.tf') and os.path.abspath(path) != os.path.abspath(current or ''):
+                    try:
+                        with open(path, 'r') as f:
+                            self.blocks.extend(parse_blocks(f.read()))
+                    except (OSError, UnicodeDecodeError):
+                        continue
+        self._encrypted = None
+
+    def encrypted_buckets(self) -> Dict:
+        """Buckets with an encryption configuration resource, by address and literal name"""
+
+        if self._encrypted is None:
+            encrypted = {'addresses': set(), 'names': set(), 'unresolved': False}
+            for block in self.blocks:
+                if block.kind != 'resource' or block.labels[:1] != ['aws_s3_bucket_server_side_encryption_configuration']:
+                    continue
+                bucket = block.attrs.get('bucket')
+                if isinstance(bucket, str):
+                    encrypted['names'].add(bucket)
+                    continue
+                referenced = BUCKET_REFERENCE.findall(bucket.text if unresolved(bucket) else '')
+                encrypted['addresses'].update(referenced)
+                encrypted['unresolved'] = encrypted['unresolved'] or not referenced
+            self._encrypted = encrypted
+        return self._encrypted
+
+
+def prescan(code: str, filepath: Optional[str] = None) -> List[Dict]:
+    """Check every top-level block; returns one result per block in file order
+
+    Each result is {'address', 'start', 'end', 'status', 'findings',
+    'ambiguous'} with status 'decided' or 'escalated' and findings as
+    (parse_analysis section, message) pairs.
+    """
+
+    blocks = parse_blocks(code)
+    module = ModuleContext(blocks, os.path.dirname(filepath) if filepath else None, filepath)
+
+    results = []
+    for block in blocks:
+        result = BlockResult(block)
+        if block.kind == 'resource' and block.labels and block.labels[0] in RESOURCE_CHECKS:
+            check_known_shape(result, KNOWN_SHAPES[block.labels[0]])
+            for check in RESOURCE_CHECKS[block.labels[0]]:
+                check(result, module)
+            status = 'escalated' if result.ambiguous else 'decided'
+        elif block.kind in DECLARATION_BLOCKS:
+            if block.kind == 'variable':
+                check_variable(result, module)
+            status = 'decided'
+        else:
+            status = 'escalated'
+
+        results.append({
+            'address': block.address,
+            'start': block.start,
+            'end': block.end,
+            'status': status,
+            'findings': result.findings,
+            'ambiguous': result.ambiguous
+        })
+    return results
+
+
+def as_analysis(results: List[Dict]) -> Dict[str, List[str]]:
+    """Findings of prescan results in the shape parse_analysis returns"""
+
+    analysis = {"security": [], "best_practices": [], "cost": [], "compliance": []}
+    for result in results:
+        for section, message in result['findings']:
+            analysis[section].append(message)
+    return analysis
@@ -7,35 +7,122 @@ Analyzes Terraform code changes and provides security insights
 import os
 import sys
 import json
+import re
+import time
 import subprocess
 import requests
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
+from hcl_context import build_chunks, changed_line_ranges
+from hcl_prescan import as_analysis, prescan
+from review_cache import AnalysisCache, cache_key, git_blob_id
+
+# Files analyzed at once. Match the server's OLLAMA_NUM_PARALLEL: extra requests
+# only wait in Ollama's own queue and eat into their timeout there.
+REVIEW_WORKERS = int(os.environ.get('REVIEW_WORKERS') or os.environ.get('OLLAMA_NUM_PARALLEL') or '4')
+
+# Bump whenever the prompt or parse_analysis changes so cached analyses miss
+PROMPT_VERSION = '3'
+
+# Commit the review diffs against
+REVIEW_DIFF_BASE = os.environ.get('REVIEW_DIFF_BASE', 'HEAD^')
+
+# Estimated tokens of Terraform per prompt. Leaves room in a 2048-token
+# context for the instructions and the num_predict answer.
+REVIEW_PROMPT_TOKENS = int(os.environ.get('REVIEW_PROMPT_TOKENS', '1200'))
+
+# Stream completions and stop as soon as every section has been answered
+REVIEW_STREAM = os.environ.get('REVIEW_STREAM', 'true').lower() == 'true'
+
+# Wall-clock seconds one file may spend on generation, across all its chunks.
+# What arrived when it runs out is still parsed and reported.
+REVIEW_FILE_BUDGET_SECONDS = float(os.environ.get('REVIEW_FILE_BUDGET_SECONDS', '90'))
+
+# Longest wait for the next streamed token, or for a whole non-streamed answer
+REVIEW_REQUEST_TIMEOUT = 30
+
+SECTION_HEADERS = ("SECURITY:", "BEST_PRACTICES:", "COST:", "COMPLIANCE:")
+
+# Lines that clearly close the last section: the END line the prompt asks
+# for, another header (SUMMARY:, ## Notes, **Overall:**) or a rule
+SECTION_END = re.compile(r'^(?:END\.?$|#{1,6}\s|-{3,}$|\*\*[^*]+\*\*:?$|[A-Z][A-Z_ ]*[A-Z]:)')
+
+
+class SectionTracker:
+    """Follows streamed answer lines and tells when all four sections are complete
+
+    The last section (COMPLIANCE) is only complete once a clear end marker
+    follows it (see SECTION_END). Blank lines, bullets and wrapped
+    continuation lines keep it open; without a marker the stream runs
+    until Ollama reports done.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.current = None
+        self.complete = False
+
+    def feed(self, line: str) -> bool:
+        line = line.strip()
+        header = next((h for h in SECTION_HEADERS if line.startswith(h)), None)
+        if header:
+            self.seen.add(header)
+            self.current = header
+        elif (self.current == SECTION_HEADERS[-1] and len(self.seen) == len(SECTION_HEADERS)
+                and SECTION_END.match(line)):
+            self.complete = True
+        return self.complete
+
+
 class OllamaAIReviewer:
     """AI code reviewer using local Ollama models"""
 
-    def __init__(self, model: str = "llama3.1:8b", endpoint: str = "http://localhost:11434"):
+    def __init__(self, model: str = "llama3.1:8b", endpoint: str = "http://localhost:11434",
+                 workers: int = REVIEW_WORKERS):
         self.model = model
         self.endpoint = endpoint
         self.api_url = f"{endpoint}/api/generate"
+        self.workers = max(1, workers)
+        # Cleared when Ollama is down; the review then runs on the pre-scan alone
+        self.available = True
+        self.options = {
+            "temperature": 0.2,
+            "num_predict": 500
+        }
+
+        # One keep-alive connection per worker, shared across files
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.workers))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.workers))
 
     def is_ollama_running(self) -> bool:
         """Check if Ollama service is running"""
         try:
-            response = requests.get(f"{self.endpoint}/api/tags", timeout=2)
+            response = self.session.get(f"{self.endpoint}/api/tags", timeout=2)
             return response.status_code == 200
         except:
             return False
 
-    def analyze_code(self, code: str, filepath: str) -> Dict[str, any]:
-        """Analyze code using AI"""
+    def analyze_code(self, code: str, filepath: str, focused: bool = False,
+                     deadline: Optional[float] = None) -> Dict[str, any]:
+        """Analyze code using AI
+
+        With focused=True, code holds only the changed blocks of the file,
+        each headed by its line numbers. deadline is a time.monotonic()
+        value; a streamed answer is cut off there and returned as partial.
+        """
+
+        scope = ("Changed blocks of this file (each headed by its line numbers; the rest of the file is unchanged)"
+                 if focused else "Code")
 
         prompt = f"""You are a DevSecOps expert reviewing Terraform infrastructure code.
 
 File: {filepath}
 
-Code:
+{scope}:
 ```terraform
 {code}
 ```
@@ -51,22 +138,27 @@ SECURITY: [list issues]
 BEST_PRACTICES: [list violations]
 COST: [list optimizations]
 COMPLIANCE: [list concerns]
+END
 
 Be concise and actionable."""
 
+        if REVIEW_STREAM:
+            return self.stream_analysis(prompt, deadline)
+
+        timeout = REVIEW_REQUEST_TIMEOUT
+        if deadline is not None:
+            timeout = max(min(timeout, deadline - time.monotonic()), 1)
+
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.api_url,
                 json={
                     "model": self.model,
                     "prompt": prompt,
                     "stream": False,
-                    "options": {
-                        "temperature": 0.2,
-                        "num_predict": 500
-                    }
+                    "options": self.options
                 },
-                timeout=30
+                timeout=timeout
             )
 
             if response.status_code == 200:
@@ -82,6 +174,84 @@ Be concise and actionable."""
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def stream_analysis(self, prompt: str, deadline: Optional[float] = None) -> Dict[str, any]:
+        """Read Ollama's NDJSON stream, stopping once the answer is complete or time is up
+
+        Closing the response drops the connection, which makes Ollama stop
+        generating for it.
+        """
+
+        tracker = SectionTracker()
+        text = ""
+        pending = ""
+        stop_reason = "done"
+
+        # A stalled stream can't wait for a token past the deadline either
+        timeout = REVIEW_REQUEST_TIMEOUT
+        if deadline is not None:
+            timeout = max(min(timeout, deadline - time.monotonic()), 1)
+
+        try:
+            response = self.session.post(
+                self.api_url,
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "options": self.options
+                },
+                timeout=timeout,
+                stream=True
+            )
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        try:
+            if response.status_code != 200:
+                return {"success": False, "error": f"API error: {response.status_code}"}
+
+            for raw in response.iter_lines():
+                if not raw:
+                    continue
+                message = json.loads(raw)
+                if message.get("error"):
+                    return {"success": False, "error": message["error"]}
+
+                token = message.get("response", "")
+                text += token
+                pending += token
+                *lines, pending = pending.split('\n')
+                if any(tracker.feed(line) for line in lines):
+                    stop_reason = "complete"
+                    break
+                if message.get("done"):
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    stop_reason = "budget"
+                    break
+
+        except Exception as e:
+            if not text:
+                return {"success": False, "error": str(e)}
+            stop_reason = "error"
+        finally:
+            response.close()
+
+        if stop_reason in ("budget", "error") and pending:
+            # Drop the line that was cut off mid-way
+            text = text[:-len(pending)]
+
+        if not text:
+            return {"success": False, "error": f"No answer before stopping ({stop_reason})"}
+
+        return {
+            "success": True,
+            "analysis": text,
+            "model": self.model,
+            "stop_reason": stop_reason,
+            "partial": stop_reason in ("budget", "error")
+        }
+
     def parse_analysis(self, analysis: str) -> Dict[str, List[str]]:
         """Parse AI response into structured format"""
 
@@ -115,7 +285,19 @@ Be concise and actionable."""
 
         return result
 
-    def generate_review_comment(self, files_analyzed: List[Dict]) -> str:
+    @staticmethod
+    def merge_analyses(parsed: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+        """Combine per-chunk parse_analysis results, dropping repeated items"""
+
+        merged = {"security": [], "best_practices": [], "cost": [], "compliance": []}
+        for analysis in parsed:
+            for section, items in analysis.items():
+                for item in items:
+                    if item not in merged.setdefault(section, []):
+                        merged[section].append(item)
+        return merged
+
+    def generate_review_comment(self, files_analyzed: List[Dict], cache_summary: Optional[str] = None) -> str:
         """Generate formatted review comment"""
 
         comment = "## 🤖 AI-Powered Code Review (Ollama)\n\n"
@@ -158,6 +340,35 @@ Be concise and actionable."""
         if not has_issues:
             comment += "✅ **No issues found!** Code looks good.\n\n"
 
+        decided = sum(f.get('prescan_decided', 0) for f in files_analyzed)
+        escalated = sum(f.get('prescan_escalated', 0) for f in files_analyzed)
+        if decided or escalated:
+            comment += (f"🧮 **Policy pre-scan:** {decided} changed block(s) checked against the policy templates, "
+                        f"{escalated} left for the model\n\n")
+
+        unreviewed = sum(f.get('chunks_unreviewed', 0) for f in files_analyzed)
+        if unreviewed:
+            comment += (f"🔌 **Ollama unavailable:** {unreviewed} chunk(s) of changed code were not reviewed "
+                        "by the model; findings above come from the policy pre-scan only.\n\n")
+
+        for file_data in files_analyzed:
+            if file_data.get('partial'):
+                skipped = file_data.get('chunks_skipped', 0)
+                comment += (f"⏳ **Partial review of `{file_data['filepath']}`:** the time budget ran out"
+                            f"{f' with {skipped} chunk(s) not reviewed' if skipped else ' mid-answer'}.\n\n")
+
+        timed = [f for f in files_analyzed if 'wall_seconds' in f]
+        if timed:
+            comment += "<details><summary>⏱️ Review timings</summary>\n\n"
+            comment += "| File | Analysis | Queue wait | Cache |\n|------|---------:|-----------:|-------|\n"
+            for file_data in timed:
+                comment += (f"| `{file_data['filepath']}` | {file_data['wall_seconds']:.1f}s "
+                            f"| {file_data['queue_seconds']:.1f}s | {'hit' if file_data.get('cached') else 'miss'} |\n")
+            comment += "\n</details>\n\n"
+
+        if cache_summary:
+            comment += f"🗄️ **Analysis cache:** {cache_summary}\n\n"
+
         comment += "---\n"
         comment += "*AI-powered review using free local models via Ollama. "
         comment += "[Learn more](https://ollama.ai)*\n"
@@ -176,7 +387,7 @@ def get_changed_terraform_files() -> List[str]:
         ).stdout.strip()
 
         result = subprocess.run(
-            ['git', 'diff', '--name-only', 'HEAD^', 'HEAD'],
+            ['git', 'diff', '--name-only', REVIEW_DIFF_BASE, 'HEAD'],
             capture_output=True,
             text=True,
             cwd=git_root
@@ -193,6 +404,99 @@ def get_changed_terraform_files() -> List[str]:
         return []
 
 
+def analyze_file(reviewer: OllamaAIReviewer, filepath: str, submitted: float,
+                 cache: Optional[AnalysisCache] = None) -> Dict:
+    """Read and analyze one file, timing the analysis and the wait for a worker"""
+
+    started = time.monotonic()
+    file_data = {'filepath': filepath, 'queue_seconds': started - submitted}
+
+    try:
+        with open(filepath, 'r') as f:
+            code = f.read()
+
+        changed = changed_line_ranges(filepath, REVIEW_DIFF_BASE, 'HEAD', cwd=os.path.dirname(filepath) or None)
+
+        # Blocks the policy templates fully cover are decided here and never reach the model
+        scanned = prescan(code, filepath)
+        if changed is not None:
+            scanned = [block for block in scanned
+                       if any(block['start'] <= end and block['end'] >= start for start, end in changed)]
+        decided = [(block['start'], block['end']) for block in scanned if block['status'] == 'decided']
+        file_data['prescan_decided'] = len(decided)
+        file_data['prescan_escalated'] = len(scanned) - len(decided)
+
+        # Only the remaining blocks the diff touches, packed into prompt-sized chunks
+        chunks = build_chunks(code, changed, REVIEW_PROMPT_TOKENS, exclude=decided)
+        file_data['chunks'] = len(chunks)
+        file_data['prompt_tokens'] = sum(chunk['tokens'] for chunk in chunks)
+
+        analyses = []
+        parsed = [as_analysis(scanned)]
+        hits = 0
+        deadline = started + REVIEW_FILE_BUDGET_SECONDS
+        for index, chunk in enumerate(chunks):
+            if not reviewer.available:
+                file_data['chunks_unreviewed'] = len(chunks) - index
+                break
+            if time.monotonic() >= deadline:
+                file_data['partial'] = True
+                file_data['chunks_skipped'] = len(chunks) - index
+                break
+
+            # Chunks whose text was analyzed before reuse that analysis without calling the model
+            key = cache_key(git_blob_id(chunk['text'].encode('utf-8')), reviewer.model, PROMPT_VERSION,
+                            reviewer.options, filepath, 'stream' if REVIEW_STREAM else 'complete',
+                            focused=changed is not None, changed=changed)
+            cached = cache.get(key) if cache else None
+            if cached:
+                hits += 1
+                analyses.append(cached['analysis'])
+                parsed.append(cached['parsed_analysis'])
+                continue
+
+            # Get AI analysis
+            result = reviewer.analyze_code(chunk['text'], filepath, focused=changed is not None, deadline=deadline)
+            if not result['success']:
+                if time.monotonic() >= deadline:
+                    file_data['partial'] = True
+                    file_data['chunks_skipped'] = len(chunks) - index
+                else:
+                    file_data['error'] = result.get('error', 'Unknown error')
+                break
+
+            analyses.append(result['analysis'])
+            parsed.append(reviewer.parse_analysis(result['analysis']))
+            if result.get('partial'):
+                # A cut-off answer is reported but never reused
+                file_data['partial'] = True
+            elif cache:
+                cache.put(key, {'analysis': analyses[-1], 'parsed_analysis': parsed[-1]})
+
+        if 'error' not in file_data:
+            file_data['analysis'] = '\n\n'.join(analyses)
+            file_data['parsed_analysis'] = reviewer.merge_analyses(parsed)
+            file_data['cached'] = bool(chunks) and hits == len(chunks)
+
+    except Exception as e:
+        file_data['error'] = f"Error reading file: {e}"
+
+    file_data['wall_seconds'] = time.monotonic() - started
+    return file_data
+
+
+def analyze_files(reviewer: OllamaAIReviewer, filepaths: List[str],
+                  cache: Optional[AnalysisCache] = None) -> List[Dict]:
+    """Analyze files on up to reviewer.workers threads; results keep the input order"""
+
+    workers = min(reviewer.workers, len(filepaths))
+    submitted = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='review') as pool:
+        futures = [pool.submit(analyze_file, reviewer, filepath, submitted, cache) for filepath in filepaths]
+        return [future.result() for future in futures]
+
+
 def main():
     """Main function"""
 
@@ -203,15 +507,15 @@ def main():
     reviewer = OllamaAIReviewer()
 
     # Check if Ollama is running
-    if not reviewer.is_ollama_running():
-        print("❌ Error: Ollama is not running!")
-        print("Please start Ollama first:")
+    reviewer.available = reviewer.is_ollama_running()
+    if reviewer.available:
+        print(f"✅ Connected to Ollama at {reviewer.endpoint}")
+        print(f"📦 Using model: {reviewer.model}\n")
+    else:
+        print("⚠️ Ollama is not running - reviewing with the deterministic pre-scan only")
+        print("To include AI analysis, start Ollama first:")
         print("  - Linux/Mac: ollama serve")
-        print("  - Or run: ./ai-assistant/ollama-setup.sh")
-        sys.exit(1)
-
-    print(f"✅ Connected to Ollama at {reviewer.endpoint}")
-    print(f"📦 Using model: {reviewer.model}\n")
+        print("  - Or run: ./ai-assistant/ollama-setup.sh\n")
 
     # Get changed files
     changed_files = get_changed_terraform_files()
@@ -220,38 +524,39 @@ def main():
         print("ℹ️ No Terraform files changed")
         sys.exit(0)
 
-    print(f"📝 Analyzing {len(changed_files)} file(s)...\n")
-
-    # Analyze each file
-    files_analyzed = []
+    print(f"📝 Analyzing {len(changed_files)} file(s) with {min(reviewer.workers, len(changed_files))} worker(s)...\n")
 
-    for filepath in changed_files:
-        print(f"🔍 Analyzing: {filepath}")
+    # Analyze files concurrently; results come back in file order
+    cache = AnalysisCache()
+    review_started = time.monotonic()
+    results = analyze_files(reviewer, changed_files, cache)
+    review_seconds = time.monotonic() - review_started
+    cache.evict()
 
-        try:
-            with open(filepath, 'r') as f:
-                code = f.read()
+    files_analyzed = []
 
-            # Get AI analysis
-            result = reviewer.analyze_code(code, filepath)
-
-            if result['success']:
-                parsed = reviewer.parse_analysis(result['analysis'])
-                files_analyzed.append({
-                    'filepath': filepath,
-                    'analysis': result['analysis'],
-                    'parsed_analysis': parsed
-                })
-                print(f"  ✅ Complete\n")
+    for file_data in results:
+        took = 'cached' if file_data.get('cached') else f"{file_data['wall_seconds']:.1f}s"
+        print(f"🔍 {file_data['filepath']} ({took}, queued {file_data['queue_seconds']:.1f}s, "
+              f"{file_data.get('prescan_decided', 0)} block(s) pre-scanned, "
+              f"{file_data.get('chunks', 0)} chunk(s), ~{file_data.get('prompt_tokens', 0)} tokens)")
+        if 'error' in file_data:
+            print(f"  ❌ Error: {file_data['error']}\n")
+        else:
+            files_analyzed.append(file_data)
+            if file_data.get('chunks_unreviewed'):
+                print(f"  🧮 Pre-scan only ({file_data['chunks_unreviewed']} chunk(s) not sent to the model)\n")
             else:
-                print(f"  ❌ Error: {result.get('error', 'Unknown error')}\n")
+                print("  ⏳ Partial (time budget)\n" if file_data.get('partial') else "  ✅ Complete\n")
 
-        except Exception as e:
-            print(f"  ❌ Error reading file: {e}\n")
+    slowest = max(file_data['wall_seconds'] for file_data in results)
+    total = sum(file_data['wall_seconds'] for file_data in results)
+    print(f"⏱️ Review took {review_seconds:.1f}s (slowest file {slowest:.1f}s, sum of files {total:.1f}s)")
+    print(f"🗄️ Analysis cache: {cache.summary()}\n")
 
     # Generate review comment
     if files_analyzed:
-        comment = reviewer.generate_review_comment(files_analyzed)
+        comment = reviewer.generate_review_comment(files_analyzed, cache.summary())
 
         # Save to file
         output_file = 'ai_review_output.md'
@@ -0,0 +1,139 @@
+"""
+Content-Addressed Analysis Cache for the PR Reviewer
+Reuses LLM analyses of file contents that were already reviewed
+
+Entries are keyed by the git blob id of the code sent to the model (a
+prompt chunk of changed blocks, see hcl_context) plus everything else that
+shapes the answer: model, prompt version, generation options, review mode
+(streamed or complete answers), the file path named in the prompt and the
+changed line ranges the chunk was focused on. A push
+that leaves those blocks unchanged therefore costs no LLM call, and
+changing the prompt or model naturally misses.
+
+Layout (restore the whole directory between CI runs, e.g. with
+actions/cache keyed on the PR number):
+
+    <cache dir>/v1/<first 2 hex chars of key>/<key>.json
+
+Each entry's mtime is bumped on every hit, and the least recently used
+entries are evicted once the directory exceeds its byte budget.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+REVIEW_CACHE_DIR = os.environ.get('REVIEW_CACHE_DIR', '.ai-review-cache')
+REVIEW_CACHE_MAX_BYTES = int(os.environ.get('REVIEW_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+CACHE_LAYOUT_VERSION = 'v1'
+
+
+def git_blob_id(content: bytes) -> str:
+    """The id git gives a blob with this content (same as `git hash-object`)"""
+
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def cache_key(blob_id: str, model: str, prompt_version: str, options: Dict, filepath: str, mode: str,
+              focused: bool = False, changed: Optional[List[Tuple[int, int]]] = None) -> str:
+    """Key over everything that shapes the answer; the file path is part of the prompt
+
+    focused and changed are the diff the chunk was cut for, so the same
+    blob reviewed against a different diff gets its own entry.
+    """
+
+    material = json.dumps({
+        'blob': blob_id,
+        'model': model,
+        'prompt_version': prompt_version,
+        'options': options,
+        'filepath': filepath,
+        'mode': mode,
+        'focused': focused,
+        'changed': [list(line_range) for line_range in changed or []]
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """On-disk, size-bounded LRU cache of analyses; safe to share between threads"""
+
+    def __init__(self, directory: str = REVIEW_CACHE_DIR, max_bytes: int = REVIEW_CACHE_MAX_BYTES):
+        self.root = os.path.join(directory, CACHE_LAYOUT_VERSION)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({**entry, 'cached_at': time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write review cache entry: {e}")
+            return
+
+        with self._lock:
+            self.stats['writes'] += 1
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits its budget"""
+
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.stats['evictions'] += evicted
+            self.stats['bytes'] = total
+        return evicted
+
+    def summary(self) -> str:
+        lookups = self.stats['hits'] + self.stats['misses']
+        rate = f" ({self.stats['hits'] / lookups:.0%} hit rate)" if lookups else ''
+        return (f"{self.stats['hits']} hit(s), {self.stats['misses']} miss(es){rate}, "
+                f"{self.stats['evictions']} eviction(s)")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Cold-Start Benchmark for the Lambda Functions
+Measures handler import time and first-invocation latency against stubbed AWS
+
+Every run imports the handler in a fresh interpreter, like a new Lambda
+container, then invokes it twice with a sample event. AWS calls are answered
+locally, so the numbers reflect our own init and client construction cost.
+
+Usage:
+    python benchmarks/cold_start.py --runs 10 --output cold-start.json
+    python benchmarks/cold_start.py --max-import-ms 300 --max-first-invoke-ms 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import (FUNCTIONS, SAMPLE_EVENTS, SAMPLE_RESPONSES, StubbedAWS,  # noqa: E402
+                     load_handler, prepare_environment)
+
+METRICS = ['import_ms', 'first_invoke_ms', 'warm_invoke_ms']
+
+
+def measure_once(function_name: str) -> Dict:
+    """Import and invoke one handler in this (fresh) interpreter"""
+
+    prepare_environment()
+    modules_before = len(sys.modules)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        handler = load_handler(function_name)
+        import_ms = (time.perf_counter() - start) * 1000
+
+        from shared.aws_clients import provider
+        stubs = StubbedAWS(SAMPLE_RESPONSES[function_name])
+        stubs.install(provider)
+
+        event = SAMPLE_EVENTS[function_name]
+
+        start = time.perf_counter()
+        handler.lambda_handler(event, None)
+        first_invoke_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        handler.lambda_handler(event, None)
+        warm_invoke_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'import_ms': round(import_ms, 2),
+        'first_invoke_ms': round(first_invoke_ms, 2),
+        'warm_invoke_ms': round(warm_invoke_ms, 2),
+        'modules_imported': len(sys.modules) - modules_before,
+        'clients_created': [service for service, _ in provider.created_clients()],
+        'aws_calls': stubs.total_calls()
+    }
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'median': round(statistics.median(ordered), 2),
+        'p90': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 2),
+        'max': round(ordered[-1], 2)
+    }
+
+
+def run_function(function_name: str, runs: int) -> Dict:
+    """Spawn one fresh interpreter per run and aggregate the results"""
+
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, __file__, '--child', function_name],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    result = {metric: summarize([s[metric] for s in samples]) for metric in METRICS}
+    result['runs'] = runs
+    result['modules_imported'] = samples[-1]['modules_imported']
+    result['clients_created'] = samples[-1]['clients_created']
+    result['aws_calls'] = samples[-1]['aws_calls']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lambda cold-start benchmark')
+    parser.add_argument('--function', choices=FUNCTIONS, action='append',
+                        help='Function to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per function')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--max-import-ms', type=float,
+                        help='Fail if median import time exceeds this')
+    parser.add_argument('--max-first-invoke-ms', type=float,
+                        help='Fail if median first-invocation latency exceeds this')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.child)))
+        return
+
+    results = {}
+    for function_name in args.function or FUNCTIONS:
+        print(f"⏱️  Measuring {function_name} ({args.runs} cold starts)...")
+        results[function_name] = run_function(function_name, args.runs)
+
+    print(f"\n{'Function':<20}{'import p50':>12}{'first p50':>12}{'warm p50':>12}  clients")
+    for function_name, result in results.items():
+        print(f"{function_name:<20}"
+              f"{result['import_ms']['median']:>10.1f}ms"
+              f"{result['first_invoke_ms']['median']:>10.1f}ms"
+              f"{result['warm_invoke_ms']['median']:>10.1f}ms"
+              f"  {', '.join(result['clients_created']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': time.time(), 'results': results}, f, indent=2)
+        print(f"\n✅ Results saved to: {args.output}")
+
+    regressions = []
+    for function_name, result in results.items():
+        if args.max_import_ms and result['import_ms']['median'] > args.max_import_ms:
+            regressions.append(f"{function_name} import {result['import_ms']['median']}ms "
+                               f"> {args.max_import_ms}ms")
+        if args.max_first_invoke_ms and result['first_invoke_ms']['median'] > args.max_first_invoke_ms:
+            regressions.append(f"{function_name} first invoke {result['first_invoke_ms']['median']}ms "
+                               f"> {args.max_first_invoke_ms}ms")
+
+    if regressions:
+        print("\n❌ Cold-start regression:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Synthetic Event Corpus for the Replay Benchmark
+CloudTrail, GuardDuty, Security Hub and Config events plus the AWS responses they need
+
+Every scenario is generated from a fixed seed, so two runs (or two commits)
+replay exactly the same events. Canned responses are callables where the
+answer depends on the request, e.g. DescribeInstances returns the instances
+named in its filter.
+"""
+
+import json
+import random
+from typing import Any, Dict, List, NamedTuple
+
+from harness import error_response
+
+ACCOUNT_ID = '123456789012'
+REGION = 'us-east-1'
+SEED = 20260101
+
+
+class Scenario(NamedTuple):
+    """A named sequence of Lambda events replayed against one function"""
+
+    function: str
+    name: str
+    description: str
+    events: List[Dict[str, Any]]
+    responses: Dict[str, Any]
+
+
+def _event_time(index: int) -> str:
+    return f"2026-01-01T00:{(index // 60) % 60:02d}:{index % 60:02d}Z"
+
+
+def cloudtrail_event(index: int, source: str, event_name: str, request_parameters: Dict,
+                     response_elements: Dict = None, event_id: str = None) -> Dict:
+    """EventBridge envelope around a CloudTrail management event"""
+
+    return {
+        'version': '0',
+        'id': f"evt-{index:06d}",
+        'source': source,
+        'detail-type': 'AWS API Call via CloudTrail',
+        'account': ACCOUNT_ID,
+        'time': _event_time(index),
+        'region': REGION,
+        'detail': {
+            'eventID': event_id or f"ct-{index:06d}",
+            'eventName': event_name,
+            'eventTime': _event_time(index),
+            'eventSource': f"{source.split('.')[-1]}.amazonaws.com",
+            'awsRegion': REGION,
+            'requestParameters': request_parameters,
+            'responseElements': response_elements
+        }
+    }
+
+
+def security_group_id(n: int) -> str:
+    return f"sg-{n:017x}"
+
+
+def instance_id(n: int) -> str:
+    return f"i-{n:017x}"
+
+
+# Canned AWS answers for the auto-remediation scenarios
+
+def describe_security_groups(params: Dict) -> Dict:
+    return {
+        'SecurityGroups': [{
+            'GroupId': group_id,
+            'GroupName': f"benchmark-{group_id}",
+            'VpcId': 'vpc-0benchmark',
+            'IpPermissions': [
+                {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]},
+                {'IpProtocol': 'tcp', 'FromPort': 3389, 'ToPort': 3389, 'Ipv6Ranges': [{'CidrIpv6': '::/0'}]},
+                {'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]},
+                {'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'IpRanges': [{'CidrIp': '10.0.0.0/16'}]}
+            ]
+        } for group_id in params.get('GroupIds', [])]
+    }
+
+
+def describe_instances(params: Dict) -> Dict:
+    ids = params.get('InstanceIds') or next(
+        (f['Values'] for f in params.get('Filters', []) if f['Name'] == 'instance-id'), []
+    )
+    return {
+        'Reservations': [{
+            'Instances': [{
+                'InstanceId': iid,
+                'VpcId': 'vpc-0benchmark',
+                'Tags': [{'Key': 'Owner', 'Value': 'benchmark'}] if int(iid[2:], 16) % 2 else [],
+                'MetadataOptions': {'HttpTokens': 'optional', 'HttpPutResponseHopLimit': 2}
+            } for iid in ids]
+        }]
+    }
+
+
+AUTO_REMEDIATION_RESPONSES = {
+    'ec2.DescribeSecurityGroups': describe_security_groups,
+    'ec2.RevokeSecurityGroupIngress': {'Return': True},
+    'ec2.DescribeInstances': describe_instances,
+    'ec2.CreateTags': {},
+    'ec2.ModifyInstanceMetadataOptions': {'InstanceMetadataOptions': {'HttpTokens': 'required'}},
+    's3.GetBucketEncryption': error_response('ServerSideEncryptionConfigurationNotFoundError', status_code=404),
+    's3.GetBucketVersioning': {'Status': 'Suspended'},
+    's3.GetPublicAccessBlock': error_response('NoSuchPublicAccessBlockConfiguration', status_code=404),
+    's3.PutBucketEncryption': {},
+    's3.PutBucketVersioning': {},
+    's3.PutPublicAccessBlock': {},
+    'securityhub.BatchUpdateFindings': lambda params: {
+        'ProcessedFindings': params['FindingIdentifiers'], 'UnprocessedFindings': []
+    },
+    'sns.Publish': {'MessageId': 'benchmark'},
+}
+
+
+def auto_remediation_scenarios(rng: random.Random) -> List[Scenario]:
+    sg_names = ['AuthorizeSecurityGroupIngress', 'AuthorizeSecurityGroupEgress']
+
+    def sg_event(index: int, group: int, event_id: str = None) -> Dict:
+        return cloudtrail_event(index, 'aws.ec2', rng.choice(sg_names),
+                                {'groupId': security_group_id(group)}, event_id=event_id)
+
+    sg_burst = [sg_event(i, rng.randrange(20)) for i in range(200)]
+
+    # At-least-once delivery: 20 distinct events, each delivered five times
+    duplicates = [sg_event(i, i % 20, event_id=f"dup-{i % 20:04d}") for i in range(100)]
+
+    launches = []
+    next_instance = 0
+    for i in range(20):
+        count = rng.choice([1, 2, 5, 10, 50])
+        items = [{'instanceId': instance_id(next_instance + n)} for n in range(count)]
+        next_instance += count
+        launches.append(cloudtrail_event(
+            i, 'aws.ec2', 'RunInstances', {'instanceType': 't3.micro', 'minCount': count},
+            response_elements={'reservationId': f"r-{i:017x}", 'instancesSet': {'items': items}}
+        ))
+
+    state_changes = [{
+        'version': '0',
+        'id': f"state-{i:06d}",
+        'source': 'aws.ec2',
+        'detail-type': 'EC2 Instance State-change Notification',
+        'account': ACCOUNT_ID,
+        'time': _event_time(i),
+        'region': REGION,
+        'detail': {'instance-id': instance_id(10000 + i), 'state': rng.choice(['pending', 'running'])}
+    } for i in range(100)]
+
+    bucket_names = ['PutBucketAcl', 'PutBucketPolicy', 'DeleteBucketEncryption', 'DeleteBucketPublicAccessBlock']
+    buckets = [cloudtrail_event(i, 'aws.s3', rng.choice(bucket_names),
+                                {'bucketName': f"benchmark-bucket-{rng.randrange(10)}"})
+               for i in range(50)]
+
+    sqs_batch = {'Records': [{
+        'messageId': f"msg-{i:06d}",
+        'eventSource': 'aws:sqs',
+        'body': json.dumps(sg_event(10000 + i, rng.randrange(50)))
+    } for i in range(500)]}
+
+    unknown = [cloudtrail_event(i, 'aws.ec2', 'DescribeInstances', {}) for i in range(1000)]
+
+    scenarios = [
+        ('sg-single', 'One AuthorizeSecurityGroupIngress event', [sg_event(0, 0)]),
+        ('sg-burst', '200 security group events across 20 groups', sg_burst),
+        ('sg-duplicates', '20 events each delivered 5 times', duplicates),
+        ('run-instances', '20 RunInstances launches of 1-50 instances', launches),
+        ('instance-state-changes', '100 EC2 Instance State-change Notifications', state_changes),
+        ('s3-posture', '50 bucket posture changes across 10 buckets', buckets),
+        ('sqs-batch-500', 'One SQS batch of 500 security group events over 50 groups', [sqs_batch]),
+        ('unmatched', '1000 events no rule matches', unknown),
+    ]
+    return [Scenario('auto-remediation', name, description, events, AUTO_REMEDIATION_RESPONSES)
+            for name, description, events in scenarios]
+
+
+# Canned AWS answers for the security-response scenarios
+
+SECURITY_RESPONSE_RESPONSES = {
+    'ec2.DescribeSecurityGroups': {'SecurityGroups': []},
+    'ec2.CreateSecurityGroup': lambda params: {'GroupId': f"sg-iso-{params['VpcId']}"},
+    'ec2.RevokeSecurityGroupEgress': {'Return': True},
+    'ec2.CreateTags': {},
+    'ec2.ModifyInstanceAttribute': {},
+    'ec2.CreateSnapshots': lambda params: {'Snapshots': [
+        {'SnapshotId': f"snap-{params['InstanceSpecification']['InstanceId']}-{n}",
+         'VolumeId': f"vol-0benchmark0000{n}", 'State': 'pending'}
+        for n in (1, 2)
+    ]},
+    's3.PutPublicAccessBlock': {},
+    'securityhub.BatchUpdateFindings': lambda params: {
+        'ProcessedFindings': params['FindingIdentifiers'], 'UnprocessedFindings': []
+    },
+    'sns.Publish': {'MessageId': 'benchmark'},
+}
+
+SECURITY_HUB_TITLES = [
+    ('S3 bucket allows public read access', 'AwsS3Bucket', 'HIGH'),
+    ('S3 general purpose buckets should block public access', 'AwsS3Bucket', 'CRITICAL'),
+    ('EC2 instances should use IMDSv2', 'AwsEc2Instance', 'MEDIUM'),
+    ('Security groups should not allow unrestricted SSH', 'AwsEc2SecurityGroup', 'HIGH'),
+    ('IAM root user access key should not exist', 'AwsAccount', 'CRITICAL'),
+]
+
+
+def security_hub_finding(n: int, rng: random.Random) -> Dict:
+    title, resource_type, label = rng.choice(SECURITY_HUB_TITLES)
+    if resource_type == 'AwsS3Bucket':
+        resource_id = f"arn:aws:s3:::benchmark-bucket-{n % 25}"
+    elif resource_type == 'AwsEc2Instance':
+        resource_id = f"arn:aws:ec2:{REGION}:{ACCOUNT_ID}:instance/{instance_id(n)}"
+    elif resource_type == 'AwsEc2SecurityGroup':
+        resource_id = f"arn:aws:ec2:{REGION}:{ACCOUNT_ID}:security-group/{security_group_id(n % 40)}"
+    else:
+        resource_id = f"AWS::::Account:{ACCOUNT_ID}"
+
+    return {
+        'SchemaVersion': '2018-10-08',
+        'Id': f"arn:aws:securityhub:{REGION}:{ACCOUNT_ID}:finding/benchmark-{n:06d}",
+        'ProductArn': f"arn:aws:securityhub:{REGION}::product/aws/securityhub",
+        'GeneratorId': f"benchmark-control-{SECURITY_HUB_TITLES.index((title, resource_type, label))}",
+        'AwsAccountId': ACCOUNT_ID,
+        'Title': title,
+        'Severity': {'Label': label},
+        'Resources': [{'Type': resource_type, 'Id': resource_id, 'Region': REGION}],
+        'Workflow': {'Status': 'NEW'},
+        'RecordState': 'ACTIVE',
+        'UpdatedAt': '2026-01-01T00:00:00.000Z'
+    }
+
+
+def security_hub_event(index: int, findings: List[Dict]) -> Dict:
+    return {
+        'version': '0',
+        'id': f"sh-{index:06d}",
+        'source': 'aws.securityhub',
+        'detail-type': 'Security Hub Findings - Imported',
+        'account': ACCOUNT_ID,
+        'time': _event_time(index),
+        'region': REGION,
+        'detail': {'findings': findings}
+    }
+
+
+def guardduty_event(index: int, rng: random.Random, severity: float = None) -> Dict:
+    finding_type = rng.choice([
+        'UnauthorizedAccess:EC2/SSHBruteForce',
+        'CryptoCurrency:EC2/BitcoinTool.B!DNS',
+        'Recon:EC2/PortProbeUnprotectedPort',
+        'Trojan:EC2/DNSDataExfiltration'
+    ])
+    return {
+        'version': '0',
+        'id': f"gd-{index:06d}",
+        'source': 'aws.guardduty',
+        'detail-type': 'GuardDuty Finding',
+        'account': ACCOUNT_ID,
+        'time': _event_time(index),
+        'region': REGION,
+        'detail': {
+            'id': f"gd-finding-{index:06d}",
+            'type': finding_type,
+            'severity': severity if severity is not None else rng.choice([2.0, 5.0, 7.5, 8.0]),
+            'resource': {
+                'resourceType': 'Instance',
+                'instanceDetails': {
+                    'instanceId': instance_id(20000 + index % 30),
+                    'networkInterfaces': [{'vpcId': f"vpc-0benchmark{index % 3:04d}"}]
+                }
+            }
+        }
+    }
+
+
+def config_event(index: int, rng: random.Random) -> Dict:
+    rule = rng.choice(['s3-bucket-server-side-encryption-enabled', 'restricted-ssh',
+                       'ec2-imdsv2-check', 'encrypted-volumes'])
+    return {
+        'version': '0',
+        'id': f"cfg-{index:06d}",
+        'source': 'aws.config',
+        'detail-type': 'Config Rules Compliance Change',
+        'account': ACCOUNT_ID,
+        'time': _event_time(index),
+        'region': REGION,
+        'detail': {
+            'configRuleName': rule,
+            'resourceType': 'AWS::S3::Bucket',
+            'resourceId': f"benchmark-bucket-{index % 10}",
+            'newEvaluationResult': {'complianceType': rng.choice(['NON_COMPLIANT', 'COMPLIANT'])},
+            'oldEvaluationResult': {'complianceType': 'COMPLIANT'}
+        }
+    }
+
+
+def repeat_finding(event: Dict) -> Dict:
+    """Pin a GuardDuty event to one of two instances with a containment finding type"""
+
+    index = int(event['detail']['id'].rsplit('-', 1)[-1])
+    event['detail']['type'] = 'CryptoCurrency:EC2/BitcoinTool.B!DNS'
+    event['detail']['resource']['instanceDetails']['instanceId'] = instance_id(29000 + index % 2)
+    return event
+
+
+def security_response_scenarios(rng: random.Random) -> List[Scenario]:
+    finding_counter = iter(range(1_000_000))
+
+    def findings(count: int) -> List[Dict]:
+        return [security_hub_finding(next(finding_counter), rng) for _ in range(count)]
+
+    guardduty_single = [guardduty_event(0, rng, severity=8.0)]
+    guardduty_burst = [guardduty_event(i, rng) for i in range(50)]
+    securityhub_single = [security_hub_event(0, findings(1))]
+    batches = [findings(100) for _ in range(20)]
+    # What Security Hub sends back once the batches above have been resolved
+    redelivered = [[{**finding, 'Workflow': {'Status': 'RESOLVED'}} for finding in batch] for batch in batches]
+
+    scenarios = [
+        ('guardduty-single', 'One high-severity GuardDuty finding that isolates an instance', guardduty_single),
+        ('guardduty-burst', '50 GuardDuty findings of mixed severity on 30 instances in 3 VPCs', guardduty_burst),
+        ('securityhub-single', 'One Security Hub finding', securityhub_single),
+        ('securityhub-batch-100', '20 Security Hub events of 100 findings each',
+         [security_hub_event(i, batch) for i, batch in enumerate(batches)]),
+        ('securityhub-redelivery', 'The same 20 events re-delivered after their findings were resolved',
+         [security_hub_event(i, batch) for i, batch in enumerate(redelivered)]),
+        ('config-burst', '100 Config compliance changes', [config_event(i, rng) for i in range(100)]),
+        ('guardduty-repeat', '40 containment findings for the same 2 compromised instances',
+         [repeat_finding(guardduty_event(i, rng, severity=8.0)) for i in range(40)]),
+    ]
+    return [Scenario('security-response', name, description, events, SECURITY_RESPONSE_RESPONSES)
+            for name, description, events in scenarios]
+
+
+def build_corpus(seed: int = SEED) -> Dict[str, Dict[str, Scenario]]:
+    """Every scenario, keyed by function then scenario name"""
+
+    corpus: Dict[str, Dict[str, Scenario]] = {}
+    for factory in (auto_remediation_scenarios, security_response_scenarios):
+        for scenario in factory(random.Random(seed)):
+            corpus.setdefault(scenario.function, {})[scenario.name] = scenario
+    return corpus
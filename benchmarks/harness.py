@@ -0,0 +1,161 @@
+"""
+Benchmark Harness for the Lambda Functions
+Loads a handler in-process and answers its AWS calls from canned responses
+"""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+LAMBDA_ROOT = REPO_ROOT / 'lambda'
+FUNCTIONS = ['auto-remediation', 'security-response']
+
+# Offline credentials and region so botocore never looks further
+OFFLINE_ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'AWS_SESSION_TOKEN': 'benchmark',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_REGION': 'us-east-1',
+    'AWS_EC2_METADATA_DISABLED': 'true',
+    'SNS_TOPIC_ARN': '',
+}
+
+# A canned response is a parsed dict, or a callable taking the request params
+CannedResponse = Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]
+
+
+def prepare_environment(overrides: Optional[Dict[str, str]] = None):
+    """Point boto3 at offline credentials before any handler is imported"""
+
+    os.environ.update(OFFLINE_ENVIRONMENT)
+    if overrides:
+        os.environ.update(overrides)
+
+
+def load_handler(function_name: str):
+    """Import lambda/<function>/handler.py the way the Lambda runtime would"""
+
+    function_dir = LAMBDA_ROOT / function_name
+    for path in (str(LAMBDA_ROOT), str(function_dir)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    module_name = f"{function_name.replace('-', '_')}_handler"
+    spec = importlib.util.spec_from_file_location(module_name, function_dir / 'handler.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def error_response(code: str, message: str = '', status_code: int = 400) -> Dict[str, Any]:
+    """Canned AWS error, raised by botocore as the modeled exception for code"""
+
+    return {
+        'Error': {'Code': code, 'Message': message or code},
+        'ResponseMetadata': {'HTTPStatusCode': status_code}
+    }
+
+
+class StubbedAWS:
+    """Answers every AWS call made through the shared client provider
+
+    Registers a botocore ``before-call`` handler on each client the
+    provider builds, the same short-circuit botocore's Stubber uses, but
+    keyed by operation so the same responses can serve any number of
+    events. Calls are counted per ``service.Operation``.
+    """
+
+    def __init__(self, responses: Dict[str, CannedResponse]):
+        self.responses = responses
+        self.calls: Dict[str, int] = {}
+
+    def install(self, provider):
+        """Stub every client created by provider from now on"""
+
+        provider.add_client_hook(self._attach)
+
+    def _attach(self, service_name: str, client):
+        client.meta.events.register('before-parameter-build.*.*', self._remember_params)
+        client.meta.events.register(
+            'before-call.*.*',
+            lambda model, context, **kwargs: self._respond(service_name, model, context)
+        )
+
+    @staticmethod
+    def _remember_params(params, context, **kwargs):
+        # API parameters as the caller passed them, before serialization
+        context['stubbed_params'] = dict(params)
+
+    def _respond(self, service_name: str, model, context):
+        from botocore.awsrequest import AWSResponse
+
+        key = f"{service_name}.{model.name}"
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+        canned = self.responses.get(key, {})
+        parsed = canned(context.get('stubbed_params', {})) if callable(canned) else canned
+        status_code = parsed.get('ResponseMetadata', {}).get('HTTPStatusCode', 200)
+        return AWSResponse(None, status_code, {}, None), parsed
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+
+# One representative event and the AWS responses it needs, per function
+SAMPLE_EVENTS = {
+    'auto-remediation': {
+        'version': '0',
+        'source': 'aws.ec2',
+        'detail-type': 'AWS API Call via CloudTrail',
+        'time': '2026-01-01T00:00:00Z',
+        'detail': {
+            'eventID': 'benchmark-0001',
+            'eventName': 'AuthorizeSecurityGroupIngress',
+            'eventTime': '2026-01-01T00:00:00Z',
+            'requestParameters': {'groupId': 'sg-0123456789abcdef0'}
+        }
+    },
+    'security-response': {
+        'version': '0',
+        'source': 'aws.securityhub',
+        'detail-type': 'Security Hub Findings - Imported',
+        'detail': {
+            'findings': [{
+                'Id': 'benchmark-finding-0001',
+                'ProductArn': 'arn:aws:securityhub:us-east-1::product/aws/securityhub',
+                'Title': 'S3 bucket allows public read access',
+                'Severity': {'Label': 'HIGH'},
+                'Resources': [{'Type': 'AwsS3Bucket', 'Id': 'arn:aws:s3:::benchmark-bucket'}]
+            }]
+        }
+    },
+}
+
+SAMPLE_RESPONSES = {
+    'auto-remediation': {
+        'ec2.DescribeSecurityGroups': {
+            'SecurityGroups': [{
+                'GroupId': 'sg-0123456789abcdef0',
+                'GroupName': 'benchmark',
+                'IpPermissions': [{
+                    'IpProtocol': 'tcp',
+                    'FromPort': 22,
+                    'ToPort': 22,
+                    'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
+                }]
+            }]
+        },
+        'ec2.RevokeSecurityGroupIngress': {'Return': True},
+    },
+    'security-response': {
+        's3.PutPublicAccessBlock': {},
+    },
+}
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Offline Replay Benchmark for the Lambda Functions
+Replays a synthetic event corpus in-process against stubbed AWS and reports throughput
+
+Each scenario (see corpus.py) runs in a fresh interpreter so warm caches and
+peak RSS don't leak between scenarios. Every AWS call is answered by the
+StubbedAWS harness, so the numbers measure our own handler work: events per
+second, AWS calls per event, p50/p99 handler latency and peak RSS.
+
+The EC2 call scheduler is given unlimited budgets unless --paced is passed,
+otherwise the real EC2 rate tiers would dominate every burst scenario.
+
+Usage:
+    python benchmarks/replay.py --output replay.json
+    python benchmarks/replay.py --scenario sg-burst --scenario securityhub-batch-100
+    python benchmarks/replay.py --baseline replay-main.json --max-slowdown 0.25
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import ACCOUNT_ID, REGION, build_corpus  # noqa: E402
+from harness import REPO_ROOT, StubbedAWS, load_handler, prepare_environment  # noqa: E402
+
+REPLAY_ENVIRONMENT = {
+    'SNS_TOPIC_ARN': f"arn:aws:sns:{REGION}:{ACCOUNT_ID}:benchmark-notifications",
+    'EVENT_LOG_SAMPLE_RATE': '0',
+    'DRY_RUN': 'false',
+    'AUTO_FIX_ENABLED': 'true',
+}
+
+# Scenarios smaller than this are dominated by the cold first invocation,
+# so only their AWS call counts are compared against a baseline
+MIN_EVENTS_FOR_THROUGHPUT = 50
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def logical_events(event: Dict) -> int:
+    """Events carried by one invocation: SQS batches count their records"""
+
+    return len(event['Records']) if event.get('Records') else 1
+
+
+def invocation_errors(response: Dict) -> int:
+    """Errors reported by a handler response, whichever shape it has"""
+
+    if 'batchItemFailures' in response:
+        return len(response['batchItemFailures'])
+
+    body = json.loads(response.get('body') or '{}')
+    return len(body.get('errors', [])) + (1 if body.get('error') else 0)
+
+
+def measure_scenario(function_name: str, scenario_name: str, paced: bool) -> Dict:
+    """Replay one scenario in this (fresh) interpreter"""
+
+    prepare_environment(REPLAY_ENVIRONMENT)
+    scenario = build_corpus()[function_name][scenario_name]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        handler = load_handler(function_name)
+
+        from shared.aws_clients import provider
+        stubs = StubbedAWS(scenario.responses)
+        stubs.install(provider)
+
+        scheduler = getattr(handler, 'throttle', None)
+        if scheduler is not None and not paced:
+            scheduler.tiers = {family: (1e9, 1e9) for family in scheduler.tiers}
+
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for event in scenario.events:
+            invoked = time.perf_counter()
+            response = handler.lambda_handler(event, None)
+            latencies.append((time.perf_counter() - invoked) * 1000)
+            errors += invocation_errors(response)
+        elapsed = time.perf_counter() - start
+
+    events = sum(logical_events(event) for event in scenario.events)
+    ordered = sorted(latencies)
+
+    return {
+        'description': scenario.description,
+        'invocations': len(scenario.events),
+        'events': events,
+        'elapsed_s': round(elapsed, 4),
+        'events_per_sec': round(events / elapsed, 1) if elapsed else 0.0,
+        'aws_calls': stubs.total_calls(),
+        'aws_calls_per_event': round(stubs.total_calls() / events, 3),
+        'calls_by_operation': dict(sorted(stubs.calls.items())),
+        'first_invoke_ms': round(latencies[0], 3),
+        'latency_ms': {
+            'p50': round(percentile(ordered, 50), 3),
+            'p99': round(percentile(ordered, 99), 3),
+            'max': round(ordered[-1], 3)
+        },
+        'errors': errors,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_scenario(function_name: str, scenario_name: str, paced: bool) -> Dict:
+    """Replay a scenario in a fresh interpreter, like a new Lambda container"""
+
+    command = [sys.executable, __file__, '--child', function_name, scenario_name]
+    if paced:
+        command.append('--paced')
+    proc = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, max_slowdown: float) -> List[str]:
+    """Regressions against a previous run: more AWS calls per event, or slower throughput"""
+
+    regressions = []
+    for function_name, scenarios in results.items():
+        for scenario_name, result in scenarios.items():
+            before = baseline.get('results', {}).get(function_name, {}).get(scenario_name)
+            if not before:
+                continue
+
+            label = f"{function_name}/{scenario_name}"
+            if result['aws_calls_per_event'] > before['aws_calls_per_event'] + 1e-9:
+                regressions.append(f"{label} AWS calls/event {before['aws_calls_per_event']} "
+                                   f"-> {result['aws_calls_per_event']}")
+
+            floor = before['events_per_sec'] * (1 - max_slowdown)
+            if result['events'] >= MIN_EVENTS_FOR_THROUGHPUT and result['events_per_sec'] < floor:
+                regressions.append(f"{label} events/sec {before['events_per_sec']} "
+                                   f"-> {result['events_per_sec']} (more than {max_slowdown:.0%} slower)")
+    return regressions
+
+
+def main():
+    corpus = build_corpus()
+
+    parser = argparse.ArgumentParser(description='Offline replay benchmark for the Lambda handlers')
+    parser.add_argument('--function', choices=sorted(corpus), action='append',
+                        help='Function to replay (default: all)')
+    parser.add_argument('--scenario', action='append',
+                        help='Scenario name to replay (default: all for the selected functions)')
+    parser.add_argument('--paced', action='store_true',
+                        help='Keep the real EC2 rate budgets in the call scheduler')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Previous --output file to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=0.25,
+                        help='Allowed events/sec drop against the baseline (default: 0.25)')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_scenario(args.child[0], args.child[1], args.paced)))
+        return
+
+    results: Dict[str, Dict[str, Dict]] = {}
+    for function_name in args.function or sorted(corpus):
+        for scenario_name in corpus[function_name]:
+            if args.scenario and scenario_name not in args.scenario:
+                continue
+            print(f"▶️  Replaying {function_name}/{scenario_name}...")
+            results.setdefault(function_name, {})[scenario_name] = run_scenario(
+                function_name, scenario_name, args.paced
+            )
+
+    print(f"\n{'Scenario':<42}{'events':>8}{'events/s':>11}{'calls/ev':>10}"
+          f"{'p50':>10}{'p99':>10}{'RSS':>9}{'errors':>8}")
+    for function_name, scenarios in results.items():
+        for scenario_name, result in scenarios.items():
+            print(f"{function_name + '/' + scenario_name:<42}"
+                  f"{result['events']:>8}"
+                  f"{result['events_per_sec']:>11.1f}"
+                  f"{result['aws_calls_per_event']:>10.2f}"
+                  f"{result['latency_ms']['p50']:>8.2f}ms"
+                  f"{result['latency_ms']['p99']:>8.2f}ms"
+                  f"{result['peak_rss_mb']:>7.1f}MB"
+                  f"{result['errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': time.time(),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'paced': args.paced,
+                'results': results
+            }, f, indent=2)
+        print(f"\n✅ Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+        if regressions:
+            print("\n❌ Replay regression:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+CloudTrail Log Backfill for Auto-Remediation
+Replays historical CloudTrail log files through the remediation handler
+
+For incident review, or to catch up after an outage, the gzipped CloudTrail
+log files under an S3 prefix or a local directory are streamed a chunk at a
+time, so memory stays bounded by the chunk size and the events that match
+rather than by the size of a file. Record boundaries are found with a regex,
+and each record's eventSource and eventName are checked against the rule
+registry before the record is JSON-decoded; everything else is skipped
+undecoded. Matching records become the EventBridge "AWS API Call via
+CloudTrail" events lambda_handler expects.
+
+Files are taken in name order (CloudTrail keys sort by date) in batches of
+BATCH_FILES, with at most two scans per worker in flight. Each batch's events
+are grouped by the resource they remediate, ordered by eventTime and
+replayed, so different resources are processed concurrently while each
+resource sees its events in the order they happened. A batch is dropped
+once replayed, so memory is bounded by the batch rather than the time range.
+
+Per-event SNS notifications are switched off while replaying; instead the
+results are collected (up to DIGEST_MAX_RECORDS, the rest counted) and one
+digest for the whole backfill is published at the end.
+
+Usage:
+    python lambda/auto-remediation/backfill.py s3://trail-bucket/AWSLogs/123456789012/CloudTrail/us-east-1/2026/01/
+    python lambda/auto-remediation/backfill.py ./cloudtrail-logs --workers 16 --batch-files 200 --output backfill.json
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+CLOUDTRAIL_DETAIL_TYPE = 'AWS API Call via CloudTrail'
+
+# Decompressed characters read per step; bounds memory per open file
+CHUNK_CHARS = 1024 * 1024
+
+# Log files scanned and replayed together; about a day of one region's trail
+BATCH_FILES = 300
+
+# Error messages kept in the summary
+ERROR_SAMPLES = 20
+
+# CloudTrail writes eventVersion first in every record
+RECORD_START = re.compile(r'\{\s*"eventVersion"\s*:')
+EVENT_NAME = re.compile(r'"eventName"\s*:\s*"([^"]+)"')
+EVENT_SOURCE = re.compile(r'"eventSource"\s*:\s*"([^"]+)"')
+
+_decoder = json.JSONDecoder()
+
+
+def wanted_calls(dispatch_keys: List[Tuple[str, str, Optional[str]]]) -> Set[Tuple[str, str]]:
+    """(eventSource, eventName) pairs the registry has a CloudTrail rule for"""
+
+    calls = set()
+    for source, detail_type, event_name in dispatch_keys:
+        if detail_type == CLOUDTRAIL_DETAIL_TYPE and event_name and source.startswith('aws.'):
+            calls.add((f"{source[len('aws.'):]}.amazonaws.com", event_name))
+    return calls
+
+
+def iter_record_texts(stream: io.TextIOBase, chunk_chars: int = CHUNK_CHARS) -> Iterator[str]:
+    """Raw JSON text of each record in a CloudTrail log file, without decoding it"""
+
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_chars)
+        buffer += chunk
+
+        starts = [match.start() for match in RECORD_START.finditer(buffer)]
+        # The last record may continue in the next chunk
+        complete = starts if not chunk else starts[:-1]
+        for start, end in zip(complete, starts[1:] + [len(buffer)]):
+            yield buffer[start:end]
+
+        if not chunk:
+            return
+        buffer = buffer[starts[-1]:] if starts else buffer[-64:]
+
+
+def matching_records(stream: io.TextIOBase, calls: Set[Tuple[str, str]], stats: Dict) -> Iterator[Dict]:
+    """Decoded records whose (eventSource, eventName) is in calls"""
+
+    for text in iter_record_texts(stream):
+        stats['records'] += 1
+        name = EVENT_NAME.search(text)
+        source = EVENT_SOURCE.search(text)
+        if not name or not source or (source.group(1), name.group(1)) not in calls:
+            continue
+
+        try:
+            record, _ = _decoder.raw_decode(text)
+        except json.JSONDecodeError as e:
+            stats['malformed'] += 1
+            print(f"⚠️ Skipping malformed CloudTrail record: {e}")
+            continue
+
+        # The regex saw the first eventName in the text; make sure it was the record's own
+        if (record.get('eventSource'), record.get('eventName')) in calls:
+            stats['matched'] += 1
+            yield record
+
+
+def cloudtrail_event(record: Dict) -> Dict:
+    """EventBridge event for a CloudTrail record, as EventBridge would deliver it"""
+
+    return {
+        'version': '0',
+        'id': record.get('eventID', ''),
+        'detail-type': CLOUDTRAIL_DETAIL_TYPE,
+        'source': f"aws.{record['eventSource'].split('.')[0]}",
+        'account': record.get('recipientAccountId', ''),
+        'time': record.get('eventTime', ''),
+        'region': record.get('awsRegion', ''),
+        'resources': [],
+        'detail': record
+    }
+
+
+class LogSource:
+    """Lists and opens CloudTrail log files under an s3:// URI or a local directory"""
+
+    def __init__(self, uri: str, s3_client=None):
+        self.uri = uri
+        self.s3 = s3_client
+
+        if uri.startswith('s3://'):
+            self.bucket, _, self.prefix = uri[len('s3://'):].partition('/')
+        else:
+            self.bucket, self.prefix = None, uri
+
+    def list(self) -> List[str]:
+        if self.bucket:
+            keys = []
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith(('.json.gz', '.json')))
+            return sorted(keys)
+
+        paths = []
+        for root, _, files in os.walk(self.prefix):
+            paths.extend(os.path.join(root, name) for name in files if name.endswith(('.json.gz', '.json')))
+        return sorted(paths)
+
+    def open(self, name: str) -> io.TextIOBase:
+        if self.bucket:
+            raw = self.s3.get_object(Bucket=self.bucket, Key=name)['Body']
+        else:
+            raw = open(name, 'rb')
+        if name.endswith('.gz'):
+            raw = gzip.GzipFile(fileobj=raw)
+        return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+class ResultCollector:
+    """Thread-safe, capped list of digest records gathered across a backfill"""
+
+    def __init__(self, max_records: int):
+        self.max_records = max_records
+        self.records: List[Dict] = []
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, records: List[Dict]):
+        with self._lock:
+            self.total += len(records)
+            self.records.extend(records[:max(self.max_records - len(self.records), 0)])
+
+
+class Backfill:
+    """Scans log files in parallel and replays matching events per resource in order"""
+
+    def __init__(self, source: LogSource, calls: Set[Tuple[str, str]],
+                 resource_of: Callable[[Dict], Optional[Tuple[str, str]]],
+                 process: Callable[[Dict], Dict], workers: int = 8, batch_files: int = BATCH_FILES):
+        self.source = source
+        self.calls = calls
+        self.resource_of = resource_of
+        self.process = process
+        self.workers = workers
+        self.batch_files = max(batch_files, 1)
+
+    def scan(self, name: str) -> Tuple[List[Dict], Dict]:
+        stats = {'records': 0, 'matched': 0, 'malformed': 0, 'failed_files': 0}
+        events = []
+        try:
+            with self.source.open(name) as stream:
+                for record in matching_records(stream, self.calls, stats):
+                    if not record.get('errorCode'):
+                        events.append(cloudtrail_event(record))
+        except Exception as e:
+            print(f"❌ Could not read {name}: {e}")
+            stats['failed_files'] += 1
+        return events, stats
+
+    def run(self) -> Dict:
+        started = time.monotonic()
+        files = self.source.list()
+        print(f"📜 Backfilling {len(files)} CloudTrail log file(s) from {self.source.uri}")
+
+        totals = {'files': len(files), 'batches': 0, 'records': 0, 'matched': 0, 'malformed': 0,
+                  'failed_files': 0, 'events': 0, 'unresolved_events': 0, 'errors': 0}
+        resources: Set[Tuple[str, str]] = set()
+        error_samples: List[str] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as pool:
+            for first in range(0, len(files), self.batch_files):
+                by_resource = self._scan_batch(pool, files[first:first + self.batch_files], totals)
+                for events in by_resource.values():
+                    events.sort(key=lambda e: (e['time'], e['id']))
+
+                for errors in pool.map(self._replay, by_resource.values()):
+                    totals['errors'] += len(errors)
+                    error_samples.extend(errors[:ERROR_SAMPLES - len(error_samples)])
+
+                totals['batches'] += 1
+                totals['events'] += sum(len(events) for events in by_resource.values())
+                resources.update(by_resource)
+                print(f"Batch {totals['batches']}: {min(first + self.batch_files, len(files))}/{len(files)} file(s), "
+                      f"{len(by_resource)} resource(s) replayed")
+
+        totals.update({
+            'resources': len(resources),
+            'error_samples': error_samples,
+            'elapsed_s': round(time.monotonic() - started, 3)
+        })
+        return totals
+
+    def _scan_batch(self, pool: ThreadPoolExecutor, files: List[str], totals: Dict) -> Dict[Tuple[str, str], List[Dict]]:
+        """Scan files with at most two per worker in flight; returns their events by resource"""
+
+        by_resource: Dict[Tuple[str, str], List[Dict]] = {}
+        names = iter(files)
+        pending = {pool.submit(self.scan, name) for name in islice(names, self.workers * 2)}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                events, stats = future.result()
+                for key in stats:
+                    totals[key] += stats[key]
+                for event in events:
+                    resource = self.resource_of(event)
+                    if resource is None:
+                        totals['unresolved_events'] += 1
+                        continue
+                    by_resource.setdefault(resource, []).append(event)
+
+                name = next(names, None)
+                if name is not None:
+                    pending.add(pool.submit(self.scan, name))
+
+        return by_resource
+
+    def _replay(self, events: List[Dict]) -> List[str]:
+        """Process one resource's events in order; returns their errors"""
+
+        errors = []
+        for event in events:
+            try:
+                response = self.process(event)
+                body = json.loads(response.get('body') or '{}')
+                errors.extend(body.get('errors', []))
+            except Exception as e:
+                errors.append(f"{event['id']}: {e}")
+        return errors
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay CloudTrail log files through auto-remediation')
+    parser.add_argument('uri', help='s3://bucket/prefix or a local directory of CloudTrail log files')
+    parser.add_argument('--workers', type=int, default=8, help='Files scanned and resources replayed in parallel')
+    parser.add_argument('--batch-files', type=int, default=BATCH_FILES,
+                        help='Log files scanned and replayed per batch; bounds memory')
+    parser.add_argument('--output', help='Write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    # Import the handler the way the Lambda runtime would, with lambda/ on the path
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in (os.path.dirname(here), here):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    import handler
+
+    from shared.digest import DIGEST_MAX_RECORDS
+
+    collector = ResultCollector(DIGEST_MAX_RECORDS)
+
+    def process(event: Dict) -> Dict:
+        response = handler.lambda_handler(event, None)
+        collector.add(handler.notification_records(json.loads(response.get('body') or '{}')))
+        return response
+
+    def resource_of(event: Dict) -> Optional[Tuple[str, str]]:
+        remediation = handler.rules.match(event)
+        if not remediation or not remediation[1]:
+            return None
+        return remediation[0], remediation[1]
+
+    backfill = Backfill(
+        LogSource(args.uri, handler.s3),
+        wanted_calls(handler.rules.rules()),
+        resource_of,
+        process,
+        workers=args.workers,
+        batch_files=args.batch_files
+    )
+
+    # One digest for the whole backfill instead of a notification per event
+    topic = handler.SNS_TOPIC_ARN
+    handler.SNS_TOPIC_ARN = ''
+    try:
+        summary = backfill.run()
+    finally:
+        handler.SNS_TOPIC_ARN = topic
+    print(json.dumps(summary, indent=2))
+
+    if topic and collector.total:
+        try:
+            handler.notifications.publish_digest(
+                collector.records,
+                f"backfill of {args.uri}",
+                context_lines=[f"Dry Run: {handler.DRY_RUN}", f"Events replayed: {summary['events']}"],
+                total=collector.total
+            )
+        except Exception as e:
+            print(f"❌ Error sending backfill notification: {e}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Warm-Container Describe Cache for Auto-Remediation
+TTL/LRU cache for resource lookups with write-through patching
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class DescribeCache:
+    """Thread-safe TTL/LRU cache living for the lifetime of a Lambda container
+
+    Entries expire ``ttl_seconds`` after they were loaded and the least
+    recently used entry is evicted once ``max_entries`` is reached. A TTL of
+    zero disables caching while still counting misses.
+
+    Each entry also remembers the wall-clock time it was loaded. Callers
+    reacting to a change event pass the event time as ``not_before`` so a
+    lookup cached before that change is never served.
+    """
+
+    def __init__(self, ttl_seconds: float = 15.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    not_before: Optional[float] = None) -> Any:
+        """Return the cached value for key, calling loader on a miss
+
+        ``not_before`` is an epoch timestamp; entries loaded earlier are
+        treated as stale.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and (not_before is None or entry[1] >= not_before):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # Load outside the lock so slow AWS calls don't serialise other keys
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def get_or_load_many(self, keys: List[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                         not_before: Optional[float] = None) -> Dict[Hashable, Any]:
+        """Batch form of get_or_load: loader receives every missing key at once
+
+        Keys the loader does not return are left out of the result, so
+        callers can tell missing resources apart.
+        """
+
+        now = time.monotonic()
+        found: Dict[Hashable, Any] = {}
+        missing: List[Hashable] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and entry[0] > now and (not_before is None or entry[1] >= not_before):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[key] = entry[2]
+                else:
+                    self.misses += 1
+                    missing.append(key)
+
+        if missing:
+            for key, value in loader(missing).items():
+                self.put(key, value)
+                found[key] = value
+        return found
+
+    def put(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entry if full"""
+
+        if self.ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def patch(self, key: Hashable, update: Callable[[Any], Any]):
+        """Apply our own write to a cached value instead of dropping it
+
+        ``update`` receives the cached value and returns the new one. Keys
+        that are not cached are left alone, since the next read will load
+        the post-write state anyway.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry[0] <= time.monotonic():
+                return
+            self._entries[key] = (entry[0], entry[1], update(entry[2]))
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached entry"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every cached entry"""
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return cumulative counters for this container"""
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries)
+            }
+
+
+def stats_since(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    """Counters accumulated between two stats() snapshots, plus container totals"""
+
+    return {
+        'hits': after['hits'] - before['hits'],
+        'misses': after['misses'] - before['misses'],
+        'container_hits': after['hits'],
+        'container_misses': after['misses'],
+        'size': after['size']
+    }
@@ -3,30 +3,104 @@ AWS Lambda Function: Auto-Remediation for Security Issues
 Automatically fixes common security misconfigurations
 """
 
+import hashlib
 import json
-import boto3
 import os
-from typing import Dict, List
-from datetime import datetime
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 
-# Initialize AWS clients
-ec2 = boto3.client('ec2')
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
+from describe_cache import DescribeCache, stats_since
+from rule_registry import RuleRegistry
+from sg_rules import DEFAULT_RULESET, build_revocations
+from sweep import Sweeper, checkpoint_store, is_shared, new_sweep_state, sweep_due
+from shared.aws_clients import error_code, lazy_client, provider
+from shared.digest import DIGEST_STORE, NotificationDigest, digest_record
+from shared.idempotency import IdempotencyGuard, idempotency_key
+from shared.instrumentation import MetricsRecorder, log_event
+from shared.stores import state_store
+from shared.throttle import CallScheduler
+
+# AWS calls share per-API-family rate budgets across every fix function
+throttle = CallScheduler()
+provider.use_scheduler(throttle)
+
+# Per-stage and per-AWS-call latency, flushed as EMF after each invocation
+metrics = MetricsRecorder()
+metrics.install(provider)
+
+# AWS clients are built on first use from one shared session
+ec2 = lazy_client('ec2')
+s3 = lazy_client('s3')
+sns = lazy_client('sns')
 
 # Configuration
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', '')
+AWS_REGION = os.environ.get('AWS_REGION', '')
 DRY_RUN = os.environ.get('DRY_RUN', 'false').lower() == 'true'
 AUTO_FIX_ENABLED = os.environ.get('AUTO_FIX_ENABLED', 'true').lower() == 'true'
+DESCRIBE_CACHE_TTL_SECONDS = float(os.environ.get('DESCRIBE_CACHE_TTL_SECONDS', '15'))
+DESCRIBE_CACHE_MAX_ENTRIES = int(os.environ.get('DESCRIBE_CACHE_MAX_ENTRIES', '1024'))
+S3_POSTURE_WORKERS = int(os.environ.get('S3_POSTURE_WORKERS', '6'))
+EC2_FIX_WORKERS = int(os.environ.get('EC2_FIX_WORKERS', '8'))
+
+REMEDIATION_RULES_PATH = os.environ.get('REMEDIATION_RULES_PATH') or os.path.join(os.path.dirname(__file__), 'rules.json')
+
+IDEMPOTENCY_STORE = os.environ.get('IDEMPOTENCY_STORE', '')
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '3600'))
+
+# Scheduled sweep configuration
+SWEEP_REGIONS = [r.strip() for r in os.environ.get('SWEEP_REGIONS', '').split(',') if r.strip()]
+SWEEP_WORKERS = int(os.environ.get('SWEEP_WORKERS', '8'))
+SWEEP_PAGE_SIZE = int(os.environ.get('SWEEP_PAGE_SIZE', '200'))
+SWEEP_CHECKPOINT_URI = os.environ.get('SWEEP_CHECKPOINT_URI', '/tmp/auto-remediation-sweep.json')
+SWEEP_MIN_INTERVAL_SECONDS = float(os.environ.get('SWEEP_MIN_INTERVAL_SECONDS', '86400'))
+SWEEP_SAFETY_MARGIN_SECONDS = float(os.environ.get('SWEEP_SAFETY_MARGIN_SECONDS', '30'))
+SWEEP_TIME_BUDGET_SECONDS = float(os.environ.get('SWEEP_TIME_BUDGET_SECONDS', '240'))
+
+# Resource lookups shared by every invocation in this container
+describe_cache = DescribeCache(DESCRIBE_CACHE_TTL_SECONDS, DESCRIBE_CACHE_MAX_ENTRIES)
+
+# Drops duplicate EventBridge deliveries before any AWS call
+idempotency = IdempotencyGuard(state_store('idempotency', IDEMPOTENCY_STORE or None), IDEMPOTENCY_TTL_SECONDS)
 
+# Bounded pool for the independent per-bucket S3 reads and writes
+s3_posture_pool = ThreadPoolExecutor(max_workers=S3_POSTURE_WORKERS, thread_name_prefix='s3-posture')
+
+# Bounded pool for per-instance EC2 fixes that have no batch API
+ec2_fix_pool = ThreadPoolExecutor(max_workers=EC2_FIX_WORKERS, thread_name_prefix='ec2-fix')
+
+# Event routing: handlers register below, rules.json is compiled at the end
+rules = RuleRegistry()
+
+
+@metrics.invocation
 def lambda_handler(event, context):
     """Main Lambda handler"""
 
-    print(f"Received event: {json.dumps(event)}")
+    # SQS event source mapping delivers a batch of EventBridge events
+    if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+        return sqs_batch_handler(event, context)
 
+    # Scheduled invocation: {"flush_digest": true} publishes closed digest windows
+    if event.get('flush_digest'):
+        sent = notifications.flush_due()
+        print(f"Flushed remediation digest: {sent} message(s) sent")
+        return {'statusCode': 200, 'body': json.dumps({'digest_messages_sent': sent})}
+
+    # EventBridge schedule drives the account-wide sweep
+    if event.get('detail-type') == 'Scheduled Event' or event.get('sweep'):
+        return sweep_handler(event, context)
+
+    log_event(event)
+
+    cache_before = describe_cache.stats()
     results = {
         'timestamp': datetime.utcnow().isoformat(),
         'fixes_applied': [],
+        'duplicates': [],
         'errors': [],
         'dry_run': DRY_RUN
     }
@@ -35,29 +109,35 @@ def lambda_handler(event, context):
         # Determine event source
         if 'detail-type' in event:
             # EventBridge event from CloudTrail
-            detail = event.get('detail', {})
-            event_name = detail.get('eventName', '')
-
-            # Security Group events
-            if event_name in ['AuthorizeSecurityGroupIngress', 'AuthorizeSecurityGroupEgress', 'CreateSecurityGroup']:
-                print(f"Processing security group event: {event_name}")
-                result = fix_security_group_issues(event)
-                results['fixes_applied'].append(result)
-
-            # EC2 Instance events
-            elif event_name in ['RunInstances', 'StartInstances']:
-                print(f"Processing EC2 event: {event_name}")
-                result = fix_ec2_instance_issues(event)
-                results['fixes_applied'].append(result)
-
-            # S3 events
-            elif 'Bucket' in event_name:
-                print(f"Processing S3 event: {event_name}")
-                result = fix_s3_bucket_issues(event)
-                results['fixes_applied'].append(result)
+            remediation = match_remediation(event)
+
+            if remediation:
+                resource_type, resource_id, fix = remediation
+                key = idempotency_key(event, resource_id)
+                stored = idempotency.begin(key)
+
+                if stored is not None:
+                    print(f"♻️ Duplicate delivery {key}, returning stored result")
+                    results['duplicates'].append(stored)
+                else:
+                    print(f"Processing {resource_type} event: {event['detail'].get('eventName') or event['detail-type']}")
+                    try:
+                        result = fix(event)
+                    except Exception:
+                        idempotency.release(key)
+                        raise
+
+                    if 'error' in result:
+                        idempotency.release(key)
+                    else:
+                        idempotency.complete(key, result)
+                    results['fixes_applied'].append(result)
+
+        results['describe_cache'] = stats_since(cache_before, describe_cache.stats())
+        results['throttle'] = throttle.stats()
 
         # Send notification
-        if results['fixes_applied'] and SNS_TOPIC_ARN:
+        if SNS_TOPIC_ARN:
             send_notification(results)
 
     except Exception as e:
@@ -71,11 +151,262 @@ def lambda_handler(event, context):
     }
 
 
+def match_remediation(event: Dict) -> Optional[Tuple[str, Optional[str], Callable[[Dict], Dict]]]:
+    """Resolve an EventBridge event to (resource_type, resource_id, fix function)"""
+
+    return rules.match(event)
+
+
+@metrics.stage
+def sqs_batch_handler(event, context):
+    """Process an SQS batch of EventBridge events, fixing each unique resource once
+
+    Records are coalesced by (resource_type, resource_id) so a burst of
+    events against the same security group, instance or bucket costs a
+    single describe/fix pass. Every message that contributed to a failed
+    fix is reported back through ``batchItemFailures`` so SQS redelivers
+    only those records.
+    """
+
+    records = event.get('Records', [])
+    print(f"Received SQS batch with {len(records)} record(s)")
+
+    cache_before = describe_cache.stats()
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'fixes_applied': [],
+        'errors': [],
+        'dry_run': DRY_RUN,
+        'records': len(records),
+        'duplicates': 0,
+        'unique_resources': 0
+    }
+    failed_message_ids = []
+
+    # (resource_type, resource_id) -> latest event and contributing message ids
+    resources: Dict[Tuple[str, str], Dict] = {}
+
+    for record in records:
+        message_id = record.get('messageId')
+
+        try:
+            body = json.loads(record.get('body') or '{}')
+        except json.JSONDecodeError as e:
+            results['errors'].append(f"Malformed SQS record {message_id}: {e}")
+            failed_message_ids.append(message_id)
+            continue
+
+        remediation = match_remediation(body)
+        if not remediation:
+            continue
+        if not remediation[1]:
+            # Matches a rule but names no resource; record it rather than drop it silently
+            error = f"No {remediation[0]} id in SQS record {message_id} ({body.get('detail-type')})"
+            print(f"⚠️ {error}")
+            results['errors'].append(error)
+            continue
+
+        resource_type, resource_id, fix = remediation
+        key = idempotency_key(body, resource_id)
+        if idempotency.begin(key) is not None:
+            results['duplicates'] += 1
+            continue
+
+        entry = resources.setdefault(
+            (resource_type, resource_id),
+            {'fix': fix, 'event': body, 'message_ids': [], 'idempotency_keys': []}
+        )
+        # Fixes re-describe the live resource, so any event for it is representative
+        entry['event'] = body
+        entry['message_ids'].append(message_id)
+        entry['idempotency_keys'].append(key)
+
+    results['unique_resources'] = len(resources)
+    print(f"Dropped {results['duplicates']} duplicate delivery(ies)")
+    print(f"Coalesced {len(records)} record(s) into {len(resources)} unique resource(s)")
+
+    for (resource_type, resource_id), entry in resources.items():
+        try:
+            result = entry['fix'](entry['event'])
+        except Exception as e:
+            result = {
+                'resource_type': resource_type,
+                'resource_id': resource_id,
+                'error': str(e)
+            }
+
+        result['events_coalesced'] = len(entry['message_ids'])
+        results['fixes_applied'].append(result)
+
+        if 'error' in result:
+            results['errors'].append(f"{resource_type} {resource_id}: {result['error']}")
+            failed_message_ids.extend(entry['message_ids'])
+            for key in entry['idempotency_keys']:
+                idempotency.release(key)
+        else:
+            for key in entry['idempotency_keys']:
+                idempotency.complete(key, result)
+
+    results['describe_cache'] = stats_since(cache_before, describe_cache.stats())
+    results['throttle'] = throttle.stats()
+
+    if SNS_TOPIC_ARN:
+        send_notification(results)
+
+    print(f"Batch summary: {json.dumps({k: v for k, v in results.items() if k != 'fixes_applied'})}")
+
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_message_ids]
+    }
+
+
+@metrics.stage
+def sweep_handler(event, context):
+    """Remediate resources that already exist, resuming from the last checkpoint
+
+    Each invocation works through security groups and instances in every
+    enabled region plus all S3 buckets until it runs low on time, then
+    saves where every (kind, region) unit stopped. The next scheduled
+    invocation picks up from there; once a sweep completes, a new one only
+    starts after SWEEP_MIN_INTERVAL_SECONDS. Pass {"sweep": true,
+    "restart": true} to force a fresh sweep.
+    """
+
+    store = checkpoint_store(SWEEP_CHECKPOINT_URI, s3)
+    if not is_shared(store) and os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        # /tmp is per container, so a cold start or a second container would restart the sweep
+        raise RuntimeError(f"Sweep checkpoint {SWEEP_CHECKPOINT_URI} is local to this container; "
+                           "set SWEEP_CHECKPOINT_URI to s3://bucket/key or dynamodb://key")
+    state = store.load()
+
+    if event.get('restart') or sweep_due(state, SWEEP_MIN_INTERVAL_SECONDS):
+        regions = SWEEP_REGIONS or enabled_regions()
+        units = [(kind, region) for region in regions for kind in ('security_groups', 'instances')]
+        units.append(('buckets', None))
+        state = new_sweep_state(units)
+        print(f"🧹 Starting sweep of {len(regions)} region(s)")
+    elif state.get('completed_at'):
+        print(f"Sweep completed at {state['completed_at']}, next one not due yet")
+        return {'statusCode': 200, 'body': json.dumps({'sweep': 'idle', 'completed_at': state['completed_at']})}
+    else:
+        print(f"🧹 Resuming sweep started at {state['started_at']}")
+
+    time_budget = SWEEP_TIME_BUDGET_SECONDS
+    if context is not None:
+        time_budget = context.get_remaining_time_in_millis() / 1000 - SWEEP_SAFETY_MARGIN_SECONDS
+
+    cache_before = describe_cache.stats()
+    sweeper = Sweeper(
+        state,
+        store,
+        fetch_page=fetch_sweep_page,
+        process_item=sweep_item,
+        deadline=time.monotonic() + max(time_budget, 0),
+        workers=SWEEP_WORKERS
+    )
+    summary = sweeper.run()
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'fixes_applied': sweeper.results,
+        'errors': [f"{r.get('resource_type')} {r.get('resource_id')}: {r['error']}"
+                   for r in sweeper.results if r.get('error')],
+        'dry_run': DRY_RUN,
+        'sweep': summary,
+        'describe_cache': stats_since(cache_before, describe_cache.stats()),
+        'throttle': throttle.stats()
+    }
+    print(f"Sweep summary: {json.dumps(summary)}")
+
+    if SNS_TOPIC_ARN:
+        send_notification(results)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({k: v for k, v in results.items() if k != 'fixes_applied'})
+    }
+
+
+def enabled_regions() -> List[str]:
+    """Regions enabled for this account"""
+
+    response = ec2.describe_regions(AllRegions=False)
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+
+_bucket_listing: Dict[str, List[str]] = {}
+
+
+def fetch_sweep_page(kind: str, region: Optional[str], token: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+    """Fetch one page of a sweep unit and prime the describe cache with it"""
+
+    # EC2 accepts page sizes between 5 and 1000
+    ec2_page_size = min(max(SWEEP_PAGE_SIZE, 5), 1000)
+
+    if kind == 'security_groups':
+        kwargs = {'MaxResults': ec2_page_size}
+        if token:
+            kwargs['NextToken'] = token
+        response = ec2_client(region).describe_security_groups(**kwargs)
+        return response['SecurityGroups'], response.get('NextToken')
+
+    if kind == 'instances':
+        kwargs = {
+            'MaxResults': ec2_page_size,
+            'Filters': [{'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}]
+        }
+        if token:
+            kwargs['NextToken'] = token
+        response = ec2_client(region).describe_instances(**kwargs)
+        instances = [i for r in response['Reservations'] for i in r['Instances']]
+        return instances, response.get('NextToken')
+
+    if kind == 'buckets':
+        # ListBuckets returns every bucket sorted by name; the token is the
+        # last bucket name processed
+        if token is None or 'names' not in _bucket_listing:
+            _bucket_listing['names'] = sorted(b['Name'] for b in s3.list_buckets()['Buckets'])
+        names = _bucket_listing['names']
+        start = bisect_right(names, token) if token else 0
+        page = names[start:start + SWEEP_PAGE_SIZE]
+        next_token = page[-1] if start + SWEEP_PAGE_SIZE < len(names) else None
+        return [{'Name': name} for name in page], next_token
+
+    raise ValueError(f"Unknown sweep unit kind: {kind}")
+
+
+def sweep_item(kind: str, region: Optional[str], item: Dict) -> Dict:
+    """Run the matching fix function on one resource from a sweep page"""
+
+    sweep_event = {
+        'source': 'agentic.remediation.sweep',
+        'detail-type': 'Auto-Remediation Sweep',
+        'region': region,
+        'detail': {}
+    }
+
+    if kind == 'security_groups':
+        describe_cache.put(('security_group', region, item['GroupId']), item)
+        sweep_event['detail']['requestParameters'] = {'groupId': item['GroupId']}
+        return fix_security_group_issues(sweep_event)
+
+    if kind == 'instances':
+        describe_cache.put(('ec2_instance', region, item['InstanceId']), item)
+        sweep_event['detail']['instance-id'] = item['InstanceId']
+        return fix_ec2_instance_issues(sweep_event)
+
+    sweep_event['detail']['requestParameters'] = {'bucketName': item['Name']}
+    return fix_s3_bucket_issues(sweep_event)
+
+
+@rules.remediation('security_group')
+@metrics.stage
 def fix_security_group_issues(event: Dict) -> Dict:
     """Fix security group misconfigurations"""
 
     detail = event.get('detail', {})
-    sg_id = detail.get('requestParameters', {}).get('groupId')
+    # CreateSecurityGroup only reports the new id in its response
+    sg_id = (detail.get('requestParameters') or {}).get('groupId') or (detail.get('responseElements') or {}).get('groupId')
 
     if not sg_id:
         return {'action': 'skip', 'reason': 'No security group ID found'}
@@ -84,65 +415,64 @@ def fix_security_group_issues(event: Dict) -> Dict:
 
     try:
         # Get security group details
-        response = ec2.describe_security_groups(GroupIds=[sg_id])
-        sg = response['SecurityGroups'][0]
-
-        # Check for overly permissive rules
-        for rule in sg.get('IpPermissions', []):
-            # Check for SSH (22) open to 0.0.0.0/0
-            if rule.get('FromPort') == 22:
-                for ip_range in rule.get('IpRanges', []):
-                    if ip_range.get('CidrIp') == '0.0.0.0/0':
-                        if AUTO_FIX_ENABLED and not DRY_RUN:
-                            # Remove the rule
-                            print(f"🔒 Revoking unrestricted SSH rule from {sg_id}")
-                            ec2.revoke_security_group_ingress(
-                                GroupId=sg_id,
-                                IpPermissions=[rule]
-                            )
-                            print(f"✅ Successfully revoked SSH rule (0.0.0.0/0 on port 22)")
-                            fixes.append({
-                                'action': 'removed_rule',
-                                'sg_id': sg_id,
-                                'port': 22,
-                                'cidr': '0.0.0.0/0',
-                                'reason': 'SSH open to internet'
-                            })
-                        else:
-                            fixes.append({
-                                'action': 'detected',
-                                'sg_id': sg_id,
-                                'port': 22,
-                                'issue': 'SSH open to 0.0.0.0/0',
-                                'dry_run': DRY_RUN
-                            })
-
-            # Check for RDP (3389) open to 0.0.0.0/0
-            if rule.get('FromPort') == 3389:
-                for ip_range in rule.get('IpRanges', []):
-                    if ip_range.get('CidrIp') == '0.0.0.0/0':
-                        if AUTO_FIX_ENABLED and not DRY_RUN:
-                            print(f"🔒 Revoking unrestricted RDP rule from {sg_id}")
-                            ec2.revoke_security_group_ingress(
-                                GroupId=sg_id,
-                                IpPermissions=[rule]
-                            )
-                            print(f"✅ Successfully revoked RDP rule (0.0.0.0/0 on port 3389)")
-                            fixes.append({
-                                'action': 'removed_rule',
-                                'sg_id': sg_id,
-                                'port': 3389,
-                                'cidr': '0.0.0.0/0',
-                                'reason': 'RDP open to internet'
-                            })
-                        else:
-                            fixes.append({
-                                'action': 'detected',
-                                'sg_id': sg_id,
-                                'port': 3389,
-                                'issue': 'RDP open to 0.0.0.0/0',
-                                'dry_run': DRY_RUN
-                            })
+        region = event.get('region') or AWS_REGION
+        sg = describe_security_group(sg_id, not_before=event_time(event), region=region)
+
+        # Single pass over every permission against the compiled policy index
+        violations = DEFAULT_RULESET.evaluate(sg)
+        revocations = build_revocations(violations)
+        remediate = AUTO_FIX_ENABLED and not DRY_RUN
+
+        if revocations and remediate:
+            print(f"🔒 Revoking {len(revocations)} internet-facing permission(s) from {sg_id}")
+            ec2_client(region).revoke_security_group_ingress(
+                GroupId=sg_id,
+                IpPermissions=revocations
+            )
+            describe_cache.invalidate(('security_group', region, sg_id))
+            print(f"✅ Successfully revoked {len(revocations)} permission(s) in one call")
+
+        for violation in violations:
+            reason = f"{', '.join(violation['policies'])} open to internet"
+            if violation['revoke'] and remediate:
+                fixes.append({
+                    'action': 'removed_rule',
+                    'sg_id': sg_id,
+                    'protocol': violation['protocol'],
+                    'port_range': violation['port_range'],
+                    'cidrs': violation['cidrs'],
+                    'reason': reason
+                })
+            elif violation['revoke']:
+                fixes.append({
+                    'action': 'detected',
+                    'sg_id': sg_id,
+                    'protocol': violation['protocol'],
+                    'port_range': violation['port_range'],
+                    'cidrs': violation['cidrs'],
+                    'issue': reason,
+                    'dry_run': DRY_RUN
+                })
+
+            if violation['prefix_lists']:
+                fixes.append({
+                    'action': 'review',
+                    'sg_id': sg_id,
+                    'protocol': violation['protocol'],
+                    'port_range': violation['port_range'],
+                    'prefix_lists': violation['prefix_lists'],
+                    'issue': f"{', '.join(violation['policies'])} allowed from prefix list"
+                })
+
+            if violation['wide_cidrs']:
+                fixes.append({
+                    'action': 'review',
+                    'sg_id': sg_id,
+                    'protocol': violation['protocol'],
+                    'port_range': violation['port_range'],
+                    'cidrs': violation['wide_cidrs'],
+                    'issue': f"{', '.join(violation['policies'])} allowed from wide public range"
+                })
 
         return {
             'resource_type': 'security_group',
@@ -159,90 +489,233 @@ def fix_security_group_issues(event: Dict) -> Dict:
         }
 
 
-def fix_ec2_instance_issues(event: Dict) -> Dict:
-    """Fix EC2 instance misconfigurations"""
+# Tags every instance must carry, with the value applied when one is missing
+DEFAULT_INSTANCE_TAGS = {
+    'Environment': 'untagged',
+    'Owner': 'auto-remediation',
+    'CostCenter': 'default'
+}
+
+# EC2 takes up to 200 values per describe filter and 1000 resources per
+# CreateTags call, but recommends smaller tagging batches
+DESCRIBE_INSTANCES_BATCH = 200
+CREATE_TAGS_BATCH = 500
+
+
+def event_instance_ids(event: Dict) -> List[str]:
+    """Every instance id an EC2 event refers to, in event order
+
+    RunInstances lists the launched instances in
+    ``responseElements.instancesSet``; Start/Stop calls list them in both
+    the request and the response.
+    """
 
     detail = event.get('detail', {})
-    instance_id = detail.get('instance-id') or detail.get('requestParameters', {}).get('instanceId')
+    request_parameters = detail.get('requestParameters') or {}
+    response_elements = detail.get('responseElements') or {}
+
+    candidates = [detail.get('instance-id'), request_parameters.get('instanceId')]
+    for elements in (response_elements, request_parameters):
+        for item in (elements.get('instancesSet') or {}).get('items', []):
+            candidates.append(item.get('instanceId'))
+
+    return list(dict.fromkeys(instance_id for instance_id in candidates if instance_id))
+
+
+def instances_resource_id(event: Dict, instance_ids: List[str]) -> Optional[str]:
+    """Resource id for an instance event: the instance, or the whole launch
+
+    Multi-instance events are keyed on the RunInstances reservation, or a
+    digest of the ids, so idempotency and batch keys stay short.
+    """
+
+    if len(instance_ids) <= 1:
+        return instance_ids[0] if instance_ids else None
+
+    reservation_id = (event.get('detail', {}).get('responseElements') or {}).get('reservationId')
+    if reservation_id:
+        return reservation_id
+
+    digest = hashlib.sha1(','.join(sorted(instance_ids)).encode('utf-8')).hexdigest()[:12]
+    return f"instances-{digest}"
+
+
+def instance_event_resource_id(event: Dict) -> Optional[str]:
+    return instances_resource_id(event, event_instance_ids(event))
+
+
+@rules.remediation('ec2_instance', resource_id=instance_event_resource_id)
+@metrics.stage
+def fix_ec2_instance_issues(event: Dict) -> Dict:
+    """Fix EC2 instance misconfigurations
+
+    Every instance in the event is handled together: one paginated
+    describe for the lot, one CreateTags call per distinct set of missing
+    tags and IMDSv2 enforcement on a bounded worker pool.
+    """
 
-    if not instance_id:
+    instance_ids = event_instance_ids(event)
+
+    if not instance_ids:
         return {'action': 'skip', 'reason': 'No instance ID found'}
 
+    resource_id = instances_resource_id(event, instance_ids)
     fixes = []
+    errors = []
 
     try:
         # Get instance details
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        instance = response['Reservations'][0]['Instances'][0]
+        region = event.get('region') or AWS_REGION
+        instances = describe_instances(instance_ids, not_before=event_time(event), region=region)
+
+        not_found = [instance_id for instance_id in instance_ids if instance_id not in instances]
+        if not_found:
+            errors.append(f"Instances not found: {not_found}")
 
-        # Check for missing tags
-        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-        required_tags = ['Environment', 'Owner', 'CostCenter']
-        missing_tags = [tag for tag in required_tags if tag not in tags]
+        # Group instances by the tags they lack so each tag set costs one call
+        tag_groups: Dict[Tuple[str, ...], List[str]] = {}
+        for instance_id, instance in instances.items():
+            present = {tag['Key'] for tag in instance.get('Tags', [])}
+            missing_tags = tuple(key for key in DEFAULT_INSTANCE_TAGS if key not in present)
+            if missing_tags:
+                tag_groups.setdefault(missing_tags, []).append(instance_id)
 
-        if missing_tags:
+        for missing_tags, group in tag_groups.items():
             if AUTO_FIX_ENABLED and not DRY_RUN:
-                # Add default tags
-                new_tags = [
-                    {'Key': 'Environment', 'Value': 'untagged'},
-                    {'Key': 'Owner', 'Value': 'auto-remediation'},
-                    {'Key': 'CostCenter', 'Value': 'default'}
-                ]
-                ec2.create_tags(
-                    Resources=[instance_id],
-                    Tags=[tag for tag in new_tags if tag['Key'] in missing_tags]
-                )
-                fixes.append({
-                    'action': 'added_tags',
-                    'instance_id': instance_id,
-                    'tags_added': missing_tags
-                })
+                added_tags = [{'Key': key, 'Value': DEFAULT_INSTANCE_TAGS[key]} for key in missing_tags]
+                tagged = []
+                for offset in range(0, len(group), CREATE_TAGS_BATCH):
+                    batch = group[offset:offset + CREATE_TAGS_BATCH]
+                    try:
+                        ec2_client(region).create_tags(Resources=batch, Tags=added_tags)
+                    except Exception as e:
+                        errors.append(f"Tagging {batch} failed: {e}")
+                        continue
+                    tagged.extend(batch)
+
+                for instance_id in tagged:
+                    describe_cache.patch(
+                        ('ec2_instance', region, instance_id),
+                        lambda cached: {**cached, 'Tags': cached.get('Tags', []) + added_tags}
+                    )
+                if tagged:
+                    fixes.append({
+                        'action': 'added_tags',
+                        'instance_ids': tagged,
+                        'tags_added': list(missing_tags)
+                    })
             else:
                 fixes.append({
                     'action': 'detected',
-                    'instance_id': instance_id,
-                    'issue': f'Missing tags: {missing_tags}',
+                    'instance_ids': group,
+                    'issue': f'Missing tags: {list(missing_tags)}',
                     'dry_run': DRY_RUN
                 })
 
         # Check for IMDSv2
-        metadata_options = instance.get('MetadataOptions', {})
-        if metadata_options.get('HttpTokens') != 'required':
+        needs_imdsv2 = [
+            instance_id for instance_id, instance in instances.items()
+            if instance.get('MetadataOptions', {}).get('HttpTokens') != 'required'
+        ]
+        if needs_imdsv2:
             if AUTO_FIX_ENABLED and not DRY_RUN:
-                ec2.modify_instance_metadata_options(
-                    InstanceId=instance_id,
-                    HttpTokens='required',
-                    HttpPutResponseHopLimit=1
-                )
-                fixes.append({
-                    'action': 'enforced_imdsv2',
-                    'instance_id': instance_id
+                # ModifyInstanceMetadataOptions takes one instance per call
+                outcomes = run_concurrently(ec2_fix_pool, {
+                    instance_id: (lambda instance_id=instance_id: enforce_imdsv2(instance_id, region))
+                    for instance_id in needs_imdsv2
                 })
+                enforced = [instance_id for instance_id in needs_imdsv2 if outcomes[instance_id][1] is None]
+                for instance_id in needs_imdsv2:
+                    if outcomes[instance_id][1] is not None:
+                        errors.append(f"IMDSv2 enforcement on {instance_id} failed: {outcomes[instance_id][1]}")
+                if enforced:
+                    fixes.append({
+                        'action': 'enforced_imdsv2',
+                        'instance_ids': enforced
+                    })
             else:
                 fixes.append({
                     'action': 'detected',
-                    'instance_id': instance_id,
+                    'instance_ids': needs_imdsv2,
                     'issue': 'IMDSv2 not enforced',
                     'dry_run': DRY_RUN
                 })
 
-        return {
+        result = {
             'resource_type': 'ec2_instance',
-            'resource_id': instance_id,
+            'resource_id': resource_id,
             'fixes': fixes,
             'count': len(fixes)
         }
+        if len(instance_ids) > 1:
+            result['instance_ids'] = instance_ids
+        if errors:
+            result['error'] = '; '.join(errors)
+        return result
 
     except Exception as e:
         return {
             'resource_type': 'ec2_instance',
-            'resource_id': instance_id,
+            'resource_id': resource_id,
             'error': str(e)
         }
 
 
+def enforce_imdsv2(instance_id: str, region: Optional[str] = None):
+    """Require IMDSv2 tokens on one instance and patch the cached copy"""
+
+    ec2_client(region).modify_instance_metadata_options(
+        InstanceId=instance_id,
+        HttpTokens='required',
+        HttpPutResponseHopLimit=1
+    )
+    describe_cache.patch(
+        ('ec2_instance', region or AWS_REGION, instance_id),
+        lambda cached: {
+            **cached,
+            'MetadataOptions': {
+                **cached.get('MetadataOptions', {}),
+                'HttpTokens': 'required',
+                'HttpPutResponseHopLimit': 1
+            }
+        }
+    )
+
+
+# S3 posture checks, in the order fixes are reported
+S3_POSTURE_CHECKS = ['encryption', 'versioning', 'public_access_block']
+
+DEFAULT_BUCKET_ENCRYPTION = {
+    'Rules': [{
+        'ApplyServerSideEncryptionByDefault': {
+            'SSEAlgorithm': 'AES256'
+        }
+    }]
+}
+
+BLOCK_ALL_PUBLIC_ACCESS = {
+    'BlockPublicAcls': True,
+    'IgnorePublicAcls': True,
+    'BlockPublicPolicy': True,
+    'RestrictPublicBuckets': True
+}
+
+S3_FIX_ACTIONS = {
+    'encryption': 'enabled_encryption',
+    'versioning': 'enabled_versioning',
+    'public_access_block': 'blocked_public_access'
+}
+
+
+@rules.remediation('s3_bucket')
+@metrics.stage
 def fix_s3_bucket_issues(event: Dict) -> Dict:
-    """Fix S3 bucket misconfigurations"""
+    """Fix S3 bucket misconfigurations
+
+    The three posture reads run concurrently, then the fixes they call for
+    run concurrently, so a bucket event costs about one S3 round-trip per
+    phase. A failed read or write is reported for that check only.
+    """
 
     detail = event.get('detail', {})
     bucket_name = detail.get('requestParameters', {}).get('bucketName')
@@ -250,133 +723,319 @@ def fix_s3_bucket_issues(event: Dict) -> Dict:
     if not bucket_name:
         return {'action': 'skip', 'reason': 'No bucket name found'}
 
-    fixes = []
+    changed_at = event_time(event)
+    readers = {
+        'encryption': get_bucket_encryption,
+        'versioning': get_bucket_versioning,
+        'public_access_block': get_public_access_block
+    }
+
+    # Phase 1: read posture
+    posture = run_concurrently(
+        s3_posture_pool,
+        {check: (lambda read=read: read(bucket_name, changed_at)) for check, read in readers.items()}
+    )
+
+    fixes_by_check: Dict[str, Dict] = {}
+    errors = []
+    to_fix = []
+
+    for check in S3_POSTURE_CHECKS:
+        state, error = posture[check]
+        if error:
+            errors.append(f"{check} check failed: {error}")
+            fixes_by_check[check] = {
+                'action': 'check_failed',
+                'bucket': bucket_name,
+                'check': check,
+                'error': str(error)
+            }
+            continue
+
+        issue = bucket_posture_issue(check, state)
+        if not issue:
+            continue
+
+        if AUTO_FIX_ENABLED and not DRY_RUN:
+            to_fix.append(check)
+        else:
+            fixes_by_check[check] = {
+                'action': 'detected',
+                'bucket': bucket_name,
+                'issue': issue,
+                'dry_run': DRY_RUN
+            }
+
+    # Phase 2: apply the independent fixes
+    outcomes = run_concurrently(
+        s3_posture_pool,
+        {check: (lambda check=check: apply_bucket_fix(check, bucket_name)) for check in to_fix}
+    )
+
+    for check in to_fix:
+        _, error = outcomes[check]
+        if error:
+            errors.append(f"{check} fix failed: {error}")
+            fixes_by_check[check] = {
+                'action': 'fix_failed',
+                'bucket': bucket_name,
+                'check': check,
+                'error': str(error)
+            }
+        else:
+            fixes_by_check[check] = {
+                'action': S3_FIX_ACTIONS[check],
+                'bucket': bucket_name
+            }
+
+    fixes = [fixes_by_check[check] for check in S3_POSTURE_CHECKS if check in fixes_by_check]
+    result = {
+        'resource_type': 's3_bucket',
+        'resource_id': bucket_name,
+        'fixes': fixes,
+        'count': len(fixes)
+    }
+    if errors:
+        result['error'] = '; '.join(errors)
+
+    return result
+
+
+def bucket_posture_issue(check: str, state: Optional[Dict]) -> Optional[str]:
+    """Describe what is wrong with one S3 posture read, or None if compliant"""
+
+    if check == 'encryption' and state is None:
+        return 'Encryption not enabled'
+
+    if check == 'versioning' and state.get('Status') != 'Enabled':
+        return 'Versioning not enabled'
+
+    if check == 'public_access_block':
+        if state is None:
+            return 'No public access block configured'
+        if not all(state.get(setting) for setting in BLOCK_ALL_PUBLIC_ACCESS):
+            return 'Public access not fully blocked'
+
+    return None
+
+
+def apply_bucket_fix(check: str, bucket_name: str):
+    """Apply the fix for one S3 posture check and write it through the cache"""
+
+    if check == 'encryption':
+        s3.put_bucket_encryption(
+            Bucket=bucket_name,
+            ServerSideEncryptionConfiguration=DEFAULT_BUCKET_ENCRYPTION
+        )
+        describe_cache.put(('s3_encryption', bucket_name), DEFAULT_BUCKET_ENCRYPTION)
+
+    elif check == 'versioning':
+        s3.put_bucket_versioning(
+            Bucket=bucket_name,
+            VersioningConfiguration={'Status': 'Enabled'}
+        )
+        describe_cache.put(('s3_versioning', bucket_name), {'Status': 'Enabled'})
+
+    elif check == 'public_access_block':
+        s3.put_public_access_block(
+            Bucket=bucket_name,
+            PublicAccessBlockConfiguration=BLOCK_ALL_PUBLIC_ACCESS
+        )
+        describe_cache.put(('s3_public_access_block', bucket_name), BLOCK_ALL_PUBLIC_ACCESS)
+
+
+def run_concurrently(pool: ThreadPoolExecutor, tasks: Dict[str, Callable[[], object]]) -> Dict[str, Tuple[object, Optional[Exception]]]:
+    """Run independent calls on pool and return {name: (value, error)}
+
+    A single task runs inline since a thread hop would only add latency.
+    """
+
+    def call(task):
+        try:
+            return task(), None
+        except Exception as e:
+            return None, e
+
+    if len(tasks) <= 1:
+        return {name: call(task) for name, task in tasks.items()}
+
+    futures = {name: pool.submit(call, task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def event_time(event: Dict) -> Optional[float]:
+    """Earliest epoch time a cached lookup may have been loaded to reflect this event
+
+    CloudTrail's eventTime is truncated to the second, so the change may have
+    landed up to a second later than reported.
+    """
+
+    raw = event.get('detail', {}).get('eventTime') or event.get('time')
+    if not raw:
+        return None
 
     try:
-        # Check encryption
+        return datetime.strptime(raw, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp() + 1
+    except ValueError:
+        return None
+
+
+_regional_ec2: Dict[str, object] = {}
+
+
+def ec2_client(region: Optional[str] = None):
+    """EC2 client for a region, defaulting to the function's own"""
+
+    if not region or region == AWS_REGION:
+        return ec2
+    if region not in _regional_ec2:
+        _regional_ec2[region] = lazy_client('ec2', region)
+    return _regional_ec2[region]
+
+
+def describe_security_group(sg_id: str, not_before: Optional[float] = None,
+                            region: Optional[str] = None) -> Dict:
+    """Describe a security group through the container cache"""
+
+    return describe_cache.get_or_load(
+        ('security_group', region or AWS_REGION, sg_id),
+        lambda: ec2_client(region).describe_security_groups(GroupIds=[sg_id])['SecurityGroups'][0],
+        not_before
+    )
+
+
+def describe_instances(instance_ids: List[str], not_before: Optional[float] = None,
+                       region: Optional[str] = None) -> Dict[str, Dict]:
+    """Describe EC2 instances through the container cache, loading misses in bulk
+
+    Misses are fetched with an ``instance-id`` filter rather than
+    InstanceIds so the call can paginate and an id that is not visible yet
+    is simply absent instead of failing the whole request. Returns
+    {instance_id: instance} in the order given.
+    """
+
+    region = region or AWS_REGION
+
+    def load(keys):
+        ids = [key[2] for key in keys]
+        loaded = {}
+        for offset in range(0, len(ids), DESCRIBE_INSTANCES_BATCH):
+            params = {
+                'Filters': [{'Name': 'instance-id', 'Values': ids[offset:offset + DESCRIBE_INSTANCES_BATCH]}],
+                'MaxResults': 1000
+            }
+            while True:
+                response = ec2_client(region).describe_instances(**params)
+                for reservation in response['Reservations']:
+                    for instance in reservation['Instances']:
+                        loaded[('ec2_instance', region, instance['InstanceId'])] = instance
+                if not response.get('NextToken'):
+                    break
+                params['NextToken'] = response['NextToken']
+        return loaded
+
+    found = describe_cache.get_or_load_many(
+        [('ec2_instance', region, instance_id) for instance_id in instance_ids],
+        load,
+        not_before
+    )
+    return {
+        instance_id: found[('ec2_instance', region, instance_id)]
+        for instance_id in instance_ids
+        if ('ec2_instance', region, instance_id) in found
+    }
+
+
+def get_bucket_encryption(bucket_name: str, not_before: Optional[float] = None) -> Optional[Dict]:
+    """Read bucket encryption through the container cache (None when not configured)"""
+
+    def load():
         try:
-            s3.get_bucket_encryption(Bucket=bucket_name)
-        except s3.exceptions.ServerSideEncryptionConfigurationNotFoundError:
-            if AUTO_FIX_ENABLED and not DRY_RUN:
-                s3.put_bucket_encryption(
-                    Bucket=bucket_name,
-                    ServerSideEncryptionConfiguration={
-                        'Rules': [{
-                            'ApplyServerSideEncryptionByDefault': {
-                                'SSEAlgorithm': 'AES256'
-                            }
-                        }]
-                    }
-                )
-                fixes.append({
-                    'action': 'enabled_encryption',
-                    'bucket': bucket_name
-                })
-            else:
-                fixes.append({
-                    'action': 'detected',
-                    'bucket': bucket_name,
-                    'issue': 'Encryption not enabled',
-                    'dry_run': DRY_RUN
-                })
+            response = s3.get_bucket_encryption(Bucket=bucket_name)
+            return response['ServerSideEncryptionConfiguration']
+        except Exception as e:
+            if error_code(e) == 'ServerSideEncryptionConfigurationNotFoundError':
+                return None
+            raise
+
+    return describe_cache.get_or_load(('s3_encryption', bucket_name), load, not_before)
+
+
+def get_bucket_versioning(bucket_name: str, not_before: Optional[float] = None) -> Dict:
+    """Read bucket versioning through the container cache"""
+
+    def load():
+        response = s3.get_bucket_versioning(Bucket=bucket_name)
+        return {'Status': response.get('Status')}
+
+    return describe_cache.get_or_load(('s3_versioning', bucket_name), load, not_before)
 
-        # Check versioning
-        versioning = s3.get_bucket_versioning(Bucket=bucket_name)
-        if versioning.get('Status') != 'Enabled':
-            if AUTO_FIX_ENABLED and not DRY_RUN:
-                s3.put_bucket_versioning(
-                    Bucket=bucket_name,
-                    VersioningConfiguration={'Status': 'Enabled'}
-                )
-                fixes.append({
-                    'action': 'enabled_versioning',
-                    'bucket': bucket_name
-                })
-            else:
-                fixes.append({
-                    'action': 'detected',
-                    'bucket': bucket_name,
-                    'issue': 'Versioning not enabled',
-                    'dry_run': DRY_RUN
-                })
 
-        # Block public access
+def get_public_access_block(bucket_name: str, not_before: Optional[float] = None) -> Optional[Dict]:
+    """Read the bucket public access block through the container cache (None when not configured)"""
+
+    def load():
         try:
-            public_access = s3.get_public_access_block(Bucket=bucket_name)
-            config = public_access['PublicAccessBlockConfiguration']
-
-            if not all([
-                config.get('BlockPublicAcls'),
-                config.get('IgnorePublicAcls'),
-                config.get('BlockPublicPolicy'),
-                config.get('RestrictPublicBuckets')
-            ]):
-                if AUTO_FIX_ENABLED and not DRY_RUN:
-                    s3.put_public_access_block(
-                        Bucket=bucket_name,
-                        PublicAccessBlockConfiguration={
-                            'BlockPublicAcls': True,
-                            'IgnorePublicAcls': True,
-                            'BlockPublicPolicy': True,
-                            'RestrictPublicBuckets': True
-                        }
-                    )
-                    fixes.append({
-                        'action': 'blocked_public_access',
-                        'bucket': bucket_name
-                    })
-                else:
-                    fixes.append({
-                        'action': 'detected',
-                        'bucket': bucket_name,
-                        'issue': 'Public access not fully blocked',
-                        'dry_run': DRY_RUN
-                    })
-        except:
-            pass
+            response = s3.get_public_access_block(Bucket=bucket_name)
+            return response['PublicAccessBlockConfiguration']
+        except Exception as e:
+            if error_code(e) == 'NoSuchPublicAccessBlockConfiguration':
+                return None
+            raise
 
-        return {
-            'resource_type': 's3_bucket',
-            'resource_id': bucket_name,
-            'fixes': fixes,
-            'count': len(fixes)
-        }
+    return describe_cache.get_or_load(('s3_public_access_block', bucket_name), load, not_before)
 
-    except Exception as e:
-        return {
-            'resource_type': 's3_bucket',
-            'resource_id': bucket_name,
-            'error': str(e)
-        }
 
+def publish_notification(subject: str, message: str):
+    print(f"📧 Sending SNS notification to {SNS_TOPIC_ARN}")
+    response = sns.publish(
+        TopicArn=SNS_TOPIC_ARN,
+        Subject=subject,
+        Message=message
+    )
+    print(f"✅ SNS notification sent successfully (MessageId: {response['MessageId']})")
 
-def send_notification(results: Dict):
-    """Send SNS notification about fixes"""
 
-    message = f"""Auto-Remediation Report
+# Buffers fix reports into one digest per DIGEST_WINDOW_SECONDS (0 sends per invocation)
+notifications = NotificationDigest(
+    'Auto-Remediation',
+    state_store('digest', DIGEST_STORE or None),
+    publish_notification
+)
 
-Timestamp: {results['timestamp']}
-Dry Run: {results['dry_run']}
 
-Fixes Applied: {len(results['fixes_applied'])}
+def notification_records(results: Dict) -> List[Dict]:
+    """Digest records for the fixes in results that took an action or failed"""
 
-"""
+    records = []
+    for fix in results.get('fixes_applied', []):
+        actions = [f['action'] for f in fix.get('fixes', [])]
+        if not actions and not fix.get('error'):
+            continue
+        first = (fix.get('fixes') or [{}])[0]
+        records.append(digest_record(
+            fix.get('resource_type', 'unknown'),
+            fix.get('resource_id'),
+            actions,
+            summary=first.get('reason') or first.get('issue') or '',
+            error=fix.get('error')
+        ))
+    return records
 
-    for fix in results['fixes_applied']:
-        message += f"\n{json.dumps(fix, indent=2)}\n"
 
-    if results['errors']:
-        message += f"\n\nErrors: {len(results['errors'])}\n"
-        for error in results['errors']:
-            message += f"- {error}\n"
+def send_notification(results: Dict):
+    """Send (or buffer) the SNS notification about fixes
+
+    Results with neither an action nor an error are left out. Called on
+    every invocation so closed digest windows are flushed even when this
+    invocation fixed nothing.
+    """
 
     try:
-        print(f"📧 Sending SNS notification to {SNS_TOPIC_ARN}")
-        response = sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject='AWS Auto-Remediation Report',
-            Message=message
-        )
-        print(f"✅ SNS notification sent successfully (MessageId: {response['MessageId']})")
+        notifications.notify(notification_records(results), context_lines=[f"Dry Run: {results['dry_run']}"])
     except Exception as e:
         print(f"❌ Error sending notification: {e}")
+
+
+# Compile the routing table once every handler above has registered
+rules.load(REMEDIATION_RULES_PATH)
@@ -0,0 +1,153 @@
+"""
+Declarative Remediation Rule Registry
+Routes EventBridge events to remediation handlers with one hash lookup
+"""
+
+import json
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# (source, detail-type, eventName); eventName is None for service events
+# such as EC2 Instance State-change Notification that carry none
+DispatchKey = Tuple[str, str, Optional[str]]
+ResourceIdFn = Callable[[Dict], Optional[str]]
+
+
+class Remediation(NamedTuple):
+    """A rule resolved against the handlers registered in code"""
+
+    rule: str
+    resource_type: str
+    resource_id: ResourceIdFn
+    fix: Callable[[Dict], Dict]
+
+
+def path_getter(path: str) -> ResourceIdFn:
+    """Precompile a dotted path such as 'detail.requestParameters.groupId'"""
+
+    keys = tuple(path.split('.'))
+
+    def get(event: Dict) -> Optional[str]:
+        value = event
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    return get
+
+
+def first_of(getters: List[ResourceIdFn]) -> ResourceIdFn:
+    """Resource id from the first path that is present in the event"""
+
+    if len(getters) == 1:
+        return getters[0]
+
+    def get(event: Dict) -> Optional[str]:
+        for getter in getters:
+            value = getter(event)
+            if value:
+                return value
+        return None
+
+    return get
+
+
+def load_rule_file(path: str) -> List[Dict]:
+    """Read the rule list from a JSON or YAML file"""
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            # Only needed for YAML rule files; the packaged rules are JSON
+            import yaml
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+
+    return document.get('rules', []) if isinstance(document, dict) else document
+
+
+class RuleRegistry:
+    """Maps (source, detail-type, eventName) to remediation handlers
+
+    Handlers register themselves by name with the ``remediation``
+    decorator; rules come from a JSON/YAML file and are compiled once into
+    a dict, so matching an event is a single hash lookup however many rules
+    exist and an unknown event is rejected just as fast.
+
+    Each rule names a handler and may list dotted ``resource_id`` paths
+    into the event. Handlers that need more than a path (several instances
+    in one launch, say) supply their own resource id function instead.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Tuple[Callable[[Dict], Dict], Optional[ResourceIdFn]]] = {}
+        self._dispatch: Dict[DispatchKey, Remediation] = {}
+
+    def remediation(self, resource_type: str, resource_id: Optional[ResourceIdFn] = None):
+        """Decorator registering a fix function as the handler for resource_type"""
+
+        def register(fix: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+            if resource_type in self._handlers:
+                raise ValueError(f"Duplicate remediation handler for {resource_type}")
+            self._handlers[resource_type] = (fix, resource_id)
+            return fix
+
+        return register
+
+    def load(self, path: str):
+        """Compile the rules in path; fails fast on unknown handlers or clashing keys"""
+
+        self.compile(load_rule_file(path))
+
+    def compile(self, rules: List[Dict]):
+        """Build the dispatch table from rule definitions"""
+
+        dispatch: Dict[DispatchKey, Remediation] = {}
+
+        for rule in rules:
+            name = rule['name']
+            resource_type = rule['handler']
+            if resource_type not in self._handlers:
+                raise ValueError(f"Rule {name} uses unregistered handler {resource_type}")
+            fix, handler_resource_id = self._handlers[resource_type]
+
+            paths = rule.get('resource_id') or []
+            if isinstance(paths, str):
+                paths = [paths]
+            if paths:
+                resource_id = first_of([path_getter(path) for path in paths])
+            elif handler_resource_id:
+                resource_id = handler_resource_id
+            else:
+                raise ValueError(f"Rule {name} has no resource_id paths and {resource_type} provides none")
+
+            remediation = Remediation(name, resource_type, resource_id, fix)
+            for event_name in rule.get('event_names') or [None]:
+                key = (rule['source'], rule['detail_type'], event_name)
+                if key in dispatch:
+                    raise ValueError(f"Rules {dispatch[key].rule} and {name} both match {key}")
+                dispatch[key] = remediation
+
+        self._dispatch = dispatch
+
+    def lookup(self, event: Dict) -> Optional[Remediation]:
+        """The rule matching event, or None"""
+
+        detail = event.get('detail')
+        event_name = detail.get('eventName') if isinstance(detail, dict) else None
+        return self._dispatch.get((event.get('source'), event.get('detail-type'), event_name))
+
+    def match(self, event: Dict) -> Optional[Tuple[str, Optional[str], Callable[[Dict], Dict]]]:
+        """Resolve an event to (resource_type, resource_id, fix function)"""
+
+        remediation = self.lookup(event)
+        if remediation is None:
+            return None
+        return remediation.resource_type, remediation.resource_id(event), remediation.fix
+
+    def rules(self) -> List[DispatchKey]:
+        """Every dispatch key currently compiled"""
+
+        return list(self._dispatch)
+
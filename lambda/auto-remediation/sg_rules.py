@@ -0,0 +1,204 @@
+"""
+Security Group Rule Evaluation for Auto-Remediation
+Compiles forbidden port/protocol/CIDR policies into an interval index
+"""
+
+import ipaddress
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Ingress that must never be reachable from the internet.
+# Mirrors policies/templates/security-group.rego, so the database ports are
+# enforced here as well as SSH and RDP.
+FORBIDDEN_INGRESS = [
+    {'name': 'SSH', 'protocol': 'tcp', 'from_port': 22, 'to_port': 22},
+    {'name': 'RDP', 'protocol': 'tcp', 'from_port': 3389, 'to_port': 3389},
+    {'name': 'MySQL', 'protocol': 'tcp', 'from_port': 3306, 'to_port': 3306},
+    {'name': 'PostgreSQL', 'protocol': 'tcp', 'from_port': 5432, 'to_port': 5432},
+    {'name': 'MSSQL', 'protocol': 'tcp', 'from_port': 1433, 'to_port': 1433},
+    {'name': 'MongoDB', 'protocol': 'tcp', 'from_port': 27017, 'to_port': 27017},
+    {'name': 'Redis', 'protocol': 'tcp', 'from_port': 6379, 'to_port': 6379},
+]
+
+# Only sources that together cover the whole address space (0.0.0.0/0, ::/0
+# or split forms such as 0.0.0.0/1 + 128.0.0.0/1) are revoked. Public ranges
+# this wide or wider are reported for review but left in place; they are
+# often a legitimate corporate or peer range.
+WIDE_PREFIXLEN = {4: 8, 6: 16}
+
+INTERNAL_NETWORKS = [
+    ipaddress.ip_network('10.0.0.0/8'),
+    ipaddress.ip_network('172.16.0.0/12'),
+    ipaddress.ip_network('192.168.0.0/16'),
+    ipaddress.ip_network('100.64.0.0/10'),
+    ipaddress.ip_network('fc00::/7'),
+]
+
+PROTOCOL_ALIASES = {'6': 'tcp', '17': 'udp', '1': 'icmp', '58': 'icmpv6'}
+
+ALL_PORTS = (0, 65535)
+
+
+@lru_cache(maxsize=4096)
+def parse_cidr(cidr: str):
+    try:
+        return ipaddress.ip_network(cidr, strict=False)
+    except ValueError:
+        return None
+
+
+def is_internal(network) -> bool:
+    return any(
+        network.version == internal.version and network.subnet_of(internal)
+        for internal in INTERNAL_NETWORKS
+    )
+
+
+def classify_ranges(ranges: List[Dict], key: str) -> Tuple[List[Dict], List[Dict]]:
+    """(open, wide) ranges of one address family in a permission
+
+    open: the non-internal ranges, when the ranges together cover the whole
+    address space. wide: otherwise, public ranges at least WIDE_PREFIXLEN wide.
+    """
+
+    parsed = [(r, parse_cidr(r.get(key, ''))) for r in ranges]
+    parsed = [(r, network) for r, network in parsed if network is not None]
+    if not parsed:
+        return [], []
+
+    public = [(r, network) for r, network in parsed if not is_internal(network)]
+    covered = ipaddress.collapse_addresses(network for _, network in parsed)
+    if any(network.prefixlen == 0 for network in covered):
+        return [r for r, _ in public], []
+
+    return [], [r for r, network in public if network.prefixlen <= WIDE_PREFIXLEN[network.version]]
+
+
+class PortIntervalIndex:
+    """Maps a port range to the policies it overlaps
+
+    Policy boundaries split the port space into elementary segments, each
+    holding the policies that cover it, so a lookup is a binary search plus
+    a walk over the segments the queried range spans.
+    """
+
+    def __init__(self, policies: List[Dict]):
+        bounds = sorted(
+            {p['from_port'] for p in policies} | {p['to_port'] + 1 for p in policies}
+        )
+        self._bounds = bounds
+        self._segments = [
+            tuple(p for p in policies if p['from_port'] <= start <= p['to_port'])
+            for start in bounds
+        ]
+
+    def overlapping(self, from_port: int, to_port: int) -> List[Dict]:
+        """Return the policies whose port range intersects [from_port, to_port]"""
+
+        if not self._bounds:
+            return []
+
+        first = max(bisect_right(self._bounds, from_port) - 1, 0)
+        last = bisect_right(self._bounds, to_port)
+
+        matched = {}
+        for segment in self._segments[first:last]:
+            for policy in segment:
+                matched[policy['name']] = policy
+
+        return list(matched.values())
+
+
+class CompiledRuleSet:
+    """Forbidden ingress policies compiled into per-protocol interval indexes"""
+
+    def __init__(self, policies: List[Dict]):
+        self.policies = list(policies)
+        by_protocol: Dict[str, List[Dict]] = {}
+        for policy in self.policies:
+            by_protocol.setdefault(policy['protocol'], []).append(policy)
+        self._indexes = {
+            protocol: PortIntervalIndex(members)
+            for protocol, members in by_protocol.items()
+        }
+
+    def match_permission(self, permission: Dict) -> Tuple[List[Dict], Tuple[int, int]]:
+        """Return the policies an IpPermission's protocol/ports overlap"""
+
+        protocol = str(permission.get('IpProtocol', '-1')).lower()
+        protocol = PROTOCOL_ALIASES.get(protocol, protocol)
+
+        # Protocol -1 means every protocol on every port
+        if protocol == '-1':
+            return self.policies, ALL_PORTS
+
+        index = self._indexes.get(protocol)
+        from_port = permission.get('FromPort', ALL_PORTS[0])
+        to_port = permission.get('ToPort', ALL_PORTS[1])
+        port_range = (from_port, to_port)
+
+        if not index:
+            return [], port_range
+
+        # A -1 port bound on tcp/udp also means the full range
+        if from_port == -1 or to_port == -1:
+            port_range = ALL_PORTS
+
+        return index.overlapping(*port_range), port_range
+
+    def evaluate(self, security_group: Dict) -> List[Dict]:
+        """Scan every ingress permission once and collect violations
+
+        Each violation carries a ``revoke`` IpPermission holding only the
+        ranges open to the whole internet, so CIDRs that are fine on the
+        same rule are left in place. Wide public ranges and prefix-list
+        sources cannot be judged safely and are returned for review instead.
+        """
+
+        violations = []
+
+        for permission in security_group.get('IpPermissions', []):
+            policies, port_range = self.match_permission(permission)
+            if not policies:
+                continue
+
+            ip_ranges, wide_ip = classify_ranges(permission.get('IpRanges', []), 'CidrIp')
+            ipv6_ranges, wide_ipv6 = classify_ranges(permission.get('Ipv6Ranges', []), 'CidrIpv6')
+            prefix_lists = permission.get('PrefixListIds', [])
+
+            if not (ip_ranges or ipv6_ranges or wide_ip or wide_ipv6 or prefix_lists):
+                continue
+
+            revoke = None
+            if ip_ranges or ipv6_ranges:
+                revoke = {'IpProtocol': permission.get('IpProtocol', '-1')}
+                for key in ('FromPort', 'ToPort'):
+                    if key in permission:
+                        revoke[key] = permission[key]
+                if ip_ranges:
+                    revoke['IpRanges'] = ip_ranges
+                if ipv6_ranges:
+                    revoke['Ipv6Ranges'] = ipv6_ranges
+
+            violations.append({
+                'protocol': permission.get('IpProtocol', '-1'),
+                'port_range': f"{port_range[0]}-{port_range[1]}",
+                'policies': [p['name'] for p in policies],
+                'cidrs': [r['CidrIp'] for r in ip_ranges] + [r['CidrIpv6'] for r in ipv6_ranges],
+                'wide_cidrs': [r['CidrIp'] for r in wide_ip] + [r['CidrIpv6'] for r in wide_ipv6],
+                'prefix_lists': [p.get('PrefixListId') for p in prefix_lists],
+                'revoke': revoke
+            })
+
+        return violations
+
+
+def build_revocations(violations: List[Dict]) -> List[Dict]:
+    """Collect the IpPermissions to revoke in a single API call"""
+
+    return [v['revoke'] for v in violations if v['revoke']]
+
+
+DEFAULT_RULESET = CompiledRuleSet(FORBIDDEN_INGRESS)
+
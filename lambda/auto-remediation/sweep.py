@@ -0,0 +1,232 @@
+"""
+Account-Wide Sweep for Auto-Remediation
+Pages through existing resources in every region with resumable checkpoints
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from shared.aws_clients import error_code
+from shared.stores import state_store
+
+# Listing failures after which a unit is abandoned for this sweep
+MAX_LIST_FAILURES = 3
+
+# (items, next_token) for one page of a unit; next_token None means done
+FetchPage = Callable[[str, Optional[str], Optional[str]], Tuple[List[Dict], Optional[str]]]
+# Remediation result for one item of a unit
+ProcessItem = Callable[[str, Optional[str], Dict], Dict]
+
+
+class FileCheckpointStore:
+    """Checkpoint kept in a local JSON file (warm container or local runs)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, state: Dict):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+class S3CheckpointStore:
+    """Checkpoint kept as a JSON object in S3 so it survives across containers
+
+    The role needs s3:ListBucket on the bucket; without it S3 reports a
+    missing checkpoint as AccessDenied and the first sweep can't start.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def load(self) -> Optional[Dict]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+        except Exception as e:
+            if error_code(e) in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def save(self, state: Dict):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(state).encode('utf-8'),
+            ContentType='application/json',
+            ServerSideEncryption='AES256'
+        )
+
+
+class StateCheckpointStore:
+    """Checkpoint kept as one item in the shared state table (see shared.stores)"""
+
+    def __init__(self, store, key: str):
+        self.store = store
+        self.key = key
+
+    def load(self) -> Optional[Dict]:
+        return self.store.get(self.key)
+
+    def save(self, state: Dict):
+        self.store.put(self.key, state)
+
+
+def checkpoint_store(uri: str, s3_client):
+    """Build a checkpoint store from an s3://bucket/key URI, dynamodb://key or a local path"""
+
+    if uri.startswith('s3://'):
+        bucket, _, key = uri[len('s3://'):].partition('/')
+        return S3CheckpointStore(s3_client, bucket, key or 'auto-remediation/sweep-checkpoint.json')
+    if uri.startswith('dynamodb://'):
+        return StateCheckpointStore(state_store('sweep', 'dynamodb'), uri[len('dynamodb://'):] or 'checkpoint')
+    return FileCheckpointStore(uri)
+
+
+def is_shared(store) -> bool:
+    """Whether every container sees the same checkpoint"""
+
+    return not isinstance(store, FileCheckpointStore)
+
+
+def unit_key(kind: str, region: Optional[str]) -> str:
+    return f"{kind}:{region or 'global'}"
+
+
+def new_sweep_state(units: List[Tuple[str, Optional[str]]]) -> Dict:
+    """Fresh checkpoint covering every (resource kind, region) unit"""
+
+    return {
+        'started_at': datetime.utcnow().isoformat(),
+        'completed_at': None,
+        'invocations': 0,
+        'units': {
+            unit_key(kind, region): {
+                'kind': kind,
+                'region': region,
+                'next_token': None,
+                'done': False,
+                'scanned': 0,
+                'flagged': 0,
+                'errors': 0
+            }
+            for kind, region in units
+        }
+    }
+
+
+def sweep_due(state: Optional[Dict], min_interval_seconds: float) -> bool:
+    """Whether a new sweep should start instead of resuming or idling"""
+
+    if not state:
+        return True
+    if not state.get('completed_at'):
+        return False
+
+    completed = datetime.fromisoformat(state['completed_at'])
+    return (datetime.utcnow() - completed).total_seconds() >= min_interval_seconds
+
+
+class Sweeper:
+    """Walks every unfinished unit page by page until done or out of time
+
+    Units (one resource kind in one region) run in parallel on a worker
+    pool; pages within a unit run in order. The checkpoint advances only
+    after a whole page has been processed, so a page cut short by the
+    deadline is simply processed again on the next invocation.
+    """
+
+    def __init__(self, state: Dict, store, fetch_page: FetchPage, process_item: ProcessItem,
+                 deadline: float, workers: int = 8):
+        self.state = state
+        self.store = store
+        self.fetch_page = fetch_page
+        self.process_item = process_item
+        self.deadline = deadline
+        self.workers = workers
+        self.results: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def run(self) -> Dict:
+        """Sweep until every unit is done or the deadline passes"""
+
+        self.state['invocations'] += 1
+        pending = [key for key, unit in self.state['units'].items() if not unit['done']]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(pending))),
+                                thread_name_prefix='sweep') as pool:
+            list(pool.map(self._sweep_unit, pending))
+
+        if all(unit['done'] for unit in self.state['units'].values()):
+            self.state['completed_at'] = datetime.utcnow().isoformat()
+        self._save()
+
+        return self.summary()
+
+    def _sweep_unit(self, key: str):
+        unit = self.state['units'][key]
+
+        while not unit['done'] and time.monotonic() < self.deadline:
+            try:
+                items, next_token = self.fetch_page(unit['kind'], unit['region'], unit['next_token'])
+            except Exception as e:
+                print(f"❌ Sweep of {key} failed to list resources: {e}")
+                with self._lock:
+                    unit['errors'] += 1
+                    unit['list_failures'] = unit.get('list_failures', 0) + 1
+                    # Give up on a unit that keeps failing so the sweep can complete
+                    if unit['list_failures'] >= MAX_LIST_FAILURES:
+                        unit['done'] = True
+                        unit['abandoned'] = str(e)
+                return
+
+            page_results = []
+            for item in items:
+                if time.monotonic() >= self.deadline:
+                    return
+                page_results.append(self.process_item(unit['kind'], unit['region'], item))
+
+            with self._lock:
+                unit['next_token'] = next_token
+                unit['done'] = next_token is None
+                unit['scanned'] += len(items)
+                for result in page_results:
+                    if result.get('error'):
+                        unit['errors'] += 1
+                    if result.get('count'):
+                        unit['flagged'] += 1
+                    if result.get('count') or result.get('error'):
+                        self.results.append(result)
+            self._save()
+
+    def _save(self):
+        with self._lock:
+            self.store.save(self.state)
+
+    def summary(self) -> Dict:
+        units = self.state['units'].values()
+        return {
+            'started_at': self.state['started_at'],
+            'completed_at': self.state['completed_at'],
+            'invocations': self.state['invocations'],
+            'units_done': sum(1 for unit in units if unit['done']),
+            'units_total': len(self.state['units']),
+            'scanned': sum(unit['scanned'] for unit in units),
+            'flagged': sum(unit['flagged'] for unit in units),
+            'errors': sum(unit['errors'] for unit in units)
+        }
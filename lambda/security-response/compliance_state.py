@@ -0,0 +1,111 @@
+"""
+Incremental AWS Config Compliance State
+Last known compliance per (rule, resource), with per-rule counters and open violations
+
+Config re-evaluates resources on a schedule and re-sends the same result
+every time. Each evaluation swaps the resource's state in one conditional
+write that only lands if no later evaluation is stored (late, out-of-order
+deliveries are ignored); only a change of state (a transition) updates the rule's counters and its
+open violations, and only transitions reach the response actions and
+alerts. A repeated evaluation costs a single write.
+
+Each open violation is its own small item, indexed by rule and the time it
+opened, so a noisy rule never grows a single item towards the DynamoDB size
+limit. The per-rule summary answers "how many resources are non-compliant
+for this rule and since when" with one counter read and a one-item index
+query, so compliance reports don't need describe_compliance_by_config_rule.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+COMPLIANCE_STORE = os.environ.get('COMPLIANCE_STORE', '')
+
+COMPLIANT = 'COMPLIANT'
+NON_COMPLIANT = 'NON_COMPLIANT'
+
+# Members of the index of every rule seen
+RULES_KEY = 'rules'
+
+
+def counter_name(compliance: str) -> str:
+    return compliance.lower()
+
+
+class ComplianceState:
+    """Compliance state store with transition detection and O(1) rule counters"""
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def resource_key(rule: str, resource_type: str, resource_id: str) -> str:
+        return f"resource#{rule}#{resource_type}#{resource_id}"
+
+    @staticmethod
+    def rule_key(rule: str) -> str:
+        return f"rule#{rule}"
+
+    @staticmethod
+    def violation_key(rule: str, resource_type: str, resource_id: str) -> str:
+        return f"violation#{rule}#{resource_type}#{resource_id}"
+
+    @staticmethod
+    def violations_index(rule: str) -> str:
+        return f"violations#{rule}"
+
+    def record(self, rule: str, resource_type: str, resource_id: str, compliance: str,
+               evaluated_at: str) -> Optional[Dict]:
+        """Store an evaluation; returns the transition, or None if the state is unchanged
+
+        Evaluations older than the stored one (out-of-order delivery) are
+        not written and are treated as unchanged.
+        """
+
+        key = self.resource_key(rule, resource_type, resource_id)
+        current = {'compliance': compliance, 'evaluated_at': evaluated_at}
+        stored, previous = self.store.swap_if_newer(key, current, evaluated_at)
+        if not stored:
+            return None
+
+        before = previous['compliance'] if previous else None
+        if before == compliance:
+            return None
+
+        deltas = {counter_name(compliance): 1, 'transitions': 1}
+        if before:
+            deltas[counter_name(before)] = -1
+        self.store.increment(self.rule_key(rule), deltas)
+
+        member = f"{resource_type}/{resource_id}"
+        violation = self.violation_key(rule, resource_type, resource_id)
+        if compliance == NON_COMPLIANT:
+            self.store.put(violation, {'resource': member, 'since': evaluated_at},
+                           index=(self.violations_index(rule), f"{evaluated_at}#{member}"))
+        elif before == NON_COMPLIANT:
+            self.store.delete(violation)
+        if before is None:
+            self.store.update_members(RULES_KEY, 'names', add={rule: evaluated_at})
+
+        return {'from': before, 'to': compliance, 'at': evaluated_at}
+
+    def rule_summary(self, rule: str) -> Dict:
+        """Counters and oldest open violation for one rule"""
+
+        counters = self.store.get_counters(self.rule_key(rule))
+        oldest = self.store.query_index(self.violations_index(rule), limit=1)
+
+        return {
+            'rule': rule,
+            'non_compliant': counters.get(counter_name(NON_COMPLIANT), 0),
+            'compliant': counters.get(counter_name(COMPLIANT), 0),
+            'transitions': counters.get('transitions', 0),
+            'oldest_violation': oldest[0] if oldest else None
+        }
+
+    def report(self, rules: Optional[List[str]] = None) -> List[Dict]:
+        """Summaries for the given rules, or every rule seen, worst first"""
+
+        rules = rules or sorted(self.store.get_members(RULES_KEY, 'names'))
+        summaries = [self.rule_summary(rule) for rule in rules]
+        return sorted(summaries, key=lambda s: (-s['non_compliant'], s['rule']))
@@ -0,0 +1,150 @@
+"""
+Forensic Snapshot Pipeline for GuardDuty Incidents
+Starts tagged EBS snapshots without waiting for them and tracks their completion
+
+CreateSnapshots takes a crash-consistent snapshot of every volume attached
+to an instance in one call. Where it is refused, the volumes are listed
+with a paginated describe and snapshotted on a bounded worker pool. Either
+way the containment path returns as soon as the snapshot ids are known;
+progress is recorded per finding in the shared state store and refreshed
+on demand with a single DescribeSnapshots call.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from shared.aws_clients import error_code
+
+FORENSICS_TTL_SECONDS = int(os.environ.get('FORENSICS_TTL_SECONDS', str(30 * 86400)))
+
+# CreateSnapshots errors that mean "snapshot the volumes one by one instead"
+FALLBACK_ERROR_CODES = {'UnsupportedOperation', 'InvalidParameterValue', 'InvalidParameterCombination'}
+
+STATUS_PENDING = 'pending'
+STATUS_COMPLETED = 'completed'
+STATUS_ERROR = 'error'
+
+
+def snapshot_tags(instance_id: str, finding_id: str, finding_type: str) -> List[Dict]:
+    return [
+        {'Key': 'Name', 'Value': f"forensics-{instance_id}"},
+        {'Key': 'Purpose', 'Value': 'Security-Incident-Response'},
+        {'Key': 'GuardDutyFindingId', 'Value': finding_id},
+        {'Key': 'GuardDutyFindingType', 'Value': finding_type[:256]},
+        {'Key': 'SourceInstanceId', 'Value': instance_id}
+    ]
+
+
+class ForensicSnapshots:
+    """Starts forensic snapshots for an instance and tracks them per finding"""
+
+    def __init__(self, ec2_client, store, pool: ThreadPoolExecutor):
+        self.ec2 = ec2_client
+        self.store = store
+        self.pool = pool
+
+    def start(self, instance_id: str, finding_id: str, finding_type: str) -> Dict:
+        """Kick off snapshots of every attached volume; returns the tracking record"""
+
+        description = f"Forensic snapshot - GuardDuty finding {finding_type}"
+        tags = snapshot_tags(instance_id, finding_id, finding_type)
+
+        try:
+            snapshots = self._create_snapshots(instance_id, description, tags)
+            method = 'create_snapshots'
+        except Exception as e:
+            if error_code(e) not in FALLBACK_ERROR_CODES:
+                raise
+            print(f"⚠️ CreateSnapshots refused for {instance_id} ({error_code(e)}), snapshotting volumes individually")
+            snapshots = self._snapshot_volumes(instance_id, description, tags)
+            method = 'create_snapshot'
+
+        record = {
+            'finding_id': finding_id,
+            'instance_id': instance_id,
+            'method': method,
+            'requested_at': datetime.utcnow().isoformat(),
+            'status': STATUS_PENDING if snapshots else STATUS_COMPLETED,
+            'snapshots': snapshots
+        }
+        self._save(record)
+        return record
+
+    def _create_snapshots(self, instance_id: str, description: str, tags: List[Dict]) -> List[Dict]:
+        response = self.ec2.create_snapshots(
+            InstanceSpecification={'InstanceId': instance_id, 'ExcludeBootVolume': False},
+            Description=description,
+            TagSpecifications=[{'ResourceType': 'snapshot', 'Tags': tags}],
+            CopyTagsFromSource='volume'
+        )
+        return [
+            {'snapshot_id': s['SnapshotId'], 'volume_id': s.get('VolumeId'), 'state': s.get('State', STATUS_PENDING)}
+            for s in response.get('Snapshots', [])
+        ]
+
+    def _snapshot_volumes(self, instance_id: str, description: str, tags: List[Dict]) -> List[Dict]:
+        volume_ids = []
+        params = {'Filters': [{'Name': 'attachment.instance-id', 'Values': [instance_id]}], 'MaxResults': 500}
+        while True:
+            response = self.ec2.describe_volumes(**params)
+            volume_ids.extend(volume['VolumeId'] for volume in response['Volumes'])
+            if not response.get('NextToken'):
+                break
+            params['NextToken'] = response['NextToken']
+
+        def snapshot(volume_id: str) -> Dict:
+            try:
+                response = self.ec2.create_snapshot(
+                    VolumeId=volume_id,
+                    Description=description,
+                    TagSpecifications=[{'ResourceType': 'snapshot', 'Tags': tags}]
+                )
+                return {'snapshot_id': response['SnapshotId'], 'volume_id': volume_id, 'state': response.get('State', STATUS_PENDING)}
+            except Exception as e:
+                return {'snapshot_id': None, 'volume_id': volume_id, 'state': STATUS_ERROR, 'error': str(e)}
+
+        return list(self.pool.map(snapshot, volume_ids))
+
+    def status(self, finding_id: str) -> Optional[Dict]:
+        """Tracking record for a finding, refreshed from EC2 while snapshots are pending"""
+
+        record = self.store.get(finding_id)
+        if not record or record['status'] != STATUS_PENDING:
+            return record
+
+        pending = [s['snapshot_id'] for s in record['snapshots'] if s['snapshot_id'] and s['state'] == STATUS_PENDING]
+        if pending:
+            described = {}
+            params = {'SnapshotIds': pending}
+            while True:
+                response = self.ec2.describe_snapshots(**params)
+                described.update({s['SnapshotId']: s for s in response['Snapshots']})
+                if not response.get('NextToken'):
+                    break
+                params['NextToken'] = response['NextToken']
+
+            for snapshot in record['snapshots']:
+                current = described.get(snapshot['snapshot_id'])
+                if current:
+                    snapshot['state'] = current['State']
+                    snapshot['progress'] = current.get('Progress')
+
+        states = {snapshot['state'] for snapshot in record['snapshots']}
+        if STATUS_ERROR in states:
+            record['status'] = STATUS_ERROR
+        elif states <= {STATUS_COMPLETED}:
+            record['status'] = STATUS_COMPLETED
+            record['completed_at'] = datetime.utcnow().isoformat()
+        record['checked_at'] = datetime.utcnow().isoformat()
+
+        self._save(record)
+        return record
+
+    def _save(self, record: Dict):
+        # Tracking is best effort; the snapshots themselves carry the finding id tag
+        try:
+            self.store.put(record['finding_id'], record, FORENSICS_TTL_SECONDS)
+        except Exception as e:
+            print(f"⚠️ Could not record forensic snapshots for {record['finding_id']}: {e}")
@@ -4,22 +4,81 @@ Responds to security events from AWS Security Hub, GuardDuty, etc.
 """
 
 import json
-import boto3
 import os
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from datetime import datetime
 
-# Initialize clients
-ec2 = boto3.client('ec2')
-sns = boto3.client('sns')
-ssm = boto3.client('ssm')
+from forensics import ForensicSnapshots
+from compliance_state import COMPLIANCE_STORE, ComplianceState
+from incident_index import INCIDENT_STORE, IncidentIndex, finding_resources
+from incident_queue import PRIORITY_CRITICAL, IncidentQueue, process_batch
+from isolation_pool import IsolationGroupPool, instance_vpc_id
+from securityhub_batch import SecurityHubBatch
+from shared.aws_clients import error_code, lazy_client, provider
+from shared.digest import DIGEST_STORE, NotificationDigest, digest_record
+from shared.instrumentation import MetricsRecorder, log_event
+from shared.stores import state_store
+
+# Per-stage and per-AWS-call latency, flushed as EMF after each invocation
+metrics = MetricsRecorder()
+metrics.install(provider)
+
+# AWS clients are built on first use from one shared session
+ec2 = lazy_client('ec2')
+s3 = lazy_client('s3')
+sns = lazy_client('sns')
+securityhub = lazy_client('securityhub')
 
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', '')
 
+# Deny-all isolation group per VPC, reused across incidents in this container
+isolation_groups = IsolationGroupPool(ec2)
+
+# Per-volume fallback when CreateSnapshots is refused for an instance
+SNAPSHOT_WORKERS = int(os.environ.get('SNAPSHOT_WORKERS', '4'))
+snapshot_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS, thread_name_prefix='snapshot')
+
+# Snapshot ids and completion state per GuardDuty finding id
+forensic_snapshots = ForensicSnapshots(ec2, state_store('forensics'), snapshot_pool)
+
+# Remediates each unique Security Hub target once per event, concurrently
+SECURITY_HUB_WORKERS = int(os.environ.get('SECURITY_HUB_WORKERS', '8'))
+securityhub_batch = SecurityHubBatch(
+    s3, securityhub,
+    ThreadPoolExecutor(max_workers=SECURITY_HUB_WORKERS, thread_name_prefix='securityhub')
+)
+
+# Open incident per resource, so repeat findings don't re-run containment
+incidents = IncidentIndex(state_store('incidents', INCIDENT_STORE or None))
+
+# Last Config result per (rule, resource) and per-rule rollups
+compliance = ComplianceState(state_store('compliance', COMPLIANCE_STORE or None))
+
+# Severity tiers: critical containment inline, the rest queued (PRIORITY_QUEUE_BACKEND)
+incident_queue = IncidentQueue()
+
+@metrics.invocation
 def lambda_handler(event, context):
     """Main handler for security events"""
 
-    print(f"Security event received: {json.dumps(event)}")
+    log_event(event, 'Security event received')
+
+    # Direct invocation: {"forensics_status": "<GuardDuty finding id>"}
+    if event.get('forensics_status'):
+        return forensics_status(event['forensics_status'])
+
+    # Scheduled invocation: {"flush_digest": true} publishes closed digest windows
+    if event.get('flush_digest'):
+        return flush_digest()
+
+    # Direct invocation: {"compliance_report": true} or a list of rule names
+    if event.get('compliance_report'):
+        return compliance_report(event['compliance_report'])
+
+    # Tier queue batches delivered by the SQS event source mappings
+    if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+        return sqs_batch_handler(event)
 
     response = {
         'timestamp': datetime.utcnow().isoformat(),
@@ -28,25 +87,20 @@ def lambda_handler(event, context):
     }
 
     try:
-        # Determine event source
-        source = event.get('source', '')
-
-        if 'guardduty' in source.lower():
-            result = handle_guardduty_finding(event)
-            response['actions_taken'].append(result)
-
-        elif 'securityhub' in source.lower():
-            result = handle_securityhub_finding(event)
-            response['actions_taken'].append(result)
-
-        elif 'config' in source.lower():
-            result = handle_config_violation(event)
-            response['actions_taken'].append(result)
+        # Critical work runs now; the rest is queued by severity when enabled
+        routed = incident_queue.route(event, dispatch)
+        response['actions_taken'].extend(routed['actions'])
+        if routed['queued']:
+            response['queued'] = routed['queued']
+        if routed['queue_errors']:
+            response['queue_errors'] = routed['queue_errors']
 
         # Send alert
         if response['actions_taken']:
-            send_security_alert(response)
-            response['alerts_sent'].append('SNS notification sent')
+            if send_security_alert(response):
+                response['alerts_sent'].append('SNS notification sent')
+            elif SNS_TOPIC_ARN and security_alerts.enabled:
+                response['alerts_sent'].append('Buffered for SNS digest')
 
     except Exception as e:
         print(f"Error handling security event: {e}")
@@ -58,6 +112,7 @@ def lambda_handler(event, context):
     }
 
 
+@metrics.stage
 def handle_guardduty_finding(event: Dict) -> Dict:
     """Handle GuardDuty security findings"""
 
@@ -67,6 +122,7 @@ def handle_guardduty_finding(event: Dict) -> Dict:
 
     action = {
         'source': 'guardduty',
+        'finding_id': detail.get('id'),
         'finding_type': finding_type,
         'severity': severity,
         'actions': []
@@ -75,106 +131,71 @@ def handle_guardduty_finding(event: Dict) -> Dict:
     # High severity findings - take immediate action
     if severity >= 7:
         # Check for compromised instance
-        if 'UnauthorizedAccess' in finding_type or 'CryptoCurrency' in finding_type:
-            resource = detail.get('resource', {})
-            instance_id = resource.get('instanceDetails', {}).get('instanceId')
+        contain = 'UnauthorizedAccess' in finding_type or 'CryptoCurrency' in finding_type
+        instance_details = detail.get('resource', {}).get('instanceDetails', {})
 
-            if instance_id:
-                # Isolate the instance
+        for resource_type, resource_id in finding_resources(detail):
+            if not (contain and resource_type == 'instance'):
+                # No containment playbook; just correlate the finding
                 try:
-                    # Create isolation security group
-                    isolation_sg = create_isolation_security_group()
-
-                    # Apply to instance
-                    ec2.modify_instance_attribute(
-                        InstanceId=instance_id,
-                        Groups=[isolation_sg]
-                    )
-
-                    action['actions'].append({
-                        'action': 'isolated_instance',
-                        'instance_id': instance_id,
-                        'security_group': isolation_sg
-                    })
-
-                    # Create snapshot for forensics
-                    volumes = ec2.describe_volumes(
-                        Filters=[
-                            {'Name': 'attachment.instance-id', 'Values': [instance_id]}
-                        ]
-                    )
-
-                    for volume in volumes['Volumes']:
-                        snapshot = ec2.create_snapshot(
-                            VolumeId=volume['VolumeId'],
-                            Description=f'Forensic snapshot - GuardDuty finding {finding_type}'
-                        )
-                        action['actions'].append({
-                            'action': 'created_snapshot',
-                            'volume_id': volume['VolumeId'],
-                            'snapshot_id': snapshot['SnapshotId']
-                        })
+                    incident = incidents.attach(resource_type, resource_id, detail)
+                except Exception as e:
+                    print(f"⚠️ Could not correlate {resource_type} {resource_id}: {e}")
+                    continue
+                if incident:
+                    action['actions'].append(attached_action(incident))
+                continue
+
+            try:
+                opened, incident = incidents.open(resource_type, resource_id, detail)
+            except Exception as e:
+                # Without the index, containing twice beats not containing
+                print(f"⚠️ Incident index unavailable, containing {resource_id} anyway: {e}")
+                opened, incident = True, None
+
+            if not opened:
+                action['actions'].append(attached_action(incident))
+                continue
+
+            try:
+                containment = contain_instance(resource_id, instance_details, detail, finding_type)
+                action['actions'].extend(containment)
+            except Exception as e:
+                action['error'] = str(e)
+                if incident:
+                    try:
+                        incidents.release(resource_type, resource_id)
+                    except Exception as release_error:
+                        print(f"⚠️ Could not release incident for {resource_id}: {release_error}")
+                continue
 
+            if incident:
+                try:
+                    incidents.contained(resource_type, resource_id, incident, {
+                        a['action']: {k: v for k, v in a.items() if k != 'action'} for a in containment
+                    })
                 except Exception as e:
-                    action['error'] = str(e)
+                    print(f"⚠️ Could not record containment of {resource_id}: {e}")
 
     return action
 
 
+@metrics.stage
 def handle_securityhub_finding(event: Dict) -> Dict:
     """Handle Security Hub findings"""
 
-    detail = event.get('detail', {})
-    findings = detail.get('findings', [])
-
-    action = {
-        'source': 'securityhub',
-        'findings_count': len(findings),
-        'actions': []
-    }
-
-    for finding in findings:
-        severity = finding.get('Severity', {}).get('Label', '')
-        title = finding.get('Title', '')
-
-        # Handle specific finding types
-        if 'S3' in title and 'public' in title.lower():
-            # Block public access on S3 bucket
-            resources = finding.get('Resources', [])
-            for resource in resources:
-                if resource.get('Type') == 'AwsS3Bucket':
-                    bucket_name = resource.get('Id', '').split(':')[-1]
-                    try:
-                        s3 = boto3.client('s3')
-                        s3.put_public_access_block(
-                            Bucket=bucket_name,
-                            PublicAccessBlockConfiguration={
-                                'BlockPublicAcls': True,
-                                'IgnorePublicAcls': True,
-                                'BlockPublicPolicy': True,
-                                'RestrictPublicBuckets': True
-                            }
-                        )
-                        action['actions'].append({
-                            'action': 'blocked_s3_public_access',
-                            'bucket': bucket_name
-                        })
-                    except Exception as e:
-                        action['actions'].append({
-                            'action': 'failed',
-                            'bucket': bucket_name,
-                            'error': str(e)
-                        })
-
-    return action
+    findings = event.get('detail', {}).get('findings', [])
+    return securityhub_batch.process(findings)
 
 
+@metrics.stage
 def handle_config_violation(event: Dict) -> Dict:
     """Handle AWS Config compliance violations"""
 
     detail = event.get('detail', {})
     config_rule_name = detail.get('configRuleName', '')
-    compliance_type = detail.get('newEvaluationResult', {}).get('complianceType', '')
+    evaluation = detail.get('newEvaluationResult', {})
+    compliance_type = evaluation.get('complianceType', '')
 
     action = {
         'source': 'config',
@@ -183,6 +204,26 @@ def handle_config_violation(event: Dict) -> Dict:
         'actions': []
     }
 
+    # Config re-sends unchanged results; only act on a change of state
+    try:
+        transition = compliance.record(
+            config_rule_name,
+            detail.get('resourceType', ''),
+            detail.get('resourceId', ''),
+            compliance_type,
+            evaluation.get('resultRecordedTime') or event.get('time') or datetime.utcnow().isoformat()
+        )
+    except Exception as e:
+        print(f"⚠️ Compliance state unavailable, treating evaluation as new: {e}")
+        transition = {'from': None, 'to': compliance_type}
+
+    if transition is None or (transition['from'] is None and compliance_type != 'NON_COMPLIANT'):
+        action['unchanged'] = True
+        return action
+
+    action['previous_compliance'] = transition['from']
+    action['resource_id'] = detail.get('resourceId')
+
     if compliance_type == 'NON_COMPLIANT':
         # Log the violation
         action['actions'].append({
@@ -197,67 +238,207 @@ def handle_config_violation(event: Dict) -> Dict:
                 'message': 'Encryption violation detected - manual review required'
             })
 
+    elif transition['from'] == 'NON_COMPLIANT':
+        action['actions'].append({
+            'action': 'resolved_violation',
+            'rule': config_rule_name
+        })
+
     return action
 
 
-def create_isolation_security_group() -> str:
-    """Create a security group that blocks all traffic"""
+def contain_instance(instance_id: str, instance_details: Dict, detail: Dict, finding_type: str) -> List[Dict]:
+    """Isolate the instance and start forensic snapshots; returns the actions taken"""
 
-    try:
-        # Get default VPC
-        vpcs = ec2.describe_vpcs(Filters=[{'Name': 'isDefault', 'Values': ['true']}])
-        vpc_id = vpcs['Vpcs'][0]['VpcId']
-
-        # Create isolation security group
-        sg = ec2.create_security_group(
-            GroupName=f'isolation-sg-{datetime.utcnow().strftime("%Y%m%d%H%M%S")}',
-            Description='Isolation security group for compromised instances',
-            VpcId=vpc_id
-        )
+    actions = []
+    vpc_id = instance_vpc_id(instance_details) or describe_instance_vpc(instance_id)
+    isolation_sg = isolate_instance(instance_id, vpc_id)
 
-        sg_id = sg['GroupId']
+    actions.append({
+        'action': 'isolated_instance',
+        'instance_id': instance_id,
+        'vpc_id': vpc_id,
+        'security_group': isolation_sg
+    })
 
-        # Add tags
-        ec2.create_tags(
-            Resources=[sg_id],
-            Tags=[
-                {'Key': 'Name', 'Value': 'Isolation-SG'},
-                {'Key': 'Purpose', 'Value': 'Security-Incident-Response'},
-                {'Key': 'CreatedBy', 'Value': 'AutoRemediation'}
-            ]
-        )
+    # Start crash-consistent snapshots; completion is tracked separately
+    forensics = forensic_snapshots.start(instance_id, detail.get('id') or instance_id, finding_type)
+    actions.append({
+        'action': 'started_forensic_snapshots',
+        'instance_id': instance_id,
+        'method': forensics['method'],
+        'snapshot_ids': [s['snapshot_id'] for s in forensics['snapshots'] if s['snapshot_id']]
+    })
+    failed = [s for s in forensics['snapshots'] if not s['snapshot_id']]
+    if failed:
+        raise RuntimeError('; '.join(f"{s['volume_id']}: {s['error']}" for s in failed))
 
-        return sg_id
+    return actions
 
-    except Exception as e:
-        print(f"Error creating isolation SG: {e}")
-        raise
 
+def attached_action(incident: Dict) -> Dict:
+    return {
+        'action': 'attached_to_incident',
+        'incident_id': incident['incident_id'],
+        'resource_type': incident['resource_type'],
+        'resource_id': incident['resource_id'],
+        'incident_status': incident['status']
+    }
 
-def send_security_alert(response: Dict):
-    """Send security alert via SNS"""
 
-    if not SNS_TOPIC_ARN:
-        print("No SNS topic configured")
-        return
+def dispatch(event: Dict) -> Optional[Dict]:
+    """Run the handler for the event's source; None for sources we don't handle"""
 
-    message = f"""🚨 SECURITY ALERT 🚨
+    # Determine event source
+    source = event.get('source', '').lower()
 
-Timestamp: {response['timestamp']}
+    if 'guardduty' in source:
+        return handle_guardduty_finding(event)
+    if 'securityhub' in source:
+        return handle_securityhub_finding(event)
+    if 'config' in source:
+        return handle_config_violation(event)
+    return None
 
-Actions Taken:
-{json.dumps(response['actions_taken'], indent=2)}
 
-This is an automated security response from AWS Lambda.
-Review the actions taken and investigate the security event.
-"""
+@metrics.stage
+def sqs_batch_handler(event: Dict) -> Dict:
+    """Drain a batch from a tier queue, coalescing findings and evaluations
+
+    Every message that contributed to a failed action is reported back
+    through ``batchItemFailures`` so SQS redelivers only those records.
+    """
+
+    records = event.get('Records', [])
+    messages = []
+    failed_message_ids = []
+
+    for record in records:
+        try:
+            messages.append((record['messageId'], json.loads(record.get('body') or '{}')))
+        except json.JSONDecodeError as e:
+            print(f"Malformed SQS record {record.get('messageId')}: {e}")
+            failed_message_ids.append(record.get('messageId'))
+
+    actions, failed = process_batch(messages, dispatch)
+    failed_message_ids.extend(failed)
+    print(f"Drained {len(records)} queued event(s) into {len(actions)} action(s), {len(failed_message_ids)} failed")
+
+    if actions:
+        send_security_alert({'actions_taken': actions})
+
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_message_ids]
+    }
+
+
+def compliance_report(rules) -> Dict:
+    """Per-rule compliance rollup from the state store, worst rule first"""
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'rules': compliance.report(rules if isinstance(rules, list) else None)})
+    }
+
+
+def forensics_status(finding_id: str) -> Dict:
+    """Snapshot progress for a GuardDuty finding, refreshed from EC2 while pending"""
+
+    record = forensic_snapshots.status(finding_id)
+    if record is None:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': f"No forensic snapshots recorded for finding {finding_id}"})
+        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(record)
+    }
+
 
+def describe_instance_vpc(instance_id: str) -> str:
+    """VPC of an instance when the finding doesn't carry its network interfaces"""
+
+    reservations = ec2.describe_instances(InstanceIds=[instance_id])['Reservations']
+    return reservations[0]['Instances'][0]['VpcId']
+
+
+def isolate_instance(instance_id: str, vpc_id: str) -> str:
+    """Swap the instance onto its VPC's isolation group; returns the group id"""
+
+    isolation_sg = isolation_groups.group_for_vpc(vpc_id)
     try:
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject='🚨 AWS Security Alert - Automated Response',
-            Message=message
+        ec2.modify_instance_attribute(InstanceId=instance_id, Groups=[isolation_sg])
+    except Exception as e:
+        if error_code(e) != 'InvalidGroup.NotFound':
+            raise
+        # Pool group was deleted out of band; rebuild it once
+        isolation_groups.invalidate(vpc_id)
+        isolation_sg = isolation_groups.group_for_vpc(vpc_id)
+        ec2.modify_instance_attribute(InstanceId=instance_id, Groups=[isolation_sg])
+    return isolation_sg
+
+
+def publish_security_alert(subject: str, message: str):
+    sns.publish(
+        TopicArn=SNS_TOPIC_ARN,
+        Subject=f"🚨 {subject}",
+        Message=message
+    )
+    print("Security alert sent successfully")
+
+
+# Buffers alerts into one digest per DIGEST_WINDOW_SECONDS (0 sends per invocation)
+security_alerts = NotificationDigest(
+    'AWS Security Alert',
+    state_store('security-digest', DIGEST_STORE or None),
+    publish_security_alert
+)
+
+
+def send_security_alert(response: Dict) -> int:
+    """Send (or buffer) the SNS alert for the actions taken; returns messages sent
+
+    Critical actions are published straight away; only the rest wait for
+    the digest window.
+    """
+
+    if not SNS_TOPIC_ARN:
+        print("No SNS topic configured")
+        return 0
+
+    critical = []
+    records = []
+    for action in response['actions_taken']:
+        if action.get('unchanged'):
+            continue
+        record = digest_record(
+            action.get('source', 'unknown'),
+            action.get('finding_type') or action.get('rule') or f"{action.get('findings_count', 0)} finding(s)",
+            [a.get('action', 'unknown') for a in action.get('actions', [])],
+            summary=f"severity {action['severity']}" if 'severity' in action else action.get('compliance', ''),
+            error=action.get('error')
         )
-        print("Security alert sent successfully")
+        (critical if action.get('priority') == PRIORITY_CRITICAL else records).append(record)
+    if not records and not critical:
+        return 0
+
+    try:
+        return security_alerts.notify(records, context_lines=['Automated security response from AWS Lambda.'],
+                                      immediate=critical)
     except Exception as e:
         print(f"Error sending security alert: {e}")
+        return 0
+
+
+def flush_digest() -> Dict:
+    """Publish closed digest windows; run on a schedule so quiet periods don't strand alerts"""
+
+    if not SNS_TOPIC_ARN:
+        print("No SNS topic configured")
+        return {'statusCode': 200, 'body': json.dumps({'digest_messages_sent': 0})}
+
+    sent = security_alerts.flush_due()
+    print(f"Flushed security alert digest: {sent} message(s) sent")
+    return {'statusCode': 200, 'body': json.dumps({'digest_messages_sent': sent})}
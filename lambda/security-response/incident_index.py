@@ -0,0 +1,124 @@
+"""
+Finding Correlation Index for Security Incidents
+Maps a resource (instance, access key, bucket) to its open incident
+
+GuardDuty tends to raise several high-severity findings for one compromised
+resource within minutes. The first finding that calls for containment opens
+an incident for the resource with a conditional write, so exactly one
+invocation wins and runs containment. Findings that arrive while the
+incident is open, and findings about resources we have no playbook for, are
+only attached to the resource's timeline. Incidents expire after
+INCIDENT_WINDOW_SECONDS, and one whose containment failed is released so the
+next finding retries.
+
+Uses the shared state stores: memory inside a warm container, or DynamoDB
+(point AWS_ENDPOINT_URL_DYNAMODB at DynamoDB Local to run it offline).
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+INCIDENT_WINDOW_SECONDS = int(os.environ.get('INCIDENT_WINDOW_SECONDS', '3600'))
+INCIDENT_STORE = os.environ.get('INCIDENT_STORE', '')
+
+STATUS_CONTAINING = 'containing'
+STATUS_CONTAINED = 'contained'
+
+
+def finding_resources(detail: Dict) -> List[Tuple[str, str]]:
+    """(resource type, resource id) pairs a GuardDuty finding is about"""
+
+    resource = detail.get('resource', {})
+    resources = []
+
+    instance_id = resource.get('instanceDetails', {}).get('instanceId')
+    if instance_id:
+        resources.append(('instance', instance_id))
+
+    access_key_id = resource.get('accessKeyDetails', {}).get('accessKeyId')
+    if access_key_id:
+        resources.append(('access-key', access_key_id))
+
+    for bucket in resource.get('s3BucketDetails') or []:
+        if bucket.get('name'):
+            resources.append(('bucket', bucket['name']))
+
+    return resources
+
+
+def finding_summary(detail: Dict) -> Dict:
+    return {
+        'finding_id': detail.get('id'),
+        'type': detail.get('type', ''),
+        'severity': detail.get('severity', 0),
+        'seen_at': datetime.utcnow().isoformat()
+    }
+
+
+class IncidentIndex:
+    """Open incidents keyed by resource, with attached findings"""
+
+    def __init__(self, store, window_seconds: int = INCIDENT_WINDOW_SECONDS):
+        self.store = store
+        self.window_seconds = window_seconds
+
+    @staticmethod
+    def key(resource_type: str, resource_id: str) -> str:
+        return f"{resource_type}#{resource_id}"
+
+    def open(self, resource_type: str, resource_id: str, detail: Dict) -> Tuple[bool, Dict]:
+        """Open an incident for the resource, or attach the finding to the open one
+
+        Returns (opened, incident). Only the caller that gets opened=True
+        should contain the resource.
+        """
+
+        key = self.key(resource_type, resource_id)
+        finding = finding_summary(detail)
+        incident = {
+            'incident_id': finding['finding_id'] or key,
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'opened_at': finding['seen_at'],
+            'status': STATUS_CONTAINING
+        }
+
+        opened = self.store.put_if_absent(key, incident, self.window_seconds)
+        if not opened:
+            incident = self.store.get(key) or incident
+        self.store.append(f"{key}#findings", [finding], self.window_seconds)
+        return opened, incident
+
+    def attach(self, resource_type: str, resource_id: str, detail: Dict) -> Optional[Dict]:
+        """Add a finding to the resource's timeline without claiming containment
+
+        Returns the open incident, if there is one.
+        """
+
+        key = self.key(resource_type, resource_id)
+        self.store.append(f"{key}#findings", [finding_summary(detail)], self.window_seconds)
+        return self.store.get(key)
+
+    def contained(self, resource_type: str, resource_id: str, incident: Dict, containment: Dict):
+        """Record what containment did; the incident stays open for the rest of its window"""
+
+        incident = {**incident, 'status': STATUS_CONTAINED, 'contained_at': datetime.utcnow().isoformat(),
+                    'containment': containment}
+        opened_at = datetime.fromisoformat(incident['opened_at'])
+        remaining = self.window_seconds - (datetime.utcnow() - opened_at).total_seconds()
+        self.store.put(self.key(resource_type, resource_id), incident, max(remaining, 1))
+
+    def release(self, resource_type: str, resource_id: str):
+        """Drop an incident whose containment failed so the next finding retries it"""
+
+        self.store.delete(self.key(resource_type, resource_id))
+
+    def get(self, resource_type: str, resource_id: str) -> Optional[Dict]:
+        """Incident record with its attached findings, oldest first"""
+
+        key = self.key(resource_type, resource_id)
+        incident = self.store.get(key)
+        if incident is not None:
+            incident['findings'] = self.store.get_list(f"{key}#findings")
+        return incident
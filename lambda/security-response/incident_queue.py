@@ -0,0 +1,319 @@
+"""
+Severity-Prioritized Incident Work Queue
+Keeps containment of critical findings ahead of background compliance noise
+
+Every incoming event is split by severity into three tiers. Critical work
+(high-severity GuardDuty findings, CRITICAL/HIGH Security Hub findings) is
+always handled inline by the invocation that received it and never waits
+behind a drain. Standard and bulk work is queued and drained in batches:
+Security Hub findings from many events go through one batch, and repeated
+Config evaluations of the same rule and resource collapse to the latest.
+
+Backends, chosen with PRIORITY_QUEUE_BACKEND:
+  ''      everything is handled inline in arrival order (no queueing)
+  memory  in-container stand-in for SQS; standard work drains on the next
+          non-critical invocation, bulk work once BULK_BATCH_SIZE events or
+          BULK_MAX_WAIT_SECONDS have accumulated
+  sqs     STANDARD_QUEUE_URL / BULK_QUEUE_URL; each queue's event source
+          mapping caps its concurrency, so critical invocations always have
+          headroom in the function's concurrency
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from shared.aws_clients import provider
+
+PRIORITY_QUEUE_BACKEND = os.environ.get('PRIORITY_QUEUE_BACKEND', '')
+STANDARD_QUEUE_URL = os.environ.get('STANDARD_QUEUE_URL', '')
+BULK_QUEUE_URL = os.environ.get('BULK_QUEUE_URL', '')
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', '50'))
+BULK_MAX_WAIT_SECONDS = float(os.environ.get('BULK_MAX_WAIT_SECONDS', '30'))
+
+PRIORITY_CRITICAL = 'critical'
+PRIORITY_STANDARD = 'standard'
+PRIORITY_BULK = 'bulk'
+PRIORITIES = (PRIORITY_CRITICAL, PRIORITY_STANDARD, PRIORITY_BULK)
+
+# GuardDuty severity bands: 7.0+ is High, 4.0-6.9 Medium
+GUARDDUTY_CRITICAL_SEVERITY = 7.0
+GUARDDUTY_STANDARD_SEVERITY = 4.0
+
+SECURITY_HUB_TIERS = {
+    'CRITICAL': PRIORITY_CRITICAL,
+    'HIGH': PRIORITY_CRITICAL,
+    'MEDIUM': PRIORITY_STANDARD
+}
+
+# SendMessageBatch accepts at most this many entries
+SQS_BATCH_LIMIT = 10
+
+# Attempts before the local stand-in gives up on a failing event
+MEMORY_MAX_RECEIVES = 5
+
+# dispatch(event) -> response action, or None for events nobody handles
+Dispatch = Callable[[Dict], Optional[Dict]]
+
+
+def guardduty_priority(severity: float) -> str:
+    if severity >= GUARDDUTY_CRITICAL_SEVERITY:
+        return PRIORITY_CRITICAL
+    if severity >= GUARDDUTY_STANDARD_SEVERITY:
+        return PRIORITY_STANDARD
+    return PRIORITY_BULK
+
+
+def split_by_priority(event: Dict) -> List[Tuple[str, Dict]]:
+    """(priority, event) parts of an event, most urgent first
+
+    Security Hub events are split so a batch mixing one CRITICAL finding
+    with 99 LOW ones only hurries the critical one.
+    """
+
+    source = event.get('source', '').lower()
+    detail = event.get('detail', {})
+
+    if 'guardduty' in source:
+        return [(guardduty_priority(float(detail.get('severity') or 0)), event)]
+
+    if 'securityhub' in source:
+        tiers: Dict[str, List[Dict]] = {}
+        for finding in detail.get('findings', []):
+            label = finding.get('Severity', {}).get('Label', '')
+            tiers.setdefault(SECURITY_HUB_TIERS.get(label, PRIORITY_BULK), []).append(finding)
+        if len(tiers) <= 1:
+            return [(next(iter(tiers), PRIORITY_BULK), event)]
+        return [
+            (priority, {**event, 'detail': {**detail, 'findings': tiers[priority]}})
+            for priority in PRIORITIES if priority in tiers
+        ]
+
+    if 'config' in source:
+        return [(PRIORITY_BULK, event)]
+
+    return [(PRIORITY_STANDARD, event)]
+
+
+def coalesce(events: List[Tuple[str, Dict]]) -> List[Tuple[Dict, List[str]]]:
+    """Merge queued events into as few handler calls as possible
+
+    Takes (message id, event) pairs in arrival order and returns (event,
+    contributing message ids). Security Hub findings are merged into one
+    event; Config evaluations keep only the latest per rule and resource.
+    """
+
+    findings: List[Dict] = []
+    finding_ids: List[str] = []
+    finding_event: Optional[Dict] = None
+    config: Dict[Tuple[str, str, str], Tuple[Dict, List[str]]] = {}
+    others: List[Tuple[Dict, List[str]]] = []
+
+    for message_id, event in events:
+        source = event.get('source', '').lower()
+        detail = event.get('detail', {})
+
+        if 'securityhub' in source:
+            finding_event = finding_event or event
+            findings.extend(detail.get('findings', []))
+            finding_ids.append(message_id)
+
+        elif 'config' in source:
+            key = (detail.get('configRuleName', ''), detail.get('resourceType', ''), detail.get('resourceId', ''))
+            _, message_ids = config.get(key, (None, []))
+            config[key] = (event, message_ids + [message_id])
+
+        else:
+            others.append((event, [message_id]))
+
+    merged = list(others)
+    if finding_event is not None:
+        merged.append(({**finding_event, 'detail': {**finding_event.get('detail', {}), 'findings': findings}},
+                       finding_ids))
+    merged.extend(config.values())
+    return merged
+
+
+def process_batch(events: List[Tuple[str, Dict]], dispatch: Dispatch) -> Tuple[List[Dict], List[str]]:
+    """Coalesce and dispatch queued events; returns (actions, failed message ids)"""
+
+    actions = []
+    failed = []
+    for event, message_ids in coalesce(events):
+        try:
+            action = dispatch(event)
+        except Exception as e:
+            action = {'source': event.get('source', 'unknown'), 'actions': [], 'error': str(e)}
+        if action is None:
+            continue
+        action['events_coalesced'] = len(message_ids)
+        actions.append(action)
+        if action.get('error'):
+            failed.extend(message_ids)
+    return actions, failed
+
+
+class MemoryQueue:
+    """Local stand-in for an SQS queue, shared by invocations in one container
+
+    Received messages stay in flight until ``settle``; failed ones go back
+    on the queue until they have been received MEMORY_MAX_RECEIVES times,
+    like a redrive policy without the dead-letter queue.
+    """
+
+    def __init__(self):
+        # (enqueued_at, message_id, event, receives)
+        self._messages: List[Tuple[float, str, Dict, int]] = []
+        self._in_flight: Dict[str, Tuple[float, str, Dict, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def send(self, events: List[Dict]):
+        with self._lock:
+            self._messages.extend((time.time(), str(uuid.uuid4()), event, 0) for event in events)
+
+    def oldest_age(self) -> float:
+        with self._lock:
+            return time.time() - self._messages[0][0] if self._messages else 0.0
+
+    def receive(self, max_messages: int) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            taken, self._messages = self._messages[:max_messages], self._messages[max_messages:]
+            self._in_flight.update((message[1], message) for message in taken)
+        return [(message_id, event) for _, message_id, event, _ in taken]
+
+    def settle(self, message_ids: List[str], failed_ids: List[str]):
+        """Delete processed messages and return failed ones to the queue"""
+
+        failed = set(failed_ids)
+        with self._lock:
+            for message_id in message_ids:
+                enqueued_at, _, event, receives = self._in_flight.pop(message_id)
+                if message_id not in failed:
+                    continue
+                if receives + 1 >= MEMORY_MAX_RECEIVES:
+                    print(f"⚠️ Dropping queued event {message_id} after {receives + 1} failed attempts")
+                    continue
+                self._messages.append((enqueued_at, message_id, event, receives + 1))
+
+
+class SQSQueue:
+    """Producer side of a tier queue; the event source mapping does the receiving"""
+
+    def __init__(self, queue_url: str, priority: str):
+        self.queue_url = queue_url
+        self.priority = priority
+
+    def send(self, events: List[Dict]):
+        sqs = provider.client('sqs')
+        for start in range(0, len(events), SQS_BATCH_LIMIT):
+            entries = [
+                {
+                    'Id': str(index),
+                    'MessageBody': json.dumps(event, default=str),
+                    'MessageAttributes': {'priority': {'DataType': 'String', 'StringValue': self.priority}}
+                }
+                for index, event in enumerate(events[start:start + SQS_BATCH_LIMIT])
+            ]
+            response = sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            if response.get('Failed'):
+                first = response['Failed'][0]
+                raise RuntimeError(f"{len(response['Failed'])} message(s) not queued to {self.priority}: "
+                                   f"{first.get('Code')} {first.get('Message', '')}".strip())
+
+
+class IncidentQueue:
+    """Routes event parts inline or onto their tier queue and drains the local stand-in"""
+
+    def __init__(self, backend: str = PRIORITY_QUEUE_BACKEND,
+                 bulk_batch_size: int = BULK_BATCH_SIZE, bulk_max_wait: float = BULK_MAX_WAIT_SECONDS):
+        self.backend = backend
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_max_wait = bulk_max_wait
+
+        if backend == 'memory':
+            self.queues = {PRIORITY_STANDARD: MemoryQueue(), PRIORITY_BULK: MemoryQueue()}
+        elif backend == 'sqs':
+            if not STANDARD_QUEUE_URL or not BULK_QUEUE_URL:
+                raise ValueError('STANDARD_QUEUE_URL and BULK_QUEUE_URL are required for the sqs backend')
+            self.queues = {
+                PRIORITY_STANDARD: SQSQueue(STANDARD_QUEUE_URL, PRIORITY_STANDARD),
+                PRIORITY_BULK: SQSQueue(BULK_QUEUE_URL, PRIORITY_BULK)
+            }
+        elif not backend:
+            self.queues = {}
+        else:
+            raise ValueError(f"Unknown priority queue backend: {backend}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.queues)
+
+    def route(self, event: Dict, dispatch: Dispatch) -> Dict:
+        """Handle the critical part of event now and queue the rest
+
+        A tier whose enqueue fails is recorded in 'queue_errors'; the
+        actions already taken are still returned so they get alerted on.
+        """
+
+        routed = {'actions': [], 'queued': {}, 'queue_errors': []}
+        if not self.enabled:
+            action = dispatch(event)
+            if action is not None:
+                # Most urgent tier in the event, so critical alerts still skip the digest
+                action['priority'] = split_by_priority(event)[0][0]
+                routed['actions'] = [action]
+            return routed
+
+        critical_handled = False
+        for priority, part in split_by_priority(event):
+            if priority == PRIORITY_CRITICAL:
+                action = dispatch(part)
+                if action is not None:
+                    action['priority'] = priority
+                    routed['actions'].append(action)
+                critical_handled = True
+                continue
+
+            try:
+                self.queues[priority].send([part])
+            except Exception as e:
+                print(f"❌ Could not queue {priority} work: {e}")
+                routed['queue_errors'].append({'priority': priority, 'error': str(e)})
+                continue
+            routed['queued'][priority] = routed['queued'].get(priority, 0) + 1
+
+        # Containment invocations never pay for draining background work
+        if not critical_handled:
+            routed['actions'].extend(self.drain_due(dispatch))
+        return routed
+
+    def drain_due(self, dispatch: Dispatch) -> List[Dict]:
+        """Drain the in-container queues that are due (memory backend only)"""
+
+        if self.backend != 'memory':
+            return []
+
+        actions = []
+        standard = self.queues[PRIORITY_STANDARD]
+        if len(standard):
+            actions.extend(self._drain(PRIORITY_STANDARD, dispatch, len(standard)))
+
+        bulk = self.queues[PRIORITY_BULK]
+        if len(bulk) >= self.bulk_batch_size or (len(bulk) and bulk.oldest_age() >= self.bulk_max_wait):
+            actions.extend(self._drain(PRIORITY_BULK, dispatch, len(bulk)))
+        return actions
+
+    def _drain(self, priority: str, dispatch: Dispatch, count: int) -> List[Dict]:
+        queue = self.queues[priority]
+        messages = queue.receive(count)
+        actions, failed = process_batch(messages, dispatch)
+        queue.settle([message_id for message_id, _ in messages], failed)
+        for action in actions:
+            action['priority'] = priority
+        return actions
@@ -0,0 +1,131 @@
+"""
+Isolation Security Group Pool for GuardDuty Containment
+One reusable deny-all security group per VPC, cached for the container's lifetime
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from shared.aws_clients import error_code
+
+ISOLATION_TAGS = [
+    {'Key': 'Name', 'Value': 'Isolation-SG'},
+    {'Key': 'Purpose', 'Value': 'Security-Incident-Response'},
+    {'Key': 'CreatedBy', 'Value': 'AutoRemediation'}
+]
+
+# Egress rule AWS adds to every new security group
+DEFAULT_EGRESS = [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+
+
+def isolation_group_name(vpc_id: str) -> str:
+    """Deterministic per-VPC name, so concurrent creators collide instead of duplicating"""
+
+    return f"isolation-{vpc_id}"
+
+
+def is_deny_all(group: Dict) -> bool:
+    return not group.get('IpPermissions') and not group.get('IpPermissionsEgress')
+
+
+class IsolationGroupPool:
+    """Maps VPC id to a deny-all isolation security group
+
+    The first lookup lists every tagged isolation group in the region with
+    one describe call. A VPC without one gets a group created with its tags
+    in the same call and its default egress rule revoked. After that,
+    isolating an instance in a known VPC needs no further EC2 calls for
+    the group. Groups that still allow any traffic, such as the
+    timestamped ones older releases created per incident, are never
+    reused.
+    """
+
+    def __init__(self, ec2_client):
+        self.ec2 = ec2_client
+        self._groups: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def group_for_vpc(self, vpc_id: str) -> str:
+        """Isolation group id for vpc_id, creating the group on a miss"""
+
+        group_id = self._groups.get(vpc_id)
+        if group_id:
+            return group_id
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            group_id = self._groups.get(vpc_id)
+            if not group_id:
+                group_id = self._create(vpc_id)
+                self._groups[vpc_id] = group_id
+            return group_id
+
+    def invalidate(self, vpc_id: str):
+        """Forget a cached group, e.g. after it was deleted out of band"""
+
+        with self._lock:
+            self._groups.pop(vpc_id, None)
+            self._loaded = False
+
+    def _describe(self, filters: List[Dict]) -> List[Dict]:
+        groups = []
+        params = {'Filters': filters, 'MaxResults': 1000}
+        while True:
+            response = self.ec2.describe_security_groups(**params)
+            groups.extend(response['SecurityGroups'])
+            if not response.get('NextToken'):
+                return groups
+            params['NextToken'] = response['NextToken']
+
+    def _load(self):
+        for group in self._describe([{'Name': 'tag:Purpose', 'Values': ['Security-Incident-Response']}]):
+            if is_deny_all(group) and group['GroupName'] == isolation_group_name(group['VpcId']):
+                self._groups.setdefault(group['VpcId'], group['GroupId'])
+        self._loaded = True
+
+    def _create(self, vpc_id: str) -> str:
+        name = isolation_group_name(vpc_id)
+        try:
+            group_id = self.ec2.create_security_group(
+                GroupName=name,
+                Description='Isolation security group for compromised instances',
+                VpcId=vpc_id,
+                TagSpecifications=[{'ResourceType': 'security-group', 'Tags': ISOLATION_TAGS}]
+            )['GroupId']
+        except Exception as e:
+            if error_code(e) != 'InvalidGroup.Duplicate':
+                raise
+            # Another container created it first
+            existing = self._describe([
+                {'Name': 'vpc-id', 'Values': [vpc_id]},
+                {'Name': 'group-name', 'Values': [name]}
+            ])
+            if not existing:
+                raise
+            self._strip(existing[0])
+            return existing[0]['GroupId']
+
+        self.ec2.revoke_security_group_egress(GroupId=group_id, IpPermissions=DEFAULT_EGRESS)
+        self.created += 1
+        print(f"🔒 Created isolation security group {group_id} for {vpc_id}")
+        return group_id
+
+    def _strip(self, group: Dict):
+        """Revoke any rule someone added to a pool group by hand"""
+
+        if group.get('IpPermissionsEgress'):
+            self.ec2.revoke_security_group_egress(GroupId=group['GroupId'], IpPermissions=group['IpPermissionsEgress'])
+        if group.get('IpPermissions'):
+            self.ec2.revoke_security_group_ingress(GroupId=group['GroupId'], IpPermissions=group['IpPermissions'])
+
+
+def instance_vpc_id(instance_details: Dict) -> Optional[str]:
+    """VPC of the instance as reported in a GuardDuty finding, if present"""
+
+    for interface in instance_details.get('networkInterfaces') or []:
+        if interface.get('vpcId'):
+            return interface['vpcId']
+    return None
@@ -0,0 +1,203 @@
+"""
+Bulk Security Hub Findings Processor
+Remediates each unique resource once per event and resolves the findings in bulk
+
+An imported-findings event carries up to 100 findings, often several for the
+same bucket. The processor plans one remediation per unique (action,
+resource) target, runs the targets concurrently on shared clients and then
+marks every finding whose targets all succeeded as RESOLVED with one
+BatchUpdateFindings call per 100 findings. Security Hub re-delivers the
+finding with its new workflow status, and findings that are no longer NEW
+are skipped, so a handled finding costs nothing on re-delivery.
+
+Only the workflow update is retried when it fails. Findings it still can't
+resolve are listed under 'unresolved' and never fail the remediation action,
+so a queued batch is not redelivered (and re-remediated) because of them.
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+# BatchUpdateFindings accepts at most this many finding identifiers per call
+BATCH_UPDATE_LIMIT = 100
+
+# Workflow states another run (or an analyst) has already dealt with
+SETTLED_WORKFLOW_STATUSES = {'NOTIFIED', 'RESOLVED', 'SUPPRESSED'}
+
+RESOLUTION_NOTE = 'Auto-remediated by the security-response Lambda'
+
+# BatchUpdateFindings attempts per batch; later attempts only send what is still unresolved
+RESOLVE_ATTEMPTS = 3
+RESOLVE_BACKOFF_SECONDS = 0.5
+
+PUBLIC_ACCESS_BLOCK = {
+    'BlockPublicAcls': True,
+    'IgnorePublicAcls': True,
+    'BlockPublicPolicy': True,
+    'RestrictPublicBuckets': True
+}
+
+# (action, resource id) - one remediation of one resource
+Target = Tuple[str, str]
+
+
+def is_settled(finding: Dict) -> bool:
+    """True for findings that are archived or already past the NEW workflow state"""
+
+    if finding.get('RecordState') == 'ARCHIVED':
+        return True
+    return finding.get('Workflow', {}).get('Status', 'NEW') in SETTLED_WORKFLOW_STATUSES
+
+
+def finding_targets(finding: Dict) -> List[Target]:
+    """Remediations a finding asks for"""
+
+    targets = []
+    title = finding.get('Title', '')
+
+    if 'S3' in title and 'public' in title.lower():
+        for resource in finding.get('Resources', []):
+            if resource.get('Type') == 'AwsS3Bucket':
+                targets.append(('blocked_s3_public_access', resource.get('Id', '').split(':')[-1]))
+
+    return targets
+
+
+class SecurityHubBatch:
+    """Dedups, remediates and resolves the findings of one Security Hub event"""
+
+    def __init__(self, s3_client, securityhub_client, pool: ThreadPoolExecutor):
+        self.s3 = s3_client
+        self.securityhub = securityhub_client
+        self.pool = pool
+        self.remediations: Dict[str, Tuple[str, Callable[[str], None]]] = {
+            'blocked_s3_public_access': ('bucket', self.block_public_access)
+        }
+
+    def block_public_access(self, bucket_name: str):
+        self.s3.put_public_access_block(
+            Bucket=bucket_name,
+            PublicAccessBlockConfiguration=PUBLIC_ACCESS_BLOCK
+        )
+
+    def process(self, findings: List[Dict]) -> Dict:
+        """Remediate and resolve findings; returns the response action"""
+
+        action = {
+            'source': 'securityhub',
+            'findings_count': len(findings),
+            'actions': []
+        }
+
+        # Unique targets, each with the findings that asked for it
+        plan: Dict[Target, List[Dict]] = {}
+        skipped = 0
+        for finding in findings:
+            if is_settled(finding):
+                skipped += 1
+                continue
+            for target in finding_targets(finding):
+                plan.setdefault(target, []).append(finding)
+
+        action['findings_skipped'] = skipped
+        if not plan:
+            return action
+
+        targets = list(plan)
+        outcomes = dict(zip(targets, self.pool.map(self._apply, targets)))
+
+        failed_ids = set()
+        for (name, resource_id), error in outcomes.items():
+            label = self.remediations[name][0]
+            if error:
+                failed_ids.update(finding['Id'] for finding in plan[(name, resource_id)])
+                action['actions'].append({'action': 'failed', label: resource_id, 'error': error})
+            else:
+                action['actions'].append({
+                    'action': name,
+                    label: resource_id,
+                    'findings': len(plan[(name, resource_id)])
+                })
+
+        # A finding is resolved only when every target it asked for succeeded
+        resolved = {}
+        for target, target_findings in plan.items():
+            for finding in target_findings:
+                if finding['Id'] not in failed_ids:
+                    resolved[finding['Id']] = finding
+
+        action['findings_resolved'] = self.resolve(list(resolved.values()), action)
+        return action
+
+    def _apply(self, target: Target):
+        name, resource_id = target
+        try:
+            self.remediations[name][1](resource_id)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def resolve(self, findings: List[Dict], action: Dict) -> int:
+        """Set findings to RESOLVED in batches; returns how many Security Hub accepted
+
+        Findings left unresolved are recorded in action['unresolved'].
+        """
+
+        unresolved = []
+
+        # BatchUpdateFindings needs both identifiers; anything else is reported on its own
+        identifiers = []
+        for finding in findings:
+            if finding.get('Id') and finding.get('ProductArn'):
+                identifiers.append({'Id': finding['Id'], 'ProductArn': finding['ProductArn']})
+            else:
+                unresolved.append({
+                    'finding_id': finding.get('Id'),
+                    'error': 'Finding has no ProductArn; cannot update its workflow status'
+                })
+
+        processed = 0
+        for start in range(0, len(identifiers), BATCH_UPDATE_LIMIT):
+            accepted, failed = self._resolve_batch(identifiers[start:start + BATCH_UPDATE_LIMIT])
+            processed += accepted
+            unresolved.extend(failed)
+
+        if unresolved:
+            action['unresolved'] = unresolved
+        return processed
+
+    def _resolve_batch(self, batch: List[Dict]) -> Tuple[int, List[Dict]]:
+        """(accepted, unresolved) for one batch, retrying only what is still unresolved"""
+
+        processed = 0
+        errors: Dict[str, str] = {}
+
+        for attempt in range(RESOLVE_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, RESOLVE_BACKOFF_SECONDS * 2 ** attempt))
+            try:
+                response = self.securityhub.batch_update_findings(
+                    FindingIdentifiers=batch,
+                    Workflow={'Status': 'RESOLVED'},
+                    Note={'Text': RESOLUTION_NOTE, 'UpdatedBy': 'security-response'}
+                )
+            except Exception as e:
+                print(f"⚠️ BatchUpdateFindings failed (attempt {attempt + 1}/{RESOLVE_ATTEMPTS}): {e}")
+                errors = {identifier['Id']: f"BatchUpdateFindings failed: {e}" for identifier in batch}
+                continue
+
+            processed += len(response.get('ProcessedFindings', []))
+            unprocessed = response.get('UnprocessedFindings', [])
+            errors = {
+                item.get('FindingIdentifier', {}).get('Id'):
+                    f"{item.get('ErrorCode')} {item.get('ErrorMessage', '')}".strip()
+                for item in unprocessed
+            }
+            retry_ids = set(errors)
+            batch = [identifier for identifier in batch if identifier['Id'] in retry_ids]
+            if not batch:
+                break
+
+        return processed, [{'finding_id': finding_id, 'error': error} for finding_id, error in errors.items()]
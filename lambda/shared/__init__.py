@@ -0,0 +1,3 @@
+"""
+Shared helpers bundled into every Lambda function package
+"""
@@ -0,0 +1,134 @@
+"""
+Shared AWS Client Provider
+Builds boto3 clients lazily on first use and reuses one session per container
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Connection pool per client; sized for the thread pools used by the handlers
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+
+
+class ClientProvider:
+    """Lazily creates and caches boto3 clients for a Lambda container
+
+    boto3 itself is only imported when the first client is requested, and
+    every client comes from one shared session so credentials, endpoint
+    data and the botocore loader cache are resolved once per container.
+    """
+
+    def __init__(self, max_pool_connections: int = MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+        self._session = None
+        self._clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._hooks: List[Callable[[str, Any], None]] = []
+        self._lock = threading.RLock()
+        self.scheduler = None
+
+    @property
+    def session(self):
+        """The boto3 session shared by every client in this container"""
+
+        with self._lock:
+            if self._session is None:
+                import boto3
+                self._session = boto3.session.Session()
+            return self._session
+
+    def client(self, service_name: str, region_name: Optional[str] = None):
+        """Return the cached client for a service, creating it on first use"""
+
+        key = (service_name, region_name)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                from botocore.config import Config
+                config = Config(max_pool_connections=self.max_pool_connections)
+                if self.scheduler is not None and service_name in self.scheduler.services:
+                    # The scheduler owns retries here; botocore's would double them
+                    config = config.merge(Config(retries={'mode': 'standard', 'max_attempts': 1}))
+                client = self.session.client(
+                    service_name,
+                    region_name=region_name,
+                    config=config
+                )
+                for hook in self._hooks:
+                    hook(service_name, client)
+                self._clients[key] = client
+            return client
+
+    def use_scheduler(self, scheduler):
+        """Route API calls made through LazyClient handles via a CallScheduler
+
+        Must be called before the first client is built.
+        """
+
+        self.scheduler = scheduler
+
+    def add_client_hook(self, hook: Callable[[str, Any], None]):
+        """Call hook(service_name, client) for every client created from now on"""
+
+        with self._lock:
+            self._hooks.append(hook)
+
+    def created_clients(self) -> List[Tuple[str, Optional[str]]]:
+        """(service, region) pairs that have been built in this container"""
+
+        return list(self._clients)
+
+    def reset(self):
+        """Forget the session and every cached client"""
+
+        with self._lock:
+            self._session = None
+            self._clients.clear()
+
+
+class LazyClient:
+    """Stand-in for a boto3 client that resolves it from the provider on first use
+
+    When the provider has a call scheduler, API operations are returned
+    wrapped by it; everything else (meta, exceptions, paginators) passes
+    straight through.
+    """
+
+    def __init__(self, provider: ClientProvider, service_name: str, region_name: Optional[str] = None):
+        self._provider = provider
+        self._service_name = service_name
+        self._region_name = region_name
+
+    def __getattr__(self, name: str):
+        client = self._provider.client(self._service_name, self._region_name)
+        attr = getattr(client, name)
+
+        scheduler = self._provider.scheduler
+        operation_name = client.meta.method_to_api_mapping.get(name) if scheduler else None
+        if operation_name:
+            return scheduler.wrap(self._service_name, client.meta.region_name, operation_name, attr)
+        return attr
+
+
+provider = ClientProvider()
+
+
+def error_code(error: Exception) -> str:
+    """AWS error code of a botocore ClientError, or '' for any other exception
+
+    S3 error codes such as NoSuchPublicAccessBlockConfiguration are not
+    modeled as client.exceptions classes, so match on the code instead.
+    """
+
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code', '')
+
+
+def lazy_client(service_name: str, region_name: Optional[str] = None) -> LazyClient:
+    """Module-level client handle that costs nothing until it is used"""
+
+    return LazyClient(provider, service_name, region_name)
@@ -0,0 +1,308 @@
+"""
+Notification Digest for Remediation and Security Alerts
+Buffers results across invocations and publishes one compact summary per window
+
+With a window configured, each invocation stores its compact records in a
+shared state store (memory, DynamoDB or a local DynamoDB stand-in), one
+item per record numbered from a per-window counter, so a flood never grows
+one item towards the DynamoDB size limit. Only the first DIGEST_MAX_RECORDS
+of a window are kept; the rest are counted. The first invocation to notice
+that a window has closed claims it and publishes a single grouped summary:
+counts by resource type and action, the top-N records and a link to the
+full report. A claim is only marked done once every part is published and
+is released on failure, so a later flush retries it. Closed windows are also
+flushed by a scheduled invocation calling flush_due(), so the last window
+before a quiet period still goes out. Records passed as immediate (critical
+alerts) skip the window. Without a window the same summary is published
+straight away for the invocation's own results.
+
+Either way a message that would exceed the SNS size limit is split into
+numbered parts.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from shared.aws_clients import provider
+
+# Seconds results are buffered before one digest goes out; 0 publishes per invocation
+DIGEST_WINDOW_SECONDS = int(os.environ.get('DIGEST_WINDOW_SECONDS', '0'))
+DIGEST_TOP_N = int(os.environ.get('DIGEST_TOP_N', '20'))
+# Records kept per window; later ones are only counted
+DIGEST_MAX_RECORDS = int(os.environ.get('DIGEST_MAX_RECORDS', '1000'))
+DIGEST_STORE = os.environ.get('DIGEST_STORE', '')
+# s3://bucket/prefix or a local directory for the full JSON report
+DIGEST_REPORT_URI = os.environ.get('DIGEST_REPORT_URI', '')
+
+# Late appends from containers with a slightly skewed clock still make the window
+DIGEST_GRACE_SECONDS = 5
+# Closed windows an invocation looks back over for an unflushed digest
+DIGEST_LOOKBACK_WINDOWS = 3
+# Longest a flush may hold a window before another container can retry it
+DIGEST_CLAIM_TTL_SECONDS = 300
+
+STATUS_IN_PROGRESS = 'IN_PROGRESS'
+STATUS_COMPLETED = 'COMPLETED'
+
+SNS_MAX_MESSAGE_BYTES = 256 * 1024
+# Headroom for the SNS envelope and message attributes
+MESSAGE_BUDGET_BYTES = SNS_MAX_MESSAGE_BYTES - 4 * 1024
+
+# publish(subject, message)
+Publisher = Callable[[str, str], None]
+
+
+def digest_record(resource_type: str, resource_id: Optional[str], actions: List[str],
+                  summary: str = '', error: Optional[str] = None) -> Dict:
+    """Compact, store-friendly description of one remediation or response"""
+
+    return {
+        'resource_type': resource_type,
+        'resource_id': resource_id or '-',
+        'actions': actions,
+        'summary': summary[:200],
+        'error': (error or '')[:300] or None,
+        'at': datetime.utcnow().isoformat(timespec='seconds')
+    }
+
+
+def split_message(header: List[str], lines: List[str], footer: List[str],
+                  budget: int = MESSAGE_BUDGET_BYTES) -> List[str]:
+    """Pack lines into as few messages as fit the byte budget
+
+    Every part repeats the header; the footer goes on the last part.
+    """
+
+    header_text = '\n'.join(header) + '\n'
+    footer_text = '\n' + '\n'.join(footer) if footer else ''
+    available = budget - len(header_text.encode('utf-8'))
+
+    parts: List[List[str]] = [[]]
+    used = 0
+    for line in lines:
+        size = len(line.encode('utf-8')) + 1
+        if size > available:
+            line = line.encode('utf-8')[:available - 4].decode('utf-8', 'ignore') + '…'
+            size = len(line.encode('utf-8')) + 1
+        if parts[-1] and used + size > available:
+            parts.append([])
+            used = 0
+        parts[-1].append(line)
+        used += size
+
+    # Start a fresh part if the footer doesn't fit on the last one
+    if footer_text and used + len(footer_text.encode('utf-8')) > available:
+        parts.append([])
+
+    messages = [header_text + '\n'.join(part) for part in parts]
+    messages[-1] += footer_text
+    return messages
+
+
+class NotificationDigest:
+    """Groups notification records into windowed, size-bounded SNS digests"""
+
+    def __init__(self, title: str, store, publish: Publisher,
+                 window_seconds: int = DIGEST_WINDOW_SECONDS, top_n: int = DIGEST_TOP_N,
+                 report_uri: str = DIGEST_REPORT_URI, max_records: int = DIGEST_MAX_RECORDS):
+        self.title = title
+        self.store = store
+        self.publish = publish
+        self.window_seconds = window_seconds
+        self.top_n = top_n
+        self.max_records = max_records
+        self.report_uri = report_uri
+        # Windows this container has already flushed or found empty
+        self._settled: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.window_seconds * (DIGEST_LOOKBACK_WINDOWS + 2)
+
+    def notify(self, records: List[Dict], context_lines: Optional[List[str]] = None,
+               immediate: Optional[List[Dict]] = None) -> int:
+        """Buffer records (or publish them now without a window); returns messages sent
+
+        Records in immediate are published now whatever the window.
+        """
+
+        if not self.enabled:
+            records = (immediate or []) + records
+            if not records:
+                return 0
+            return self.publish_digest(records, 'this invocation', context_lines)
+
+        sent = 0
+        if immediate:
+            sent += self.publish_digest(immediate, 'this invocation', context_lines)
+        if records:
+            window = int(time.time() // self.window_seconds)
+            try:
+                self.buffer(window, records)
+            except Exception as e:
+                # Never drop an alert because the buffer is unavailable
+                print(f"⚠️ Digest store unavailable, publishing immediately: {e}")
+                sent += self.publish_digest(records, 'this invocation', context_lines)
+
+        return sent + self.flush_due()
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """Publish every closed, unflushed window in the lookback; returns messages sent"""
+
+        if not self.enabled:
+            return 0
+
+        now = now or time.time()
+        last_closed = int((now - DIGEST_GRACE_SECONDS) // self.window_seconds) - 1
+        sent = 0
+
+        for window in range(last_closed - DIGEST_LOOKBACK_WINDOWS + 1, last_closed + 1):
+            if window in self._settled:
+                continue
+            try:
+                sent += self._flush_window(window)
+            except Exception as e:
+                print(f"⚠️ Could not flush digest window {window}: {e}")
+                continue
+            self._settled.add(window)
+
+        return sent
+
+    def buffer(self, window: int, records: List[Dict]):
+        """Store records as one item each under the window, up to max_records"""
+
+        count = self.store.increment(f"count#{window}", {'records': len(records)}, self.ttl_seconds)['records']
+        for seq, record in enumerate(records, count - len(records)):
+            if seq >= self.max_records:
+                break
+            self.store.put(f"record#{window}#{seq:08d}", record, self.ttl_seconds,
+                           index=(f"window#{window}", f"{seq:08d}"))
+
+    def _flush_window(self, window: int) -> int:
+        total = self.store.get_counters(f"count#{window}").get('records', 0)
+        if not total:
+            return 0
+
+        # Exactly one container publishes each window; the claim lapses if it dies mid-flush
+        claim = f"flushed#{window}"
+        if not self.store.put_if_absent(claim, {'status': STATUS_IN_PROGRESS},
+                                        min(DIGEST_CLAIM_TTL_SECONDS, self.window_seconds)):
+            return 0
+
+        start = datetime.utcfromtimestamp(window * self.window_seconds)
+        end = datetime.utcfromtimestamp((window + 1) * self.window_seconds)
+        label = f"{start.isoformat(timespec='seconds')}Z - {end.isoformat(timespec='seconds')}Z"
+        try:
+            records = self.store.query_index(f"window#{window}")
+            sent = self.publish_digest(records, label, report_name=start.strftime('%Y%m%dT%H%M%SZ'), total=total)
+        except Exception:
+            # Let a later flush retry the window
+            try:
+                self.store.delete(claim)
+            except Exception as e:
+                print(f"⚠️ Could not release digest window {window}: {e}")
+            raise
+
+        self.store.put(claim, {'status': STATUS_COMPLETED, 'records': total}, self.ttl_seconds)
+        return sent
+
+    def publish_digest(self, records: List[Dict], window_label: str,
+                       context_lines: Optional[List[str]] = None, report_name: Optional[str] = None,
+                       total: Optional[int] = None) -> int:
+        """Render, split and publish a digest of records; returns messages sent
+
+        total is the number of results the records were kept from, if larger.
+        """
+
+        total = max(total or 0, len(records))
+        report_link = self.write_report(records, window_label,
+                                        report_name or datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ'))
+        header, lines, footer = self.render(records, window_label, context_lines, report_link, total)
+        messages = split_message(header, lines, footer)
+
+        for index, message in enumerate(messages, 1):
+            subject = f"{self.title} digest: {total} result(s)"
+            if len(messages) > 1:
+                subject += f" ({index}/{len(messages)})"
+            self.publish(subject[:100], message)
+
+        return len(messages)
+
+    def render(self, records: List[Dict], window_label: str, context_lines: Optional[List[str]],
+               report_link: Optional[str], total: Optional[int] = None):
+        """(header, body lines, footer) of the grouped summary"""
+
+        total = max(total or 0, len(records))
+        errors = sum(1 for record in records if record.get('error'))
+        header = [f"{self.title} Digest", f"Window: {window_label}"]
+        header += context_lines or []
+        header += [f"Results: {total} ({errors} with errors)"]
+        if total > len(records):
+            header += [f"Summarized: first {len(records)} of {total} (DIGEST_MAX_RECORDS)"]
+        header += ['']
+
+        by_type: Dict[str, Counter] = {}
+        for record in records:
+            counts = by_type.setdefault(record['resource_type'], Counter())
+            counts.update(record.get('actions') or ['no_action'])
+
+        lines = ['By resource type and action:']
+        for resource_type, counts in sorted(by_type.items()):
+            summary = ', '.join(f"{action} x{count}" for action, count in counts.most_common())
+            lines.append(f"  {resource_type}: {summary}")
+
+        # Errors first, then the records that did the most
+        ranked = sorted(records, key=lambda r: (not r.get('error'), -len(r.get('actions') or [])))
+        top = ranked[:self.top_n]
+        lines += ['', f"Top {len(top)} of {len(records)}:"]
+        for record in top:
+            line = f"  - [{record['resource_type']}] {record['resource_id']}: {', '.join(record.get('actions') or []) or '-'}"
+            if record.get('summary'):
+                line += f" ({record['summary']})"
+            if record.get('error'):
+                line += f" ERROR: {record['error']}"
+            lines.append(line)
+
+        footer = [f"Full report: {report_link}"] if report_link else []
+        return header, lines, footer
+
+    def write_report(self, records: List[Dict], window_label: str, name: str) -> Optional[str]:
+        """Store the full record list and return a link to it, if a report location is set"""
+
+        if not self.report_uri:
+            return None
+
+        slug = self.title.lower().replace(' ', '-')
+        body = json.dumps({'title': self.title, 'window': window_label, 'records': records}, indent=2)
+
+        try:
+            if self.report_uri.startswith('s3://'):
+                bucket, _, prefix = self.report_uri[len('s3://'):].partition('/')
+                key = f"{prefix.rstrip('/') + '/' if prefix else ''}{slug}/{name}.json"
+                provider.client('s3').put_object(
+                    Bucket=bucket,
+                    Key=key,
+                    Body=body.encode('utf-8'),
+                    ContentType='application/json',
+                    ServerSideEncryption='AES256'
+                )
+                return f"https://s3.console.aws.amazon.com/s3/object/{bucket}?prefix={key}"
+
+            directory = os.path.join(self.report_uri, slug)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{name}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(body)
+            return path
+
+        except Exception as e:
+            print(f"⚠️ Could not write full digest report: {e}")
+            return None
@@ -0,0 +1,80 @@
+"""
+Idempotency Guard for Event-Driven Remediation
+Drops duplicate at-least-once deliveries of the same CloudTrail event
+"""
+
+from typing import Dict, Optional
+
+STATUS_IN_PROGRESS = 'IN_PROGRESS'
+STATUS_COMPLETED = 'COMPLETED'
+
+
+def idempotency_key(event: Dict, resource_id: Optional[str]) -> Optional[str]:
+    """Key a delivery on the CloudTrail eventID (or EventBridge id) plus resource
+
+    Returns None for events that carry no stable id, which are always
+    processed.
+    """
+
+    event_id = event.get('detail', {}).get('eventID') or event.get('id')
+    if not event_id:
+        return None
+    return f"{event_id}:{resource_id or '-'}"
+
+
+class IdempotencyGuard:
+    """Claims an event before it is processed and remembers the outcome
+
+    ``begin`` claims the key with a short in-progress TTL. A claim that
+    already exists means a duplicate: the stored result is returned if the
+    first delivery finished, otherwise a skip marker. Failed attempts
+    release their claim so the retry is not mistaken for a duplicate.
+    """
+
+    def __init__(self, store, ttl_seconds: float = 3600, in_progress_ttl_seconds: float = 300):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_ttl_seconds = in_progress_ttl_seconds
+        self.duplicates = 0
+
+    def begin(self, key: Optional[str]) -> Optional[Dict]:
+        """Claim key; returns None to proceed or the result to reuse for a duplicate"""
+
+        if key is None:
+            return None
+
+        # Fail open: a store outage must not stop remediation
+        try:
+            if self.store.put_if_absent(key, {'status': STATUS_IN_PROGRESS}, self.in_progress_ttl_seconds):
+                return None
+            existing = self.store.get(key) or {}
+        except Exception as e:
+            print(f"⚠️ Idempotency store unavailable, processing {key} anyway: {e}")
+            return None
+
+        self.duplicates += 1
+
+        if existing.get('status') == STATUS_COMPLETED:
+            return {**existing['result'], 'duplicate_of': key}
+
+        return {'action': 'skip', 'reason': 'Duplicate delivery already in progress', 'duplicate_of': key}
+
+    def complete(self, key: Optional[str], result: Dict):
+        """Record the outcome so later duplicates can return it"""
+
+        if key is None:
+            return
+        try:
+            self.store.put(key, {'status': STATUS_COMPLETED, 'result': result}, self.ttl_seconds)
+        except Exception as e:
+            print(f"⚠️ Could not record result for {key}: {e}")
+
+    def release(self, key: Optional[str]):
+        """Drop the claim after a failure so a retry runs normally"""
+
+        if key is None:
+            return
+        try:
+            self.store.delete(key)
+        except Exception as e:
+            print(f"⚠️ Could not release {key}: {e}")
@@ -0,0 +1,189 @@
+"""
+Lightweight Lambda Instrumentation
+Per-call latency metrics in CloudWatch Embedded Metric Format and sampled event logging
+
+Every boto3 operation is timed through botocore's ``before-call`` /
+``after-call`` event hooks, and handler stages through a decorator. At the
+end of an invocation the samples are written to stdout as EMF JSON lines,
+which CloudWatch Logs turns into metrics without any PutMetricData calls.
+Latencies are emitted as value arrays, so CloudWatch can report p50/p99
+for each stage and operation.
+"""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DevSecOps/Lambda')
+
+# Share of events logged in full; the rest get a one-line summary
+EVENT_LOG_SAMPLE_RATE = float(os.environ.get('EVENT_LOG_SAMPLE_RATE', '0.01'))
+
+# EMF accepts at most 100 values per metric in one document
+EMF_MAX_VALUES = 100
+
+STAGE_DIMENSION = 'Stage'
+OPERATION_DIMENSION = 'Operation'
+
+
+class MetricsRecorder:
+    """Collects latency samples for one invocation and flushes them as EMF
+
+    Samples are keyed by (dimension, name): handler stages use the
+    ``Stage`` dimension and AWS calls the ``Operation`` dimension
+    (``service.OperationName``). Recording is thread-safe, so stages and
+    calls made from worker pools land in the same flush.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE, enabled: bool = METRICS_ENABLED):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._samples: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, dimension: str, name: str, latency_ms: float, error: bool = False):
+        """Add one timed sample"""
+
+        if not self.enabled:
+            return
+        with self._lock:
+            sample = self._samples.setdefault((dimension, name), {'latency': [], 'errors': 0})
+            sample['latency'].append(round(latency_ms, 3))
+            if error:
+                sample['errors'] += 1
+
+    def stage(self, fn: Callable) -> Callable:
+        """Decorator timing fn as a handler stage named after the function"""
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.record(STAGE_DIMENSION, fn.__name__, (time.perf_counter() - start) * 1000, failed)
+
+        return timed
+
+    def invocation(self, fn: Callable) -> Callable:
+        """Decorator for lambda_handler: times it as a stage and flushes afterwards"""
+
+        staged = self.stage(fn)
+
+        @functools.wraps(fn)
+        def handler(*args, **kwargs):
+            try:
+                return staged(*args, **kwargs)
+            finally:
+                self.flush()
+
+        return handler
+
+    def install(self, provider):
+        """Time every AWS call made by clients the provider builds from now on"""
+
+        provider.add_client_hook(self._attach)
+
+    def _attach(self, service_name: str, client):
+        events = client.meta.events
+        events.register('before-call.*.*', self._start_call, unique_id='metrics-start')
+        events.register('after-call.*.*', self._finish_call, unique_id='metrics-finish')
+        events.register('after-call-error.*.*', self._fail_call, unique_id='metrics-fail')
+
+    @staticmethod
+    def _start_call(context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+
+    def _finish_call(self, model, context, parsed=None, http_response=None, **kwargs):
+        status_code = getattr(http_response, 'status_code', 200) or 200
+        failed = bool((parsed or {}).get('Error')) or status_code >= 300
+        self._record_call(model, context, failed)
+
+    def _fail_call(self, model, context, **kwargs):
+        self._record_call(model, context, True)
+
+    def _record_call(self, model, context, failed: bool):
+        started = context.pop('metrics_started', None)
+        if started is None:
+            return
+        name = f"{model.service_model.endpoint_prefix}.{model.name}"
+        self.record(OPERATION_DIMENSION, name, (time.perf_counter() - started) * 1000, failed)
+
+    def documents(self) -> List[Dict]:
+        """EMF documents for the samples collected so far"""
+
+        function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+        timestamp = int(time.time() * 1000)
+
+        with self._lock:
+            samples = {key: dict(value, latency=list(value['latency'])) for key, value in self._samples.items()}
+
+        documents = []
+        for (dimension, name), sample in sorted(samples.items()):
+            latencies = sample['latency']
+            for offset in range(0, len(latencies), EMF_MAX_VALUES):
+                # Counts go on the first document only so they are not repeated
+                first = offset == 0
+                metrics = [{'Name': 'Latency', 'Unit': 'Milliseconds'}]
+                if first:
+                    metrics += [{'Name': 'Calls', 'Unit': 'Count'}, {'Name': 'Errors', 'Unit': 'Count'}]
+
+                document = {
+                    '_aws': {
+                        'Timestamp': timestamp,
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': [['FunctionName', dimension]],
+                            'Metrics': metrics
+                        }]
+                    },
+                    'FunctionName': function_name,
+                    dimension: name,
+                    'Latency': latencies[offset:offset + EMF_MAX_VALUES]
+                }
+                if first:
+                    document['Calls'] = len(latencies)
+                    document['Errors'] = sample['errors']
+                documents.append(document)
+
+        return documents
+
+    def flush(self) -> List[Dict]:
+        """Print the collected samples as EMF lines and start a new invocation"""
+
+        documents = self.documents()
+        with self._lock:
+            self._samples.clear()
+
+        for document in documents:
+            print(json.dumps(document, separators=(',', ':')))
+        return documents
+
+
+def event_summary(event: Dict) -> str:
+    """One-line description of an event: source, type, action and id"""
+
+    detail = event.get('detail') or {}
+    if not isinstance(detail, dict):
+        detail = {}
+    action = detail.get('eventName') or detail.get('type') or '-'
+    event_id = detail.get('eventID') or event.get('id') or '-'
+    return f"{event.get('source', '-')} / {event.get('detail-type', '-')} / {action} (id={event_id})"
+
+
+def log_event(event: Dict, label: str = 'Received event', sample_rate: Optional[float] = None):
+    """Log a summary of every event and the full body for a sampled share"""
+
+    rate = EVENT_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate > 0 and random.random() < rate:
+        print(f"{label} (sampled): {json.dumps(event)}")
+    else:
+        print(f"{label}: {event_summary(event)}")
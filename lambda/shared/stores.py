@@ -0,0 +1,457 @@
+"""
+Shared Key-Value State Stores
+In-memory and DynamoDB-backed stores for state that outlives one invocation
+
+Both backends expose the same small interface, so a feature can run on the
+in-memory store inside a warm container and on a DynamoDB table in
+production. The table uses a single string partition key ``pk`` and an
+``expires_at`` TTL attribute; features share it by namespace prefix. Items
+written with an index key also land in a sparse secondary index
+(``ipk``/``isk``), so a feature can keep one small item per member and read
+them back in sort order with one query instead of growing a single item.
+Point the DynamoDB client at a local stand-in (DynamoDB Local, LocalStack)
+with the standard AWS_ENDPOINT_URL_DYNAMODB environment variable.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from shared.aws_clients import error_code, provider
+
+# Table shared by every feature that needs persistent state
+STATE_TABLE_NAME = os.environ.get('STATE_TABLE_NAME', '')
+# Secondary index on (ipk, isk) for items written with an index key
+STATE_INDEX_NAME = os.environ.get('STATE_INDEX_NAME', 'index')
+
+# (partition, sort key) of an item in the secondary index
+IndexKey = Tuple[str, str]
+
+
+class MemoryStore:
+    """Thread-safe dict store for one container; state is lost on cold start"""
+
+    def __init__(self, namespace: str = ''):
+        self.namespace = namespace
+        self._items: Dict[str, tuple] = {}
+        self._index: Dict[str, IndexKey] = {}
+        # Versions written by swap_if_newer
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Dict]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires_at, item = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._items[key]
+            self._index.pop(key, None)
+            self._versions.pop(key, None)
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._live(key)
+            return dict(item) if item is not None else None
+
+    def put(self, key: str, item: Dict, ttl_seconds: Optional[float] = None,
+            index: Optional[IndexKey] = None):
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._items[key] = (expires_at, dict(item))
+            self._versions.pop(key, None)
+            if index:
+                self._index[key] = index
+            else:
+                self._index.pop(key, None)
+
+    def put_if_absent(self, key: str, item: Dict, ttl_seconds: Optional[float] = None) -> bool:
+        """Store item only if key is missing or expired; True if stored"""
+
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._items[key] = (expires_at, dict(item))
+            self._index.pop(key, None)
+            self._versions.pop(key, None)
+            return True
+
+    def append(self, key: str, entries: List[Dict], ttl_seconds: Optional[float] = None):
+        """Append entries to the list under key; the TTL starts with the first append"""
+
+        with self._lock:
+            current = self._live(key)
+            if current is None:
+                expires_at = time.time() + ttl_seconds if ttl_seconds else None
+                current = {'entries': []}
+            else:
+                expires_at = self._items[key][0]
+            current['entries'] = current.get('entries', []) + [dict(entry) for entry in entries]
+            self._items[key] = (expires_at, current)
+
+    def get_list(self, key: str) -> List[Dict]:
+        """Entries appended under key, oldest first"""
+
+        with self._lock:
+            item = self._live(key)
+            return list(item.get('entries', [])) if item is not None else []
+
+    def swap(self, key: str, item: Dict, ttl_seconds: Optional[float] = None) -> Optional[Dict]:
+        """Store item and return the one it replaced, atomically"""
+
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            previous = self._live(key)
+            self._items[key] = (expires_at, dict(item))
+            self._index.pop(key, None)
+            self._versions.pop(key, None)
+            return dict(previous) if previous is not None else None
+
+    def swap_if_newer(self, key: str, item: Dict, version: str,
+                      ttl_seconds: Optional[float] = None) -> Tuple[bool, Optional[Dict]]:
+        """Swap item in unless the stored one has a later version
+
+        Returns (stored, replaced item); a stale write stores nothing.
+        """
+
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            previous = self._live(key)
+            if previous is not None and self._versions.get(key, '') > version:
+                return False, None
+            self._items[key] = (expires_at, dict(item))
+            self._index.pop(key, None)
+            self._versions[key] = version
+            return True, dict(previous) if previous is not None else None
+
+    def increment(self, key: str, deltas: Dict[str, int], ttl_seconds: Optional[float] = None) -> Dict[str, int]:
+        """Add deltas to the named counters under key; returns every counter
+
+        The TTL, if any, starts with the first increment.
+        """
+
+        with self._lock:
+            current = self._live(key)
+            if current is None:
+                expires_at = time.time() + ttl_seconds if ttl_seconds else None
+                current = {}
+            else:
+                expires_at = self._items[key][0]
+            counters = dict(current.get('counters', {}))
+            for name, delta in deltas.items():
+                counters[name] = counters.get(name, 0) + delta
+            self._items[key] = (expires_at, {**current, 'counters': counters})
+            return dict(counters)
+
+    def get_counters(self, key: str) -> Dict[str, int]:
+        with self._lock:
+            item = self._live(key)
+            return dict(item.get('counters', {})) if item is not None else {}
+
+    def update_members(self, key: str, name: str, add: Optional[Dict[str, str]] = None,
+                       remove: Optional[List[str]] = None):
+        """Set and remove entries of the named string map under key"""
+
+        with self._lock:
+            current = self._live(key) or {}
+            members = dict(current.get('members', {}).get(name, {}))
+            members.update(add or {})
+            for member in remove or []:
+                members.pop(member, None)
+            expires_at = self._items[key][0] if key in self._items else None
+            self._items[key] = (expires_at, {**current, 'members': {**current.get('members', {}), name: members}})
+
+    def get_members(self, key: str, name: str) -> Dict[str, str]:
+        with self._lock:
+            item = self._live(key)
+            return dict(item.get('members', {}).get(name, {})) if item is not None else {}
+
+    def query_index(self, partition: str, limit: Optional[int] = None) -> List[Dict]:
+        """Items put with an index key in partition, in sort key order"""
+
+        with self._lock:
+            matches = sorted(
+                (sort, key) for key, (part, sort) in list(self._index.items())
+                if part == partition and self._live(key) is not None
+            )
+            return [dict(self._items[key][1]) for _, key in matches[:limit]]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+            self._index.pop(key, None)
+            self._versions.pop(key, None)
+
+
+class DynamoDBStore:
+    """Store backed by a DynamoDB table shared between features by namespace
+
+    Items are stored as a JSON document in a ``data`` attribute so callers
+    keep working with plain dicts; lists built with ``append`` keep each
+    entry as a JSON string in an ``entries`` list attribute. Counters are
+    ``c_<name>`` number attributes updated with ADD, and member maps are
+    ``m_<name>`` map attributes, so neither needs a read-modify-write.
+    An index key is written to ``ipk`` (namespaced) and ``isk`` for the
+    STATE_INDEX_NAME secondary index, and a version to a ``v`` attribute
+    that conditional writes compare against.
+    Expired items are ignored on read even before DynamoDB's TTL sweeper
+    removes them.
+    """
+
+    def __init__(self, table_name: str, namespace: str, client=None):
+        self.table_name = table_name
+        self.namespace = namespace
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = provider.client('dynamodb')
+        return self._client
+
+    def _key(self, key: str) -> Dict:
+        return {'pk': {'S': f"{self.namespace}#{key}"}}
+
+    def _item(self, key: str, item: Dict, ttl_seconds: Optional[float],
+              index: Optional[IndexKey] = None) -> Dict:
+        record = {**self._key(key), 'data': {'S': json.dumps(item, default=str)}}
+        if ttl_seconds:
+            record['expires_at'] = {'N': str(int(time.time() + ttl_seconds))}
+        if index:
+            record['ipk'] = {'S': f"{self.namespace}#{index[0]}"}
+            record['isk'] = {'S': index[1]}
+        return record
+
+    def get(self, key: str) -> Optional[Dict]:
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key=self._key(key),
+            ConsistentRead=True
+        )
+        record = response.get('Item')
+        if not record:
+            return None
+        if 'expires_at' in record and int(record['expires_at']['N']) <= time.time():
+            return None
+        return json.loads(record['data']['S'])
+
+    def put(self, key: str, item: Dict, ttl_seconds: Optional[float] = None,
+            index: Optional[IndexKey] = None):
+        self.client.put_item(TableName=self.table_name, Item=self._item(key, item, ttl_seconds, index))
+
+    def put_if_absent(self, key: str, item: Dict, ttl_seconds: Optional[float] = None) -> bool:
+        """Conditional write that also reclaims items past their TTL"""
+
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item=self._item(key, item, ttl_seconds),
+                ConditionExpression='attribute_not_exists(pk) OR expires_at <= :now',
+                ExpressionAttributeValues={':now': {'N': str(int(time.time()))}}
+            )
+            return True
+        except Exception as e:
+            if error_code(e) == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def append(self, key: str, entries: List[Dict], ttl_seconds: Optional[float] = None):
+        """Atomic list_append of JSON entries to an ``entries`` list attribute"""
+
+        expression = 'SET entries = list_append(if_not_exists(entries, :empty), :entries)'
+        values = {
+            ':empty': {'L': []},
+            ':entries': {'L': [{'S': json.dumps(entry, default=str)} for entry in entries]}
+        }
+        if ttl_seconds:
+            expression += ', expires_at = if_not_exists(expires_at, :expires_at)'
+            values[':expires_at'] = {'N': str(int(time.time() + ttl_seconds))}
+
+        self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(key),
+            UpdateExpression=expression,
+            ExpressionAttributeValues=values
+        )
+
+    def get_list(self, key: str) -> List[Dict]:
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key=self._key(key),
+            ConsistentRead=True
+        )
+        record = response.get('Item')
+        if not record:
+            return []
+        if 'expires_at' in record and int(record['expires_at']['N']) <= time.time():
+            return []
+        return [json.loads(entry['S']) for entry in record.get('entries', {}).get('L', [])]
+
+    def swap(self, key: str, item: Dict, ttl_seconds: Optional[float] = None) -> Optional[Dict]:
+        """PutItem returning the replaced item (ReturnValues=ALL_OLD)"""
+
+        response = self.client.put_item(
+            TableName=self.table_name,
+            Item=self._item(key, item, ttl_seconds),
+            ReturnValues='ALL_OLD'
+        )
+        previous = response.get('Attributes')
+        if not previous or 'data' not in previous:
+            return None
+        if 'expires_at' in previous and int(previous['expires_at']['N']) <= time.time():
+            return None
+        return json.loads(previous['data']['S'])
+
+    def swap_if_newer(self, key: str, item: Dict, version: str,
+                      ttl_seconds: Optional[float] = None) -> Tuple[bool, Optional[Dict]]:
+        """Conditional PutItem (stored version not later) returning the replaced item"""
+
+        record = self._item(key, item, ttl_seconds)
+        record['v'] = {'S': version}
+        try:
+            response = self.client.put_item(
+                TableName=self.table_name,
+                Item=record,
+                ConditionExpression='attribute_not_exists(v) OR v <= :v OR expires_at <= :now',
+                ExpressionAttributeValues={':v': {'S': version}, ':now': {'N': str(int(time.time()))}},
+                ReturnValues='ALL_OLD'
+            )
+        except Exception as e:
+            if error_code(e) == 'ConditionalCheckFailedException':
+                return False, None
+            raise
+
+        previous = response.get('Attributes')
+        if not previous or 'data' not in previous:
+            return True, None
+        if 'expires_at' in previous and int(previous['expires_at']['N']) <= time.time():
+            return True, None
+        return True, json.loads(previous['data']['S'])
+
+    def increment(self, key: str, deltas: Dict[str, int], ttl_seconds: Optional[float] = None) -> Dict[str, int]:
+        names = {f"#c{i}": f"c_{name}" for i, name in enumerate(deltas)}
+        values = {f":c{i}": {'N': str(delta)} for i, delta in enumerate(deltas.values())}
+        expression = 'ADD ' + ', '.join(f"#c{i} :c{i}" for i in range(len(deltas)))
+        if ttl_seconds:
+            expression += ' SET expires_at = if_not_exists(expires_at, :expires_at)'
+            values[':expires_at'] = {'N': str(int(time.time() + ttl_seconds))}
+        response = self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(key),
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+        return self._counters(response.get('Attributes', {}))
+
+    @staticmethod
+    def _counters(record: Dict) -> Dict[str, int]:
+        return {name[2:]: int(value['N']) for name, value in record.items() if name.startswith('c_')}
+
+    def get_counters(self, key: str) -> Dict[str, int]:
+        response = self.client.get_item(TableName=self.table_name, Key=self._key(key), ConsistentRead=True)
+        return self._counters(response.get('Item', {}))
+
+    def update_members(self, key: str, name: str, add: Optional[Dict[str, str]] = None,
+                       remove: Optional[List[str]] = None):
+        """SET/REMOVE entries of an ``m_<name>`` map, creating the map on first use"""
+
+        names = {'#m': f"m_{name}"}
+        values = {}
+        clauses = []
+        for i, (member, value) in enumerate((add or {}).items()):
+            names[f"#a{i}"] = member
+            values[f":a{i}"] = {'S': value}
+            clauses.append(f"#m.#a{i} = :a{i}")
+        removals = []
+        for i, member in enumerate(remove or []):
+            names[f"#r{i}"] = member
+            removals.append(f"#m.#r{i}")
+        if not clauses and not removals:
+            return
+
+        expression = ('SET ' + ', '.join(clauses) if clauses else '') + (' REMOVE ' + ', '.join(removals) if removals else '')
+        params = {
+            'TableName': self.table_name,
+            'Key': self._key(key),
+            'UpdateExpression': expression.strip(),
+            'ExpressionAttributeNames': names
+        }
+        if values:
+            params['ExpressionAttributeValues'] = values
+
+        try:
+            self.client.update_item(**params)
+        except Exception as e:
+            # Nested paths need the map to exist; create it and retry once
+            if error_code(e) != 'ValidationException':
+                raise
+            self.client.update_item(
+                TableName=self.table_name,
+                Key=self._key(key),
+                UpdateExpression='SET #m = if_not_exists(#m, :empty)',
+                ExpressionAttributeNames={'#m': f"m_{name}"},
+                ExpressionAttributeValues={':empty': {'M': {}}}
+            )
+            self.client.update_item(**params)
+
+    def get_members(self, key: str, name: str) -> Dict[str, str]:
+        response = self.client.get_item(TableName=self.table_name, Key=self._key(key), ConsistentRead=True)
+        members = response.get('Item', {}).get(f"m_{name}", {}).get('M', {})
+        return {member: value['S'] for member, value in members.items()}
+
+    def query_index(self, partition: str, limit: Optional[int] = None) -> List[Dict]:
+        """Query the secondary index (eventually consistent), in sort key order"""
+
+        params = {
+            'TableName': self.table_name,
+            'IndexName': STATE_INDEX_NAME,
+            'KeyConditionExpression': 'ipk = :partition',
+            'ExpressionAttributeValues': {':partition': {'S': f"{self.namespace}#{partition}"}},
+            'ScanIndexForward': True
+        }
+        if limit:
+            params['Limit'] = limit
+
+        items: List[Dict] = []
+        while True:
+            response = self.client.query(**params)
+            for record in response.get('Items', []):
+                if 'expires_at' in record and int(record['expires_at']['N']) <= time.time():
+                    continue
+                items.append(json.loads(record['data']['S']))
+            if (limit and len(items) >= limit) or 'LastEvaluatedKey' not in response:
+                return items[:limit]
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def delete(self, key: str):
+        self.client.delete_item(TableName=self.table_name, Key=self._key(key))
+
+
+def state_store(namespace: str, backend: Optional[str] = None):
+    """Build the store for a feature namespace
+
+    ``backend`` is 'memory', 'dynamodb' (uses STATE_TABLE_NAME) or
+    'dynamodb:<table>'. By default DynamoDB is used when STATE_TABLE_NAME is
+    set and memory otherwise.
+    """
+
+    backend = backend or ('dynamodb' if STATE_TABLE_NAME else 'memory')
+
+    if backend == 'memory':
+        return MemoryStore(namespace)
+
+    if backend.startswith('dynamodb'):
+        _, _, table_name = backend.partition(':')
+        table_name = table_name or STATE_TABLE_NAME
+        if not table_name:
+            raise ValueError(f"No DynamoDB table configured for '{namespace}' state")
+        return DynamoDBStore(table_name, namespace)
+
+    raise ValueError(f"Unknown state store backend: {backend}")
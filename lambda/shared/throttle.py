@@ -0,0 +1,193 @@
+"""
+Throttle-Aware AWS Call Scheduler
+Per-API-family token buckets with adaptive rates and jittered retries
+
+EC2 throttles each account and region with token buckets per action
+category. The scheduler mirrors those categories so every thread in a
+container draws from one shared budget per (region, family). Each bucket
+starts below the published refill rate, climbs additively while calls
+succeed and halves on a throttle response (AIMD), so sustained throughput
+settles just under the real limit instead of hammering it.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from shared.aws_clients import error_code
+
+# (bucket capacity, refill per second) from the EC2 API request throttling docs
+EC2_RATE_TIERS = {
+    'ec2:mutating': (200, 5.0),
+    'ec2:non_mutating': (100, 20.0),
+    'ec2:unfiltered': (50, 10.0),
+}
+
+# Starting share of the published refill rate; the account budget is shared
+# with every other caller, so we probe upwards from here
+INITIAL_RATE_FRACTION = float(os.environ.get('THROTTLE_INITIAL_RATE_FRACTION', '0.5'))
+MAX_ATTEMPTS = int(os.environ.get('THROTTLE_MAX_ATTEMPTS', '6'))
+BACKOFF_BASE_SECONDS = float(os.environ.get('THROTTLE_BACKOFF_BASE_SECONDS', '0.2'))
+BACKOFF_CAP_SECONDS = float(os.environ.get('THROTTLE_BACKOFF_CAP_SECONDS', '10'))
+
+THROTTLE_ERROR_CODES = {
+    'RequestLimitExceeded', 'Throttling', 'ThrottlingException', 'ThrottledException',
+    'RequestThrottled', 'RequestThrottledException', 'TooManyRequestsException',
+    'SlowDown', 'ProvisionedThroughputExceededException'
+}
+
+TRANSIENT_ERROR_CODES = {'InternalError', 'InternalFailure', 'ServiceUnavailable', 'Unavailable'}
+
+NON_MUTATING_PREFIXES = ('Describe', 'Get', 'List')
+NARROWING_PARAMETERS = ('Filters', 'MaxResults', 'NextToken')
+
+
+class AdaptiveTokenBucket:
+    """Token bucket whose refill rate adapts to throttle feedback"""
+
+    def __init__(self, capacity: float, max_rate: float, initial_fraction: float = INITIAL_RATE_FRACTION):
+        self.capacity = capacity
+        self.max_rate = max_rate
+        self.min_rate = max_rate * 0.05
+        self.rate = max(self.min_rate, max_rate * initial_fraction)
+        self.tokens = capacity * initial_fraction
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns seconds spent waiting"""
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self):
+        """Additive increase towards the published rate"""
+
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def on_throttle(self):
+        """Multiplicative decrease and drain, so every thread backs off together"""
+
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = 0
+
+
+class CallScheduler:
+    """Routes API calls through shared per-(region, family) token buckets"""
+
+    def __init__(self, tiers: Dict[str, Tuple[float, float]] = None, max_attempts: int = MAX_ATTEMPTS):
+        self.tiers = tiers or EC2_RATE_TIERS
+        self.services = {family.split(':')[0] for family in self.tiers}
+        self.max_attempts = max_attempts
+        self._buckets: Dict[Tuple[Optional[str], str], AdaptiveTokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def family(self, service_name: str, operation_name: str, params: Dict) -> Optional[str]:
+        """EC2 request-rate category of a call, or None if it is not rate-managed"""
+
+        if service_name != 'ec2':
+            return None
+        if not operation_name.startswith(NON_MUTATING_PREFIXES):
+            return 'ec2:mutating'
+        if any(key in params for key in NARROWING_PARAMETERS) or any(key.endswith('Ids') for key in params):
+            return 'ec2:non_mutating'
+        return 'ec2:unfiltered'
+
+    def _bucket(self, region: Optional[str], family: str) -> AdaptiveTokenBucket:
+        key = (region, family)
+        with self._lock:
+            if key not in self._buckets:
+                capacity, rate = self.tiers[family]
+                self._buckets[key] = AdaptiveTokenBucket(capacity, rate)
+                self._stats.setdefault(family, {'calls': 0, 'throttled': 0, 'retries': 0, 'waited_seconds': 0.0})
+            return self._buckets[key]
+
+    def _record(self, family: str, **deltas):
+        with self._lock:
+            stats = self._stats[family]
+            for name, delta in deltas.items():
+                stats[name] += delta
+
+    def call(self, service_name: str, region: Optional[str], operation_name: str,
+             method: Callable[..., Any], **params) -> Any:
+        """Invoke method under the family's budget, retrying throttles with jittered backoff"""
+
+        family = self.family(service_name, operation_name, params)
+        if family is None:
+            return method(**params)
+
+        bucket = self._bucket(region, family)
+        attempt = 0
+
+        while True:
+            waited = bucket.acquire()
+            self._record(family, calls=1, waited_seconds=waited)
+
+            try:
+                response = method(**params)
+            except Exception as e:
+                code = error_code(e)
+                throttled = code in THROTTLE_ERROR_CODES
+                retryable = throttled or code in TRANSIENT_ERROR_CODES or is_connection_error(e)
+
+                attempt += 1
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+
+                if throttled:
+                    bucket.on_throttle()
+                    self._record(family, throttled=1)
+
+                # Full jitter keeps concurrent retries from re-synchronising
+                delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                self._record(family, retries=1, waited_seconds=delay)
+                time.sleep(delay)
+                continue
+
+            bucket.on_success()
+            return response
+
+    def wrap(self, service_name: str, region: Optional[str], operation_name: str,
+             method: Callable[..., Any]) -> Callable[..., Any]:
+        """Bind method to the scheduler under its API operation name"""
+
+        def scheduled(**params):
+            return self.call(service_name, region, operation_name, method, **params)
+
+        return scheduled
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Cumulative per-family counters plus the current adapted rates"""
+
+        with self._lock:
+            snapshot = {family: dict(stats) for family, stats in self._stats.items()}
+            for (region, family), bucket in self._buckets.items():
+                snapshot[family].setdefault('rates', {})[region or 'default'] = round(bucket.rate, 2)
+            for stats in snapshot.values():
+                stats['waited_seconds'] = round(stats['waited_seconds'], 3)
+            return snapshot
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether error is a botocore network failure worth retrying"""
+
+    from botocore.exceptions import ConnectionError, HTTPClientError
+    return isinstance(error, (ConnectionError, HTTPClientError))
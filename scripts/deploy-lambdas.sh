@@ -47,6 +47,12 @@ cd "$PROJECT_ROOT/lambda"
 
 for func_dir in */; do
     func_name=$(basename "$func_dir")
+
+    # Shared modules are bundled into each function, not deployed on their own
+    if [ "$func_name" = "shared" ]; then
+        continue
+    fi
+
     echo "  - Packaging $func_name..."
 
     cd "$func_dir"
@@ -60,6 +66,9 @@ for func_dir in */; do
     zip -r "../${func_name}.zip" . -x "*.pyc" "**/__pycache__/*"
 
     cd ..
+
+    # Add shared modules
+    zip -r "${func_name}.zip" shared -x "*.pyc" "**/__pycache__/*"
 done
 
 echo "✅ Lambda functions packaged"
@@ -84,6 +84,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "ec2:DescribeInstances",
           "ec2:DescribeSecurityGroups",
+          "ec2:DescribeSnapshots",
           "ec2:DescribeVolumes",
           "ec2:DescribeVpcs"
         ]
@@ -94,14 +95,17 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "ec2:CreateTags",
           "ec2:RevokeSecurityGroupIngress",
+          "ec2:RevokeSecurityGroupEgress",
           "ec2:ModifyInstanceAttribute",
           "ec2:ModifyInstanceMetadataOptions",
           "ec2:CreateSecurityGroup",
-          "ec2:CreateSnapshot"
+          "ec2:CreateSnapshot",
+          "ec2:CreateSnapshots"
         ]
         Resource = [
           "arn:aws:ec2:*:*:instance/*",
           "arn:aws:ec2:*:*:security-group/*",
+          "arn:aws:ec2:*:*:vpc/*",
           "arn:aws:ec2:*:*:volume/*",
           "arn:aws:ec2:*:*:snapshot/*"
         ]
@@ -118,6 +122,13 @@ resource "aws_iam_role_policy" "lambda_policy" {
         ]
         Resource = "arn:aws:s3:::*"
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "securityhub:BatchUpdateFindings"
+        ]
+        Resource = "arn:aws:securityhub:*:${data.aws_caller_identity.current.account_id}:hub/default"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -145,11 +156,38 @@ resource "aws_iam_role_policy" "lambda_policy" {
   })
 }
 
+# Lambda packages: each function's own modules plus lambda/shared
+locals {
+  lambda_src = "${path.module}/../../../lambda"
+
+  shared_files = {
+    for f in fileset("${local.lambda_src}/shared", "*.py") :
+    "shared/${f}" => "${local.lambda_src}/shared/${f}"
+  }
+
+  auto_remediation_files = merge(local.shared_files, {
+    for f in fileset("${local.lambda_src}/auto-remediation", "{*.py,*.json}") :
+    f => "${local.lambda_src}/auto-remediation/${f}"
+  })
+
+  security_response_files = merge(local.shared_files, {
+    for f in fileset("${local.lambda_src}/security-response", "*.py") :
+    f => "${local.lambda_src}/security-response/${f}"
+  })
+}
+
 # Auto-Remediation Lambda Function
 data "archive_file" "auto_remediation" {
   type        = "zip"
-  source_file = "${path.module}/../../../lambda/auto-remediation/handler.py"
   output_path = "${path.module}/auto-remediation.zip"
+
+  dynamic "source" {
+    for_each = local.auto_remediation_files
+    content {
+      content  = file(source.value)
+      filename = source.key
+    }
+  }
 }
 
 resource "aws_lambda_function" "auto_remediation" {
@@ -173,6 +211,15 @@ resource "aws_lambda_function" "auto_remediation" {
       AUTO_FIX_ENABLED = var.auto_fix_enabled
       DRY_RUN          = var.auto_fix_enabled ? "false" : "true"
       ENVIRONMENT      = var.environment
+
+      SWEEP_CHECKPOINT_URI = var.sweep_checkpoint_bucket != "" ? "s3://${var.sweep_checkpoint_bucket}/auto-remediation/sweep-checkpoint.json" : (var.state_table_enabled ? "dynamodb://checkpoint" : "/tmp/auto-remediation-sweep.json")
+      STATE_TABLE_NAME     = var.state_table_enabled ? aws_dynamodb_table.state[0].name : ""
+
+      METRICS_NAMESPACE     = "${var.project_name}/Lambda"
+      EVENT_LOG_SAMPLE_RATE = var.event_log_sample_rate
+
+      DIGEST_WINDOW_SECONDS = var.notification_digest_window_seconds
+      DIGEST_REPORT_URI     = var.digest_report_bucket != "" ? "s3://${var.digest_report_bucket}/notification-digests" : ""
     }
   }
 
@@ -245,8 +292,15 @@ resource "aws_cloudwatch_log_group" "auto_remediation" {
 # Security Response Lambda Function
 data "archive_file" "security_response" {
   type        = "zip"
-  source_file = "${path.module}/../../../lambda/security-response/handler.py"
   output_path = "${path.module}/security-response.zip"
+
+  dynamic "source" {
+    for_each = local.security_response_files
+    content {
+      content  = file(source.value)
+      filename = source.key
+    }
+  }
 }
 
 resource "aws_lambda_function" "security_response" {
@@ -266,8 +320,19 @@ resource "aws_lambda_function" "security_response" {
 
   environment {
     variables = {
-      SNS_TOPIC_ARN = aws_sns_topic.notifications.arn
-      ENVIRONMENT   = var.environment
+      SNS_TOPIC_ARN    = aws_sns_topic.notifications.arn
+      ENVIRONMENT      = var.environment
+      STATE_TABLE_NAME = var.state_table_enabled ? aws_dynamodb_table.state[0].name : ""
+
+      METRICS_NAMESPACE     = "${var.project_name}/Lambda"
+      EVENT_LOG_SAMPLE_RATE = var.event_log_sample_rate
+
+      DIGEST_WINDOW_SECONDS = var.notification_digest_window_seconds
+      DIGEST_REPORT_URI     = var.digest_report_bucket != "" ? "s3://${var.digest_report_bucket}/notification-digests" : ""
+
+      PRIORITY_QUEUE_BACKEND = var.incident_queues_enabled ? "sqs" : ""
+      STANDARD_QUEUE_URL     = var.incident_queues_enabled ? aws_sqs_queue.incident_standard[0].url : ""
+      BULK_QUEUE_URL         = var.incident_queues_enabled ? aws_sqs_queue.incident_bulk[0].url : ""
     }
   }
 
@@ -307,11 +372,13 @@ resource "aws_cloudwatch_event_rule" "security_group_changes" {
 
 resource "aws_cloudwatch_event_target" "security_group_changes" {
   rule      = aws_cloudwatch_event_rule.security_group_changes.name
-  target_id = "AutoRemediationLambda"
-  arn       = aws_lambda_function.auto_remediation.arn
+  target_id = var.remediation_batching_enabled ? "AutoRemediationQueue" : "AutoRemediationLambda"
+  arn       = var.remediation_batching_enabled ? aws_sqs_queue.remediation_events[0].arn : aws_lambda_function.auto_remediation.arn
 }
 
 resource "aws_lambda_permission" "allow_eventbridge_sg" {
+  count = var.remediation_batching_enabled ? 0 : 1
+
   statement_id  = "AllowExecutionFromEventBridge"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.auto_remediation.function_name
@@ -337,14 +404,508 @@ resource "aws_cloudwatch_event_rule" "ec2_state_changes" {
 
 resource "aws_cloudwatch_event_target" "ec2_state_changes" {
   rule      = aws_cloudwatch_event_rule.ec2_state_changes.name
-  target_id = "AutoRemediationLambda"
-  arn       = aws_lambda_function.auto_remediation.arn
+  target_id = var.remediation_batching_enabled ? "AutoRemediationQueue" : "AutoRemediationLambda"
+  arn       = var.remediation_batching_enabled ? aws_sqs_queue.remediation_events[0].arn : aws_lambda_function.auto_remediation.arn
 }
 
 resource "aws_lambda_permission" "allow_eventbridge_ec2" {
+  count = var.remediation_batching_enabled ? 0 : 1
+
   statement_id  = "AllowExecutionFromEventBridgeEC2"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.auto_remediation.function_name
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.ec2_state_changes.arn
 }
+
+# EventBridge Rule for EC2 Instance Launches
+resource "aws_cloudwatch_event_rule" "ec2_launches" {
+  name        = "${var.project_name}-${var.environment}-ec2-launches"
+  description = "Capture EC2 instance launches and starts"
+
+  event_pattern = jsonencode({
+    source      = ["aws.ec2"]
+    detail-type = ["AWS API Call via CloudTrail"]
+    detail = {
+      eventName = [
+        "RunInstances",
+        "StartInstances"
+      ]
+    }
+  })
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "ec2_launches" {
+  rule      = aws_cloudwatch_event_rule.ec2_launches.name
+  target_id = var.remediation_batching_enabled ? "AutoRemediationQueue" : "AutoRemediationLambda"
+  arn       = var.remediation_batching_enabled ? aws_sqs_queue.remediation_events[0].arn : aws_lambda_function.auto_remediation.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_ec2_launches" {
+  count = var.remediation_batching_enabled ? 0 : 1
+
+  statement_id  = "AllowExecutionFromEventBridgeEC2Launches"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_remediation.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.ec2_launches.arn
+}
+
+# EventBridge Rule for S3 Bucket Posture Changes
+resource "aws_cloudwatch_event_rule" "s3_bucket_changes" {
+  name        = "${var.project_name}-${var.environment}-s3-bucket-changes"
+  description = "Capture S3 bucket ACL, policy, encryption and public access changes"
+
+  event_pattern = jsonencode({
+    source      = ["aws.s3"]
+    detail-type = ["AWS API Call via CloudTrail"]
+    detail = {
+      eventName = [
+        "CreateBucket",
+        "PutBucketAcl",
+        "PutBucketPolicy",
+        "DeleteBucketPolicy",
+        "PutBucketEncryption",
+        "DeleteBucketEncryption",
+        "PutBucketVersioning",
+        "PutBucketPublicAccessBlock",
+        "DeleteBucketPublicAccessBlock"
+      ]
+    }
+  })
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "s3_bucket_changes" {
+  rule      = aws_cloudwatch_event_rule.s3_bucket_changes.name
+  target_id = var.remediation_batching_enabled ? "AutoRemediationQueue" : "AutoRemediationLambda"
+  arn       = var.remediation_batching_enabled ? aws_sqs_queue.remediation_events[0].arn : aws_lambda_function.auto_remediation.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_s3" {
+  count = var.remediation_batching_enabled ? 0 : 1
+
+  statement_id  = "AllowExecutionFromEventBridgeS3"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_remediation.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.s3_bucket_changes.arn
+}
+
+# SQS batching for auto-remediation (optional)
+# Bursts of CloudTrail events are buffered and delivered in batches so the
+# Lambda can coalesce them per resource.
+resource "aws_sqs_queue" "remediation_dlq" {
+  count = var.remediation_batching_enabled ? 1 : 0
+
+  name                      = "${var.project_name}-${var.environment}-remediation-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+
+  tags = var.tags
+}
+
+resource "aws_sqs_queue" "remediation_events" {
+  count = var.remediation_batching_enabled ? 1 : 0
+
+  name                       = "${var.project_name}-${var.environment}-remediation-events"
+  visibility_timeout_seconds = aws_lambda_function.auto_remediation.timeout * 6
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.remediation_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+
+  tags = merge(var.tags, {
+    Name = "${var.project_name}-${var.environment}-remediation-events"
+  })
+}
+
+resource "aws_sqs_queue_policy" "remediation_events" {
+  count = var.remediation_batching_enabled ? 1 : 0
+
+  queue_url = aws_sqs_queue.remediation_events[0].id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Principal = {
+        Service = "events.amazonaws.com"
+      }
+      Action   = "sqs:SendMessage"
+      Resource = aws_sqs_queue.remediation_events[0].arn
+      Condition = {
+        ArnEquals = {
+          "aws:SourceArn" = [
+            aws_cloudwatch_event_rule.security_group_changes.arn,
+            aws_cloudwatch_event_rule.ec2_state_changes.arn,
+            aws_cloudwatch_event_rule.ec2_launches.arn,
+            aws_cloudwatch_event_rule.s3_bucket_changes.arn
+          ]
+        }
+      }
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "lambda_sqs_policy" {
+  count = var.remediation_batching_enabled ? 1 : 0
+
+  name = "${var.project_name}-${var.environment}-lambda-sqs-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes"
+      ]
+      Resource = aws_sqs_queue.remediation_events[0].arn
+    }]
+  })
+}
+
+resource "aws_lambda_event_source_mapping" "remediation_events" {
+  count = var.remediation_batching_enabled ? 1 : 0
+
+  event_source_arn                   = aws_sqs_queue.remediation_events[0].arn
+  function_name                      = aws_lambda_function.auto_remediation.arn
+  batch_size                         = var.remediation_batch_size
+  maximum_batching_window_in_seconds = var.remediation_batch_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy.lambda_sqs_policy]
+}
+
+# Severity-tiered incident queues for security-response (optional)
+# Critical findings are contained inline; standard and bulk events are queued
+# here and drained with capped concurrency, leaving the rest of the function's
+# concurrency free for containment.
+resource "aws_sqs_queue" "incident_dlq" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  name                      = "${var.project_name}-${var.environment}-incident-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+
+  tags = var.tags
+}
+
+resource "aws_sqs_queue" "incident_standard" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  name                       = "${var.project_name}-${var.environment}-incident-standard"
+  # Six times the function timeout; literal because the function references this queue
+  visibility_timeout_seconds = 1800
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.incident_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+
+  tags = merge(var.tags, {
+    Name = "${var.project_name}-${var.environment}-incident-standard"
+  })
+}
+
+resource "aws_sqs_queue" "incident_bulk" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  name                       = "${var.project_name}-${var.environment}-incident-bulk"
+  # Six times the function timeout; literal because the function references this queue
+  visibility_timeout_seconds = 1800
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.incident_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+
+  tags = merge(var.tags, {
+    Name = "${var.project_name}-${var.environment}-incident-bulk"
+  })
+}
+
+resource "aws_iam_role_policy" "lambda_incident_queue_policy" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  name = "${var.project_name}-${var.environment}-lambda-incident-queue-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "sqs:SendMessage",
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes"
+      ]
+      Resource = [
+        aws_sqs_queue.incident_standard[0].arn,
+        aws_sqs_queue.incident_bulk[0].arn
+      ]
+    }]
+  })
+}
+
+resource "aws_lambda_event_source_mapping" "incident_standard" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  event_source_arn                   = aws_sqs_queue.incident_standard[0].arn
+  function_name                      = aws_lambda_function.security_response.arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.incident_standard_max_concurrency
+  }
+
+  depends_on = [aws_iam_role_policy.lambda_incident_queue_policy]
+}
+
+resource "aws_lambda_event_source_mapping" "incident_bulk" {
+  count = var.incident_queues_enabled ? 1 : 0
+
+  event_source_arn                   = aws_sqs_queue.incident_bulk[0].arn
+  function_name                      = aws_lambda_function.security_response.arn
+  batch_size                         = var.incident_bulk_batch_size
+  maximum_batching_window_in_seconds = var.incident_bulk_batch_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.incident_bulk_max_concurrency
+  }
+
+  depends_on = [aws_iam_role_policy.lambda_incident_queue_policy]
+}
+
+# Scheduled account-wide sweep (optional)
+# Each run resumes from the saved checkpoint until every region is covered.
+resource "aws_cloudwatch_event_rule" "remediation_sweep" {
+  count = var.sweep_enabled ? 1 : 0
+
+  name                = "${var.project_name}-${var.environment}-remediation-sweep"
+  description         = "Start or resume the account-wide auto-remediation sweep"
+  schedule_expression = var.sweep_schedule_expression
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "remediation_sweep" {
+  count = var.sweep_enabled ? 1 : 0
+
+  rule      = aws_cloudwatch_event_rule.remediation_sweep[0].name
+  target_id = "AutoRemediationSweep"
+  arn       = aws_lambda_function.auto_remediation.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_sweep" {
+  count = var.sweep_enabled ? 1 : 0
+
+  statement_id  = "AllowExecutionFromEventBridgeSweep"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_remediation.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.remediation_sweep[0].arn
+}
+
+#tfsec:ignore:aws-iam-no-policy-wildcards - Listing regions and buckets has no resource-level scoping
+resource "aws_iam_role_policy" "lambda_sweep_policy" {
+  count = var.sweep_enabled ? 1 : 0
+
+  name = "${var.project_name}-${var.environment}-lambda-sweep-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = concat([
+      {
+        Effect = "Allow"
+        Action = [
+          "ec2:DescribeRegions",
+          "s3:ListAllMyBuckets"
+        ]
+        Resource = "*"
+      }
+      ], var.sweep_checkpoint_bucket != "" ? [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject"
+        ]
+        Resource = "arn:aws:s3:::${var.sweep_checkpoint_bucket}/auto-remediation/*"
+      },
+      {
+        # Without ListBucket a missing checkpoint reads as AccessDenied, not NoSuchKey
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = "arn:aws:s3:::${var.sweep_checkpoint_bucket}"
+        Condition = {
+          StringLike = {
+            "s3:prefix" = ["auto-remediation/*"]
+          }
+        }
+    }] : [])
+  })
+}
+
+# Scheduled digest flush (when notifications are digested)
+# Publishes closed windows even when no new event arrives to flush them.
+locals {
+  # Once per window, so every closed window is flushed within the lookback
+  digest_flush_minutes = max(1, ceil(var.notification_digest_window_seconds / 60))
+}
+
+resource "aws_cloudwatch_event_rule" "digest_flush" {
+  count = var.notification_digest_window_seconds > 0 ? 1 : 0
+
+  name                = "${var.project_name}-${var.environment}-digest-flush"
+  description         = "Publish closed SNS notification digest windows"
+  schedule_expression = "rate(${local.digest_flush_minutes} ${local.digest_flush_minutes > 1 ? "minutes" : "minute"})"
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "digest_flush_remediation" {
+  count = var.notification_digest_window_seconds > 0 ? 1 : 0
+
+  rule      = aws_cloudwatch_event_rule.digest_flush[0].name
+  target_id = "AutoRemediationDigestFlush"
+  arn       = aws_lambda_function.auto_remediation.arn
+  input     = jsonencode({ flush_digest = true })
+}
+
+resource "aws_cloudwatch_event_target" "digest_flush_security" {
+  count = var.notification_digest_window_seconds > 0 ? 1 : 0
+
+  rule      = aws_cloudwatch_event_rule.digest_flush[0].name
+  target_id = "SecurityResponseDigestFlush"
+  arn       = aws_lambda_function.security_response.arn
+  input     = jsonencode({ flush_digest = true })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_digest_remediation" {
+  count = var.notification_digest_window_seconds > 0 ? 1 : 0
+
+  statement_id  = "AllowExecutionFromEventBridgeDigestFlush"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_remediation.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.digest_flush[0].arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_digest_security" {
+  count = var.notification_digest_window_seconds > 0 ? 1 : 0
+
+  statement_id  = "AllowExecutionFromEventBridgeDigestFlush"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.security_response.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.digest_flush[0].arn
+}
+
+# Full notification digest reports (optional)
+resource "aws_iam_role_policy" "lambda_digest_report_policy" {
+  count = var.digest_report_bucket != "" ? 1 : 0
+
+  name = "${var.project_name}-${var.environment}-lambda-digest-report-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["s3:PutObject"]
+      Resource = "arn:aws:s3:::${var.digest_report_bucket}/notification-digests/*"
+    }]
+  })
+}
+
+# Shared state table (optional)
+# Single-table layout: each feature prefixes its keys with a namespace.
+#tfsec:ignore:aws-dynamodb-table-customer-key - AWS owned key is sufficient for short-lived remediation state
+resource "aws_dynamodb_table" "state" {
+  count = var.state_table_enabled ? 1 : 0
+
+  name         = "${var.project_name}-${var.environment}-remediation-state"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "ipk"
+    type = "S"
+  }
+
+  attribute {
+    name = "isk"
+    type = "S"
+  }
+
+  # Sparse index over items written with an index key (e.g. open violations per rule)
+  global_secondary_index {
+    name            = "index"
+    hash_key        = "ipk"
+    range_key       = "isk"
+    projection_type = "ALL"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = merge(var.tags, {
+    Name = "${var.project_name}-${var.environment}-remediation-state"
+  })
+}
+
+resource "aws_iam_role_policy" "lambda_state_policy" {
+  count = var.state_table_enabled ? 1 : 0
+
+  name = "${var.project_name}-${var.environment}-lambda-state-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Action = [
+        "dynamodb:GetItem",
+        "dynamodb:PutItem",
+        "dynamodb:UpdateItem",
+        "dynamodb:DeleteItem",
+        "dynamodb:Query"
+      ]
+      Resource = [
+        aws_dynamodb_table.state[0].arn,
+        "${aws_dynamodb_table.state[0].arn}/index/*"
+      ]
+    }]
+  })
+}
@@ -27,3 +27,93 @@ variable "tags" {
   type        = map(string)
   default     = {}
 }
+
+variable "remediation_batching_enabled" {
+  description = "Route security group, EC2 and S3 events through SQS and process them in coalesced batches"
+  type        = bool
+  default     = false
+}
+
+variable "remediation_batch_size" {
+  description = "Maximum number of SQS records delivered to the auto-remediation Lambda per batch"
+  type        = number
+  default     = 10000
+}
+
+variable "remediation_batch_window_seconds" {
+  description = "Maximum time to gather SQS records before invoking the auto-remediation Lambda"
+  type        = number
+  default     = 30
+}
+
+variable "sweep_enabled" {
+  description = "Run a scheduled account-wide sweep that remediates pre-existing drift (needs sweep_checkpoint_bucket or state_table_enabled)"
+  type        = bool
+  default     = false
+}
+
+variable "sweep_schedule_expression" {
+  description = "EventBridge schedule that starts or resumes the remediation sweep"
+  type        = string
+  default     = "rate(15 minutes)"
+}
+
+variable "sweep_checkpoint_bucket" {
+  description = "Existing S3 bucket holding the sweep checkpoint (empty uses the state table; the sweep fails without either)"
+  type        = string
+  default     = ""
+}
+
+variable "state_table_enabled" {
+  description = "Create a DynamoDB table for state shared across invocations (idempotency, incidents, compliance)"
+  type        = bool
+  default     = false
+}
+
+variable "event_log_sample_rate" {
+  description = "Share of events (0-1) logged in full; the rest are logged as a one-line summary"
+  type        = number
+  default     = 0.01
+}
+
+variable "notification_digest_window_seconds" {
+  description = "Buffer SNS notifications into one digest per window of this many seconds (0 sends one per invocation); a schedule flushes closed windows, so use with state_table_enabled to share the buffer across containers"
+  type        = number
+  default     = 0
+}
+
+variable "digest_report_bucket" {
+  description = "Existing S3 bucket for the full JSON report linked from each digest (empty omits the link)"
+  type        = string
+  default     = ""
+}
+
+variable "incident_queues_enabled" {
+  description = "Queue standard and bulk security events on SQS so critical containment runs ahead of background noise"
+  type        = bool
+  default     = false
+}
+
+variable "incident_bulk_batch_size" {
+  description = "Maximum number of low-severity events drained per security-response invocation"
+  type        = number
+  default     = 100
+}
+
+variable "incident_bulk_batch_window_seconds" {
+  description = "Maximum time to gather low-severity events before draining them"
+  type        = number
+  default     = 60
+}
+
+variable "incident_standard_max_concurrency" {
+  description = "Concurrent security-response invocations allowed to drain the standard-severity queue"
+  type        = number
+  default     = 5
+}
+
+variable "incident_bulk_max_concurrency" {
+  description = "Concurrent security-response invocations allowed to drain the bulk (low-severity) queue"
+  type        = number
+  default     = 2
+}